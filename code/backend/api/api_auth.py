@@ -1,8 +1,10 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, verify_jwt_in_request
+from functools import wraps
 from datetime import timedelta
 from helper_modules import db_helper as db  # Assuming db_helper manages DB interactions
-import bcrypt  # Import bcrypt for password checking
+from helper_modules import credentials  # bcrypt on a process pool
+from concurrent.futures import TimeoutError as HashTimeout
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -13,24 +15,34 @@ def login():
     email = data.get('email').strip().lower()
     password = data.get('password').strip()
 
-    # Use parameterized query to prevent SQL injection
-    query = "SELECT * FROM Users WHERE email = :email"
+    # Use parameterized query to prevent SQL injection, only the columns login needs
+    query = "SELECT password, first_name, last_name, is_admin FROM Users WHERE email = :email"
     params = {"email": email}
-    user = db.fetch_data(query, params)
+    rows = db.fetch_rows(query, params)
 
-    if user is not None and not user.empty:
+    if rows:
         # Retrieve the hashed password from the user record
-        stored_hashed_password = user['password'].iloc[0]  # Assuming DataFrame with a 'password' column
+        user = rows[0]
+        stored_hashed_password = user['password']
         
-        # Check if the provided password matches the hashed password
-        if bcrypt.checkpw(password.encode('utf-8'), stored_hashed_password.encode('utf-8')):
+        # Check if the provided password matches the hashed password (runs on the credential pool)
+        try:
+            password_ok = credentials.verify_password(password, stored_hashed_password)
+        except (credentials.CredentialServiceBusy, HashTimeout):
+            return jsonify({"msg": "Too many login attempts right now, please try again."}), 503
+
+        if password_ok:
+            # Old hashes get upgraded to the configured work factor after the response goes out
+            if credentials.needs_rehash(stored_hashed_password):
+                credentials.rehash_in_background(email, password, stored_hashed_password)
+
             # Generate JWT token upon successful login
             access_token = create_access_token(identity=email, expires_delta=timedelta(days=30))
             user_data = {
                 "email"     : email,
-                "firstName" : user['first_name'].iloc[0],
-                "lastName"  : user['last_name'].iloc[0],
-                "isAdmin"   : bool(user['is_admin'].iloc[0])
+                "firstName" : user['first_name'],
+                "lastName"  : user['last_name'],
+                "isAdmin"   : bool(user['is_admin'])
             }
             return jsonify(access_token=access_token, user=user_data), 200
         else:
@@ -45,3 +57,47 @@ def login():
 def protected():
     current_user = get_jwt_identity()
     return jsonify(logged_in_as=current_user), 200
+
+
+def is_admin(email):
+    rows = db.fetch_rows("SELECT is_admin FROM Users WHERE email = :email", {"email": email})
+    return bool(rows and rows[0]['is_admin'])
+
+
+# Decorator for admin-only routes: needs a valid JWT whose user has is_admin set
+def admin_required(view):
+    @wraps(view)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        if not is_admin(get_jwt_identity()):
+            return jsonify({"msg": "Admin access required."}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def check_access(access, email=None):
+    """
+    Checks the request's JWT against an access level ('public', 'user' or 'admin', see query_registry).
+    'user' lets the token's own email through, admins get every level.
+
+    Returns:
+        tuple: (response, status) to send back if access is refused, otherwise None.
+    """
+    if access == 'public':
+        return None
+    verify_jwt_in_request(optional=True)
+    identity = get_jwt_identity()
+    if identity is None:
+        return jsonify({"msg": "Login required."}), 401
+    if access == 'user' and email == identity:
+        return None
+    if is_admin(identity):
+        return None
+    return jsonify({"msg": "Admin access required." if access == 'admin' else "Not allowed for this user."}), 403
+
+
+# Credential pool queue depth / timings
+@auth_bp.route('/credential_stats', methods=['GET'])
+@admin_required
+def credential_stats():
+    return jsonify(credentials.get_stats()), 200
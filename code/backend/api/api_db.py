@@ -1,14 +1,49 @@
-from flask import Blueprint, request, jsonify, send_from_directory, current_app
+from flask import Blueprint, request, jsonify, current_app
 from helper_modules import db_helper as db
+from helper_modules import catalog, popularity, query_registry, image_server, image_variants, uploads, query_cache, credentials, admin_bookings, exporter, snapshots, availability, package_search, facets, pricing, sales
+from api.api_auth import admin_required, check_access
 import pandas as pd
-import bcrypt  # Import bcrypt for password hashing
 import traceback
 import os
+from datetime import datetime
 
 api_db = Blueprint('database', __name__)
 
-# Dynamic route for executing SQL queries based on input from frontend
+# Runs one of the server-defined named queries (helper_modules/query_registry.py) with bound params
+@api_db.route('/query', methods=['POST'])
+def run_named_query():
+    data = request.json or {}
+    name = data.get('name')
+    if not name:
+        return jsonify({'error': 'No query name provided.'}), 400
+    query = query_registry.get_query(name)
+    if query is None:
+        return jsonify({'error': f'Unknown query: {name}'}), 404
+    # Per-user and admin queries need a JWT: per-user ones only for the token's own email (or an admin).
+    # Outside the try so bad tokens get flask_jwt_extended's own 401 / 422 responses
+    refused = check_access(query.access, (data.get('params') or {}).get('email'))
+    if refused:
+        return refused
+
+    try:
+        rows = query_registry.run_query(name, data.get('params'))
+        if rows:
+            return jsonify(rows), 200
+        else:
+            return jsonify({'message': 'No data found.'}), 404
+
+    except KeyError as e:
+        return jsonify({'error': e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(str(e))
+        return jsonify({'error': str(e)}), 500
+
+
+# Raw SQL from the client, admin only now that the app itself uses named queries
 @api_db.route('/fetch_query', methods=['POST'])
+@admin_required
 def execute_query():
     try:
         # Get the SQL query from the frontend request
@@ -18,13 +53,11 @@ def execute_query():
         if not query:
             return jsonify({'error': 'No SQL query provided.'}), 400
 
-        # Fetch data using the db_helper function
-        df = db.fetch_data(query)
+        # Fetch the rows as plain dicts (no DataFrame round trip)
+        rows = db.fetch_rows(query)
 
-        # Convert the DataFrame to a list of dictionaries for JSON serialization
-        if df is not None and not df.empty:
-            result_data = df.to_dict(orient='records')
-            return jsonify(result_data), 200
+        if rows:
+            return jsonify(rows), 200
         else:
             return jsonify({'message': 'No data found.'}), 404
 
@@ -32,6 +65,87 @@ def execute_query():
         print(str(e))
         return jsonify({'error': str(e)}), 500
 
+# Fully assembled package catalog (location, images and categories) in one response
+@api_db.route('/packages', methods=['GET'])
+def get_packages():
+    try:
+        args = request.args
+        result = catalog.fetch_catalog(
+            filters=args.to_dict(),
+            sort=args.get('sort', 'package_id'),
+            order=args.get('order', 'asc'),
+            page=args.get('page', 1),
+            page_size=args.get('page_size', catalog.DEFAULT_PAGE_SIZE),
+        )
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+# Top K most ordered packages, served from the popularity counters instead of the order history
+@api_db.route('/packages/top', methods=['GET'])
+def get_top_packages():
+    try:
+        args = request.args
+        k = min(int(args.get('k', 5)), catalog.MAX_PAGE_SIZE)
+        location_id = args.get('location_id', type=int)
+        category_id = args.get('category_id', type=int)
+        days = args.get('days', type=int)
+        if days is not None and days < 1:
+            return jsonify({'error': 'days must be positive (e.g. 30 or 90)'}), 400
+
+        ranked = popularity.top_packages(k, location_id=location_id, category_id=category_id, days=days)
+        if not ranked:
+            return jsonify([]), 200
+
+        # Assemble the ranked packages in one catalog query, then put them back in rank order
+        package_ids = [package_id for package_id, _ in ranked]
+        packages = catalog.fetch_catalog(filters={'package_id': package_ids}, page_size=len(package_ids))['packages']
+        packages_by_id = {pkg['package_id']: pkg for pkg in packages}
+        result = []
+        for package_id, order_count in ranked:
+            if package_id in packages_by_id:
+                result.append({**packages_by_id[package_id], 'order_count': order_count})
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+# Ranked full-text search (name, description, location, categories) with the catalog filters on top
+@api_db.route('/packages/search', methods=['GET'])
+def search_packages():
+    try:
+        args = request.args
+        result = package_search.search_packages(
+            args.get('q', ''),
+            filters=args.to_dict(),
+            page=args.get('page', 1),
+            page_size=args.get('page_size', catalog.DEFAULT_PAGE_SIZE),
+            prefix=args.get('prefix', 'last'),
+        )
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+# Facet counts (categories, locations, price and duration buckets) and the matching package ids, from the bitset index
+@api_db.route('/packages/facets', methods=['GET'])
+def get_package_facets():
+    try:
+        include_ids = request.args.get('ids', '1') not in ('0', 'false')
+        return jsonify(facets.search(request.args.to_dict(), include_ids=include_ids)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
 # deletes an entry from a specific table
 # i'm using this for the remove from cart feature so idk if it will work properly with other things lol
 # nvrm just hard coded in the tablename and primary key hahaha
@@ -53,6 +167,9 @@ def delete_entry():
         # Execute the delete query
         result = db.execute_query(delete_query)
 
+        if table_name.lower() == 'booking':
+            availability.invalidate()
+
         # Check if rows were affected
         if result.rowcount > 0:
             return jsonify({'message': f'{result.rowcount} entry deleted successfully.'}), 200
@@ -76,20 +193,19 @@ def create_user():
         phone_number = data.get('phone_number')
 
         # Check if email exists in the database
-        check_query = f"SELECT * FROM Users WHERE email = '{email}'"
-        existing_user = db.fetch_data(check_query)
+        existing_user = db.fetch_rows("SELECT 1 FROM Users WHERE email = :email", {'email': email})
 
-        if existing_user is not None and not existing_user.empty:
+        if existing_user:
             return jsonify({'error': 'Email already exists.'}), 400
 
-        # Hash the password using bcrypt before storing it in the database
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        # Hash the password with bcrypt (on the credential pool) before storing it in the database
+        hashed_password = credentials.hash_password(password)
 
         # Insert the new user into the database using upsert
         user_data = {
             'email': email,
             'phone_number': phone_number,
-            'password': hashed_password.decode('utf-8'),  # Store the hashed password
+            'password': hashed_password,  # Store the hashed password
             'first_name': first_name,
             'last_name': last_name,
             'is_admin': False,
@@ -101,6 +217,8 @@ def create_user():
         else:
             return jsonify({'error': 'Failed to create user.'}), 500
 
+    except credentials.CredentialServiceBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -142,12 +260,26 @@ def update_booking():
             'status': data['status']
         }
         print(booking_data)
+
+        # The booking as it is now, so only the difference is checked against / applied to the capacity index
+        old_booking = None
+        if booking_data['booking_id'] is not None:
+            old_booking = query_registry.run_query('booking_by_id', {'booking_id': booking_data['booking_id'],
+                                                                     'email': booking_data['email']})
+            old_booking = old_booking[0] if old_booking else None
+        availability.check_booking_change(old_booking, booking_data)
+
         df = pd.DataFrame([booking_data])
         success = db.upsert_data('Bookings', df)
         if success:
+            availability.record_booking_change(old_booking, booking_data)
+            if old_booking:
+                availability.release_holds([booking_data['booking_id']])  # any checkout hold is for the old version
             return jsonify({"message": "Booking updated successfully"}), 200
         else:
             return jsonify({"message": "Failed to update booking"}), 500
+    except availability.CapacityError as e:
+        return jsonify({"error": str(e), "conflicts": e.conflicts}), 409
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
@@ -166,69 +298,17 @@ def upsert_package():
             'duration': data['duration'],
             'price': data['price']
         }
+        if 'capacity' in data:
+            package_data['capacity'] = data['capacity']  # travellers per day, None = unlimited
 
-        # Upsert the package data into the Packages table
-        package_query = """
-        INSERT INTO Packages (package_id, name, description, location_id, duration, price)
-        VALUES (:package_id, :name, :description, :location_id, :duration, :price)
-        ON CONFLICT(package_id) DO UPDATE SET 
-            name = :name, 
-            description = :description,
-            location_id = :location_id,
-            duration = :duration,
-            price = :price
-        """
-        db.execute_query(package_query, package_data)
-        print("exec successful")
-        package_id = data['package_id']
-
-        # Extract category names from the request and get the category_ids
-        category_names = data.get('categories', [])  # These are the category_name values
-        new_category_ids = set()
-
-        # Use a for loop to fetch each category_id based on the category_name
-        for category_name in category_names:
-            query = """
-                SELECT category_id FROM Categories WHERE name = :name
-            """
-            result = db.execute_query(query, {'name': category_name}).fetchone()
-            if result:
-                new_category_ids.add(result[0])  # Access the first element of the result tuple
-
-        # If package_id is not 'new', we handle updating categories
-        if package_id != 'new':
-            # Fetch existing category ids for this package
-            query = "SELECT category_id FROM PackageCategory WHERE package_id = :package_id"
-            existing_categories = db.execute_query(query, {'package_id': package_id}).fetchall()
-            existing_category_ids = set([cat[0] for cat in existing_categories])  # Access first element of each tuple
-
-            # Find categories to add and categories to remove
-            categories_to_add = new_category_ids - existing_category_ids
-            categories_to_remove = existing_category_ids - new_category_ids
-
-            # Add new categories
-            for category_id in categories_to_add:
-                package_category_query = """
-                INSERT INTO PackageCategory (package_id, category_id)
-                VALUES (:package_id, :category_id)
-                """
-                db.execute_query(package_category_query, {'package_id': package_id, 'category_id': category_id})
-
-            # Remove categories no longer assigned
-            for category_id in categories_to_remove:
-                delete_query = "DELETE FROM PackageCategory WHERE package_id = :package_id AND category_id = :category_id"
-                db.execute_query(delete_query, {'package_id': package_id, 'category_id': category_id})
+        # Upsert the package and sync its categories (names -> ids from the cached map) in one transaction
+        package_id = catalog.upsert_package(package_data, data.get('categories', []))
 
-        else:
-            # Handle the case for a new package (only adding categories)
-            for category_id in new_category_ids:
-                package_category_query = """
-                INSERT INTO PackageCategory (package_id, category_id)
-                VALUES (:package_id, :category_id)
-                """
-                db.execute_query(package_category_query, {'package_id': package_id, 'category_id': category_id})
-
-        return jsonify({"message": "Package upserted successfully, categories updated"}), 200
+        popularity.invalidate()  # package location / categories may have changed
+        availability.invalidate()
+        facets.update_packages([package_id])
+        pricing.invalidate_prices([package_id])
+        return jsonify({"message": "Package upserted successfully, categories updated", "package_id": package_id}), 200
     except Exception as e:
         print(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
@@ -239,13 +319,43 @@ def upsert_package():
 
 
 
+# Bulk re-tag: {"packages": [{"package_id": 1, "categories": ["Adventure", ...]}, ...], "mode": "replace" | "add"}
+@api_db.route('/retag_packages', methods=['POST'])
+def retag_packages():
+    data = request.json or {}
+    try:
+        mode = data.get('mode', 'replace')
+        if mode not in ('replace', 'add'):
+            return jsonify({"error": "mode must be 'replace' or 'add'"}), 400
+        assignments = {item['package_id']: item.get('categories', []) for item in data.get('packages', [])}
+        if not assignments:
+            return jsonify({"error": "No packages provided"}), 400
+
+        result = catalog.retag_packages(assignments, replace=(mode == 'replace'))
+        popularity.invalidate()
+        facets.update_packages(list(assignments))
+        return jsonify(result), 200
+    except Exception as e:
+        print(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+
 @api_db.route('/delete_package', methods=['POST'])
 def delete_package():
     data = request.json
     try:
         # Delete the package from the database
         query = "DELETE FROM Packages WHERE package_id = :package_id"
-        db.execute_query(query, data)
+        result = db.execute_query(query, data)
+        if result is None:
+            return jsonify({"error": "Deleting the package failed"}), 500
+        if result.rowcount == 0:
+            return jsonify({"error": f"Package {data['package_id']} not found"}), 404
+        # Caches only drop the package once it's really gone
+        popularity.invalidate()
+        availability.invalidate()
+        facets.remove_packages([data['package_id']])
+        pricing.invalidate_prices([data['package_id']])
         return jsonify({"message": "Package deleted successfully"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -261,89 +371,49 @@ def change_password():
         new_password = data.get('new_password')
 
         # Fetch the user by email
-        query = f"SELECT * FROM Users WHERE email = '{email}'"
-        user = db.fetch_data(query)
+        query = "SELECT password FROM Users WHERE email = :email"
+        user = db.fetch_rows(query, {'email': email})
 
-        if user.empty:
+        if not user:
             return jsonify({'error': 'User not found'}), 404
 
         # Verify the current password
-        stored_password = user.iloc[0]['password']
-        if not bcrypt.checkpw(current_password.encode('utf-8'), stored_password.encode('utf-8')):
+        stored_password = user[0]['password']
+        if not credentials.verify_password(current_password, stored_password):
             return jsonify({'error': 'Current password is incorrect'}), 400
 
         # Hash the new password and update it
-        hashed_new_password = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-        update_query = f"UPDATE Users SET password = '{hashed_new_password}' WHERE email = '{email}'"
-        db.execute_query(update_query)
+        hashed_new_password = credentials.hash_password(new_password)
+        update_query = "UPDATE Users SET password = :password WHERE email = :email"
+        db.execute_query(update_query, {'password': hashed_new_password, 'email': email})
 
         return jsonify({'message': 'Password changed successfully'}), 200
 
+    except credentials.CredentialServiceBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 #### STUFF FOR FILE UPLOAD ACCORDING TO A GOOD FRIEND
-# Configure the upload folder
-ALLOWED_EXTENSIONS = {'jpg', 'jpeg'}
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
+# Files are streamed to disk while the body is parsed, all rows go in in one transaction (see helper_modules/uploads.py)
 @api_db.route('/upload', methods=['POST'])
 def upload_file():
     try:
-        package_id = request.form.get('package_id')
-        print(f"Received package_id: {package_id}")  # Debugging
-
-        if not package_id:
-            print("Package ID is missing")  # Debugging
-            return jsonify({'error': 'Package ID is required'}), 400
-
-        if 'images' not in request.files:
-            print("No image file provided")  # Debugging
-            return jsonify({'error': 'No image file provided'}), 400
-
-        files = request.files.getlist('images')
-        print(f"Received files: {files}")  # Debugging
-        uploaded_file_urls = []
-
-        for file in files:
-            if file and allowed_file(file.filename):
-                print(f"Processing file: {file.filename}")  # Debugging
-                
-                # Inserting new image into the database
-                temp_filename = f"temp{os.path.splitext(file.filename)[1]}"
-                image_insert_query = """
-                    INSERT INTO PackageImages (package_id, image_path)
-                    VALUES (:package_id, :image_path)
-                """
-                image_data = {'package_id': package_id, 'image_path': temp_filename}
-                db.execute_query(image_insert_query, image_data)
-
-                # Generating the new image id
-                result = db.execute_query("SELECT MAX(image_id) FROM PackageImages").fetchone()[0]
-                new_image_id = (result or 0)
-
-                # Renaming the file
-                filename = f"{new_image_id}{os.path.splitext(file.filename)[1]}"  # Use the image_id with original file extension
-                upload_folder = os.path.join(current_app.config['UPLOAD_FOLDER'])
-                file.save(os.path.join(upload_folder, filename))
-                print(f"added new image: {os.path.join(upload_folder, filename)}")
-
-                # Step 4: Update the image path in the database with the correct filename
-                update_image_path_query = """
-                    UPDATE PackageImages SET image_path = :image_path WHERE image_id = :image_id
-                """
-                update_data = {'image_path': f"package_images/{filename}", 'image_id': new_image_id}
-                db.execute_query(update_image_path_query, update_data)
-
-                # Append the file URL to return to the frontend
-                uploaded_file_urls.append(f"/uploads/{filename}")
-
-        print("All files processed successfully")  # Debugging
-        return jsonify({'message': 'Images uploaded successfully!', 'fileUrls': uploaded_file_urls}), 200
-
+        # request.form / request.files must not be touched here, uploads parses the body itself
+        result = uploads.upload_package_images(request.environ, current_app.config['UPLOAD_FOLDER'],
+                                               max_content_length=current_app.config.get('MAX_CONTENT_LENGTH'))
+        print(f"Uploaded {len(result['files'])} images for package {result['package_id']} in {result['total_ms']}ms")
+        return jsonify({
+            'message': 'Images uploaded successfully!',
+            'fileUrls': [f"/uploads/{os.path.basename(f['image_path'])}" for f in result['files']],
+            'files': result['files'],
+            'skipped': result['skipped'],
+            'total_ms': result['total_ms'],
+        }), 200
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print("Error occurred during file upload")
         print(traceback.format_exc())  # Print detailed error traceback to the logs
@@ -353,14 +423,211 @@ def upload_file():
 # Route to serve the uploaded images
 @api_db.route('/uploads/<filename>')
 def uploaded_file(filename):
+    return image_server.serve_image(f"package_images/{filename}")
+
+
+# Can N travellers book a package for these nights: ?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD&travellers=4
+@api_db.route('/packages/<int:package_id>/availability', methods=['GET'])
+def get_package_availability(package_id):
     try:
-        # Access UPLOAD_FOLDER from current_app.config
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        return send_from_directory(upload_folder, filename)
+        args = request.args
+        if not args.get('start_date') or not args.get('end_date'):
+            return jsonify({'error': 'start_date and end_date are required'}), 400
+        result = availability.check_availability(package_id, args['start_date'], args['end_date'], args.get('travellers', 1))
+        return jsonify(result), 200
+    except KeyError as e:
+        return jsonify({'error': e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        traceback.print_exc()
-        return jsonify({'error': 'File not found'}), 404
-    
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+
+# Month calendar of places left and possible start days: ?month=YYYY-MM&travellers=4
+@api_db.route('/packages/<int:package_id>/calendar', methods=['GET'])
+def get_package_calendar(package_id):
+    try:
+        month = request.args.get('month') or datetime.now().strftime('%Y-%m')
+        year, month_number = (int(part) for part in month.split('-'))
+        result = availability.get_calendar(package_id, year, month_number, request.args.get('travellers', 1))
+        return jsonify(result), 200
+    except KeyError as e:
+        return jsonify({'error': e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+
+# Per-day capacity overrides: {"overrides": {"2025-02-15": 12, "2025-03-01": null}} (null removes one)
+@api_db.route('/packages/<int:package_id>/capacity', methods=['POST'])
+@admin_required
+def set_package_capacity(package_id):
+    try:
+        overrides = (request.json or {}).get('overrides')
+        if not overrides:
+            return jsonify({'error': 'No overrides provided.'}), 400
+        availability.set_capacity_overrides(package_id, overrides)
+        return jsonify({'message': 'Capacity updated', 'package_id': package_id}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+
+# Admin bookings list: joined server side, keyset paginated on (start_date, booking_id)
+# ?status=pending,confirmed&package_id=&email=&start_from=&start_to=&order=asc&limit=100&cursor=<next_cursor>
+@api_db.route('/admin/bookings', methods=['GET'])
+@admin_required
+def get_admin_bookings():
+    try:
+        args = request.args
+        page = admin_bookings.fetch_bookings_page(
+            filters=args,
+            cursor=args.get('cursor'),
+            limit=args.get('limit', admin_bookings.DEFAULT_LIMIT),
+            order=args.get('order', 'asc'),
+        )
+        return jsonify(page), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+
+# Streaming exports for reports: ?format=ndjson|csv&gzip=1, rows are sent as they're read so any size works
+def _export_options(args):
+    fmt = args.get('format', 'ndjson').lower()
+    if fmt not in exporter.FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    return fmt, args.get('gzip', '').lower() in ('1', 'true', 'yes')
+
+
+@api_db.route('/export/<table>', methods=['GET'])
+@admin_required
+def export_table(table):
+    try:
+        fmt, gzip = _export_options(request.args)
+        table_name = exporter.resolve_table(table)
+        if table_name is None:
+            return jsonify({'error': f'Unknown table: {table}'}), 404
+        return exporter.export_response(f"SELECT * FROM {table_name}", fmt=fmt, gzip=gzip,
+                                        filename=table_name, table=table_name)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+
+# Named query export, the query's params come from the query string (no row limit here)
+@api_db.route('/export/query/<name>', methods=['GET'])
+@admin_required
+def export_named_query(name):
+    try:
+        fmt, gzip = _export_options(request.args)
+        query = query_registry.get_query(name)
+        if query is None:
+            return jsonify({'error': f'Unknown query: {name}'}), 404
+        params = {k: v for k, v in request.args.items() if k not in ('format', 'gzip')}
+        missing = [p for p in query.params if p not in params]
+        unexpected = [p for p in params if p not in query.params]
+        if missing or unexpected:
+            raise ValueError(f"Query {name} expects params {list(query.params)}, missing {missing}, unexpected {unexpected}")
+        return exporter.export_response(query.sql, params, fmt=fmt, gzip=gzip, filename=name, table=query.table)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+
+# Whole-db snapshots: list them with the scheduler status, or take one now (restores are CLI only)
+@api_db.route('/snapshots', methods=['GET'])
+@admin_required
+def list_snapshots():
+    return jsonify({'status': snapshots.get_status(), 'snapshots': snapshots.list_snapshots()}), 200
+
+
+@api_db.route('/snapshots', methods=['POST'])
+@admin_required
+def take_snapshot():
+    try:
+        data = request.get_json(silent=True) or {}
+        return jsonify(snapshots.take_snapshot(data.get('compression'))), 201
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+
+# Sales analytics from the SalesRollup table. Common params: start=&end= (YYYY-MM-DD order days),
+# status=pending,confirmed (default) or status=all
+def _sales_range(args):
+    return {'start': args.get('start'), 'end': args.get('end'), 'statuses': sales.parse_statuses(args.get('status'))}
+
+
+# ?freq=day|week|month|year&by=package|location|category|status
+@api_db.route('/sales/timeseries', methods=['GET'])
+@admin_required
+def sales_timeseries():
+    try:
+        args = request.args
+        return jsonify(sales.timeseries(args.get('freq', 'month'), args.get('by') or None, **_sales_range(args))), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+
+# ?by=package|location|category|status&metric=revenue|bookings|travellers&n=10
+@api_db.route('/sales/top', methods=['GET'])
+@admin_required
+def sales_top():
+    try:
+        args = request.args
+        return jsonify(sales.top(args.get('by', 'package'), args.get('metric', 'revenue'), args.get('n', 10),
+                                 **_sales_range(args))), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+
+# ?metric=revenue|bookings|travellers, packages grouped by the month of their first sale
+@api_db.route('/sales/cohorts', methods=['GET'])
+@admin_required
+def sales_cohorts():
+    try:
+        args = request.args
+        return jsonify(sales.cohorts(args.get('metric', 'revenue'), **_sales_range(args))), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
+
+# Query result cache hit/miss counters
+@api_db.route('/query_cache_stats', methods=['GET'])
+@admin_required
+def query_cache_stats():
+    return jsonify(query_cache.cache.stats()), 200
+
+
+# Image cache hit/miss counters
+@api_db.route('/image_cache_stats', methods=['GET'])
+@admin_required
+def image_cache_stats():
+    return jsonify(image_server.get_stats()), 200
+
 
 @api_db.route('/delete_package_images', methods=['DELETE'])
 def delete_package_images():
@@ -387,6 +654,8 @@ def delete_package_images():
             else:
                 print(f"File not found: {full_image_path}")
 
+        image_variants.delete_variants(image_ids)
+
         delete_query = f"DELETE FROM PackageImages WHERE image_id IN ({', '.join(map(str, image_ids))})"
         result = db.execute_query(delete_query)
 
@@ -1,10 +1,12 @@
 from flask import Blueprint, request, jsonify
 import traceback
-from datetime import datetime
 import os
-from helper_modules import db_helper as db
-from paypalcheckoutsdk.core import PayPalHttpClient, SandboxEnvironment
-from paypalcheckoutsdk.orders import OrdersCreateRequest, OrdersCaptureRequest
+from helper_modules import checkout
+from helper_modules import payment_gateway
+from helper_modules import idempotency
+from helper_modules import availability
+from helper_modules import pricing
+from paypalcheckoutsdk.orders import OrdersCreateRequest, OrdersCaptureRequest, OrdersGetRequest
 from dotenv import load_dotenv
 import time
 
@@ -14,144 +16,192 @@ load_dotenv()
 # PayPal credentials from environment variables
 PAYPAL_CLIENT_ID = os.getenv("PAYPAL_CLIENT_ID")
 PAYPAL_CLIENT_SECRET = os.getenv("PAYPAL_CLIENT_SECRET")
-print(f"PAYPAL_CLIENT_ID: {PAYPAL_CLIENT_ID}")
-print(f"PAYPAL_CLIENT_SECRET: {PAYPAL_CLIENT_SECRET}")
-environment = SandboxEnvironment(client_id=PAYPAL_CLIENT_ID, client_secret=PAYPAL_CLIENT_SECRET)
-client = PayPalHttpClient(environment)
+# Pooled keep-alive client with cached tokens, timeouts and retries, called through a bounded pool (the routes
+# still block on it, for at most PAYPAL_DEADLINE); set PAYPAL_API_URL to use the local fake server
+environment = payment_gateway.build_environment(PAYPAL_CLIENT_ID, PAYPAL_CLIENT_SECRET)
+client = payment_gateway.PooledPayPalHttpClient(environment)
+gateway = payment_gateway.PayPalGateway(client)
 
 # Route to create PayPal order
 @api_orders.route('/create', methods=['POST'])
 def create_order():
     try:
-        cart = request.json.get('cart')
-        total_price = 0
-        for order in cart:
-            total_price += order['quantity'] * order['price']
-        total_price = round(total_price, 2)
-        print(f'TOTAL PRICE: {total_price}')
+        data = request.json or {}
+        # Priced from the database, client prices are ignored; capture and update-orders reuse this quote
+        quote = pricing.create_quote(data.get('cart'), email=data.get('user_email'))
+
+        # Hold the places while the customer is on PayPal, they expire on their own if the payment never happens
+        booking_ids = pricing.quote_booking_ids(quote)
+        hold_expires_at = availability.place_holds(booking_ids) if booking_ids else None
 
         request_order = OrdersCreateRequest()
         request_order.prefer('return=minimal')
         request_order.request_body({
             "intent": "CAPTURE",
             "purchase_units": [{
+                "custom_id": quote['quote_id'],
                 "amount": {
-                    "currency_code": "AUD",
-                    "value": str(total_price)
+                    "currency_code": quote['currency'],
+                    "value": quote['total']
                 }
             }]
         })
 
-        response = client.execute(request_order)
+        try:
+            response = gateway.execute(request_order)
+        except Exception:
+            if booking_ids:
+                availability.release_holds(booking_ids)
+            raise
         # Manually extract relevant fields
         order_result = {
             "id": response.result.id,
             "status": response.result.status,
-            "links": [{"href": link.href, "rel": link.rel, "method": link.method} for link in response.result.links]
+            "links": [{"href": link.href, "rel": link.rel, "method": link.method} for link in response.result.links],
+            "hold_expires_at": hold_expires_at,
+            "quote_id": quote['quote_id'],
+            "total": quote['total'],
         }
         # print(order_result)
         return jsonify(order_result), response.status_code
 
+    except availability.CapacityError as e:
+        return jsonify({"error": str(e), "conflicts": e.conflicts}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except payment_gateway.PaymentGatewayTimeout as e:
+        return jsonify({"error": str(e)}), 504
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
-@api_orders.route('/<order_id>/capture', methods=['POST'])
-def capture_order(order_id):
-    try:
-        request_capture = OrdersCaptureRequest(order_id)
-
-        # Execute the PayPal request to capture the payment
-        response = client.execute(request_capture)
 
-        # Extract the details from the response in a JSON-friendly format
-        capture_result = {
-            "id": response.result.id,
-            "status": response.result.status,
-            "payment_source": {
-                "paypal": {
-                    "email_address": response.result.payment_source.paypal.email_address,
-                    "account_id": response.result.payment_source.paypal.account_id,
-                    "account_status": response.result.payment_source.paypal.account_status,
-                    "name": {
-                        "given_name": response.result.payment_source.paypal.name.given_name,
-                        "surname": response.result.payment_source.paypal.name.surname,
-                    },
-                    "address": {
-                        "country_code": response.result.payment_source.paypal.address.country_code,
-                    },
-                }
-            },
-            "purchase_units": [
-                {
-                    "reference_id": unit.reference_id,
-                    "shipping": {
-                        "name": unit.shipping.name.full_name,
-                        "address": {
-                            "address_line_1": unit.shipping.address.address_line_1,
-                            "address_line_2": unit.shipping.address.address_line_2,
-                            "admin_area_1": unit.shipping.address.admin_area_1,
-                            "admin_area_2": unit.shipping.address.admin_area_2,
-                            "postal_code": unit.shipping.address.postal_code,
-                            "country_code": unit.shipping.address.country_code,
-                        }
-                    },
-                    "payments": {
-                        "captures": [
-                            {
-                                "id": capture.id,
-                                "status": capture.status,
-                                "amount": {
-                                    "currency_code": capture.amount.currency_code,
-                                    "value": capture.amount.value,
-                                },
-                                "final_capture": capture.final_capture,
-                                "seller_protection": capture.seller_protection.status,
-                                "seller_receivable_breakdown": {
-                                    "gross_amount": {
-                                        "currency_code": capture.seller_receivable_breakdown.gross_amount.currency_code,
-                                        "value": capture.seller_receivable_breakdown.gross_amount.value,
-                                    },
-                                    "paypal_fee": {
-                                        "currency_code": capture.seller_receivable_breakdown.paypal_fee.currency_code,
-                                        "value": capture.seller_receivable_breakdown.paypal_fee.value,
-                                    },
-                                    "net_amount": {
-                                        "currency_code": capture.seller_receivable_breakdown.net_amount.currency_code,
-                                        "value": capture.seller_receivable_breakdown.net_amount.value,
-                                    }
-                                },
-                                "create_time": capture.create_time,
-                                "update_time": capture.update_time,
-                                "links": [
-                                    {"href": link.href, "rel": link.rel, "method": link.method} for link in capture.links
-                                ],
-                            }
-                            for capture in unit.payments.captures
-                        ]
-                    }
-                }
-                for unit in response.result.purchase_units
-            ],
-            "payer": {
+def _format_capture(response):
+    # Extract the details from the response in a JSON-friendly format
+    capture_result = {
+        "id": response.result.id,
+        "status": response.result.status,
+        "payment_source": {
+            "paypal": {
+                "email_address": response.result.payment_source.paypal.email_address,
+                "account_id": response.result.payment_source.paypal.account_id,
+                "account_status": response.result.payment_source.paypal.account_status,
                 "name": {
-                    "given_name": response.result.payer.name.given_name,
-                    "surname": response.result.payer.name.surname,
+                    "given_name": response.result.payment_source.paypal.name.given_name,
+                    "surname": response.result.payment_source.paypal.name.surname,
                 },
-                "email_address": response.result.payer.email_address,
-                "payer_id": response.result.payer.payer_id,
                 "address": {
-                    "country_code": response.result.payer.address.country_code,
+                    "country_code": response.result.payment_source.paypal.address.country_code,
+                },
+            }
+        },
+        "purchase_units": [
+            {
+                "reference_id": unit.reference_id,
+                "shipping": {
+                    "name": unit.shipping.name.full_name,
+                    "address": {
+                        "address_line_1": unit.shipping.address.address_line_1,
+                        "address_line_2": unit.shipping.address.address_line_2,
+                        "admin_area_1": unit.shipping.address.admin_area_1,
+                        "admin_area_2": unit.shipping.address.admin_area_2,
+                        "postal_code": unit.shipping.address.postal_code,
+                        "country_code": unit.shipping.address.country_code,
+                    }
+                },
+                "payments": {
+                    "captures": [
+                        {
+                            "id": capture.id,
+                            "status": capture.status,
+                            "amount": {
+                                "currency_code": capture.amount.currency_code,
+                                "value": capture.amount.value,
+                            },
+                            "final_capture": capture.final_capture,
+                            "seller_protection": capture.seller_protection.status,
+                            "seller_receivable_breakdown": {
+                                "gross_amount": {
+                                    "currency_code": capture.seller_receivable_breakdown.gross_amount.currency_code,
+                                    "value": capture.seller_receivable_breakdown.gross_amount.value,
+                                },
+                                "paypal_fee": {
+                                    "currency_code": capture.seller_receivable_breakdown.paypal_fee.currency_code,
+                                    "value": capture.seller_receivable_breakdown.paypal_fee.value,
+                                },
+                                "net_amount": {
+                                    "currency_code": capture.seller_receivable_breakdown.net_amount.currency_code,
+                                    "value": capture.seller_receivable_breakdown.net_amount.value,
+                                }
+                            },
+                            "create_time": capture.create_time,
+                            "update_time": capture.update_time,
+                            "links": [
+                                {"href": link.href, "rel": link.rel, "method": link.method} for link in capture.links
+                            ],
+                        }
+                        for capture in unit.payments.captures
+                    ]
                 }
+            }
+            for unit in response.result.purchase_units
+        ],
+        "payer": {
+            "name": {
+                "given_name": response.result.payer.name.given_name,
+                "surname": response.result.payer.name.surname,
             },
-            "links": [
-                {"href": link.href, "rel": link.rel, "method": link.method} for link in response.result.links
-            ]
-        }
+            "email_address": response.result.payer.email_address,
+            "payer_id": response.result.payer.payer_id,
+            "address": {
+                "country_code": response.result.payer.address.country_code,
+            }
+        },
+        "links": [
+            {"href": link.href, "rel": link.rel, "method": link.method} for link in response.result.links
+        ]
+    }
+    return capture_result
+
+
+@api_orders.route('/<order_id>/capture', methods=['POST'])
+def capture_order(order_id):
+    try:
+        # The quote from /create (cached, so no pricing or db read here) is what the PayPal order has to match
+        quote_id = (request.get_json(silent=True) or {}).get('quote_id')
+        if not quote_id:
+            return jsonify({"error": "quote_id is required"}), 400
+        quote = pricing.get_quote(quote_id, allow_expired=True)
+
+        def capture():
+            # A new capture needs a quote that's still valid (retries of a finished one are replayed below);
+            # the order is checked before capturing, so a mismatch is refused without the buyer being charged
+            pricing.get_quote(quote_id)
+            order = gateway.execute(OrdersGetRequest(order_id))
+            pricing.check_paypal_order(quote, order.result.purchase_units)
+
+            request_capture = OrdersCaptureRequest(order_id)
+            # Same PayPal-Request-Id for every attempt at this order, so PayPal dedupes captures across processes too
+            request_capture.headers["PayPal-Request-Id"] = f"capture-{order_id}"
+
+            # Execute the PayPal request to capture the payment
+            response = gateway.execute(request_capture)
+            return _format_capture(response), response.status_code
+
+        # Retries (same order id or Idempotency-Key) get the stored result instead of a second capture
+        key = request.headers.get('Idempotency-Key') or order_id
+        capture_result, status_code, replayed = idempotency.run_once('capture', key, capture)
         # print(f"CAPTURE RESUTL DATA: {capture_result}")
         # Return the formatted response
-        return jsonify(capture_result), response.status_code
+        return jsonify(capture_result), status_code
 
+    except pricing.QuoteMismatch as e:
+        print(f"Refused to capture {order_id}: {e}")
+        return jsonify({"error": str(e)}), 409
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 404
+    except payment_gateway.PaymentGatewayTimeout as e:
+        return jsonify({"error": str(e)}), 504
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
@@ -164,56 +214,46 @@ def update_bookings_and_orders():
         data = request.json
         cart_items = data.get('cart_items')
         user_email = data.get('user_email')
-        total_price = round(data.get('total_price'), 2)
-        print(cart_items)
-        print(user_email)
-        print(total_price)
-        if not cart_items or not user_email or not total_price:
+        quote_id = data.get('quote_id')
+        if not cart_items or not user_email:
             return jsonify({"error": "Invalid input data"}), 400
+        booking_ids = [item['bookingId'] for item in cart_items]
 
-        # Insert a new row into the Orders table and get the last inserted order_id
-        insert_order_query = """
-            INSERT INTO Orders (email, total_price, order_date, payment_date, payment_status)
-            VALUES (:email, :total_price, :order_date, :payment_date, 'paid')
-        """
-        order_params = {
-            'email': user_email,
-            'total_price': total_price,
-            'order_date': datetime.now().strftime('%Y-%m-%d'),
-            'payment_date': datetime.now().strftime('%Y-%m-%d')
-        }
-        db.execute_query(insert_order_query, order_params)
-        fetch_order_id_query = """
-            SELECT order_id FROM Orders
-            WHERE email = :email AND total_price = :total_price AND order_date = :order_date AND payment_date = :payment_date
-            ORDER BY order_id DESC LIMIT 1
-        """
-
-        order_id = int(db.fetch_data(fetch_order_id_query, order_params)['order_id'][0])
-        print(f"ORDERID: {order_id}")
-        if not order_id:
-            return jsonify({"error": "Failed to retrieve order ID"}), 500
-
-        # Link the order to the respective bookings in the OrderItems table
-        for item in cart_items:
-            booking_id = item['bookingId']  # Assuming id is the bookingId
-
-            # Insert into OrderItems table to link order with booking IDs
-            insert_order_item_query = """
-                INSERT INTO OrderItems (order_id, booking_id)
-                VALUES (:order_id, :booking_id)
-            """
-            db.execute_query(insert_order_item_query, {'order_id': order_id, 'booking_id': booking_id})
-
-            # Optionally update the booking status to 'confirmed' or any other status
-            update_booking_query = """
-                UPDATE Bookings SET status = 'pending'
-                WHERE booking_id = :booking_id
-            """
-            db.execute_query(update_booking_query, {'booking_id': booking_id})
-
-        return jsonify({"success": True, "order_id": order_id}), 200
+        def priced_order():
+            # The quote the payment was made against (past its expiry is fine, the money is already taken);
+            # older clients without one get their cart priced here. Either way total_price from the request is ignored.
+            if quote_id:
+                quote = pricing.get_quote(quote_id, allow_expired=True)
+            else:
+                quote = pricing.create_quote([{'booking_id': booking_id} for booking_id in booking_ids], email=user_email)
+            if quote['email'] != user_email:
+                raise ValueError("The quote belongs to another user")
+            if set(map(int, booking_ids)) != set(pricing.quote_booking_ids(quote)):
+                raise ValueError("The cart doesn't match the quote")
+            prices = {line['booking_id']: float(line['line_total']) for line in quote['lines'] if line['booking_id'] is not None}
+            return float(quote['total']), prices
+
+        # Orders row, OrderItems links, booking statuses and prices and popularity counters all in one transaction
+        key = request.headers.get('Idempotency-Key') or data.get('paypal_order_id')
+        if not key:
+            total_price, booking_prices = priced_order()
+            order_id = checkout.finalize_order(user_email, booking_ids, total_price, booking_prices=booking_prices)
+            return jsonify({"success": True, "order_id": order_id}), 200
+
+        # Keyed by the PayPal order: a retry gets the first order back instead of a second Orders row
+        def finalize():
+            total_price, booking_prices = priced_order()
+            order_id = checkout.finalize_order(user_email, booking_ids, total_price, idempotency_key=key,
+                                               booking_prices=booking_prices)
+            return {"success": True, "order_id": order_id}, 200
+
+        result, status_code, replayed = idempotency.run_once('update-orders', key, finalize, persist=False)
+        return jsonify(result), status_code
 
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error updating database: {traceback.format_exc()}")
         return jsonify({"error": str(e)}), 500
@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, send_from_directory
+from flask import Flask, jsonify
 import sys
 import os
 from flask_jwt_extended import JWTManager
@@ -10,6 +10,7 @@ from flask_cors import CORS
 from api.api_db import api_db
 from api.api_auth import auth_bp 
 from api.api_orders import api_orders  
+from helper_modules import image_server, snapshots
 
 app = Flask(__name__)
 
@@ -28,13 +29,17 @@ app.register_blueprint(auth_bp, url_prefix="/api/auth")
 app.register_blueprint(api_orders, url_prefix="/api/orders")  
 
 
-# Serve images from the backend/images folder
+# Serve images from the backend/images folder (content-hash ETags, 304s and an in-memory cache for small files)
 @app.route('/backend/images/<path:filename>')
 def serve_image(filename):
-    return send_from_directory(os.path.join(app.root_path, 'images'), filename)
+    return image_server.serve_image(filename)
 
 app.config['UPLOAD_FOLDER'] = 'images/package_images'
 
+# Scheduled whole-db snapshots (SNAPSHOT_INTERVAL seconds, off by default), not in the debug reloader's watcher process
+if not (__name__ == "__main__" and os.environ.get("WERKZEUG_RUN_MAIN") != "true"):
+    snapshots.start_scheduler()
+
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,101 @@
+"""
+Admin bookings listing at scale: keyset pages (admin_bookings.fetch_bookings_page) against the same
+join paged with LIMIT/OFFSET, first page vs deep pages, with and without filters.
+
+Run from backend/:  python benchmarks/bench_admin_bookings.py [bookings]
+"""
+import os
+import sys
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from statistics import median
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.join(BACKEND_DIR, "db"))
+
+# Point the engine at a scratch database before db_config gets imported
+tmp_dir = tempfile.mkdtemp()
+os.environ["DB_PATH"] = os.path.join(tmp_dir, "bench.db")
+
+from sqlalchemy import text
+from models import Base
+from db.db_config import engine
+from helper_modules import db_helper as db
+from helper_modules import admin_bookings
+
+USERS = 5000
+PACKAGES = 200
+STATUSES = ['in-cart', 'pending', 'confirmed', 'cancelled']
+
+
+def seed(bookings):
+    Base.metadata.create_all(engine)
+    rng = random.Random(1)
+    first_day = date(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO Locations (country, city) VALUES ('Australia', 'Sydney')"))
+        conn.execute(text("INSERT INTO Users VALUES (:email, 'x', '0', 'First', 'Last', 0)"),
+                     [{'email': f"user{i}@test.com"} for i in range(USERS)])
+        conn.execute(text("INSERT INTO Packages (location_id, name, description, duration, price) VALUES (1, :name, 'd', 5, 100)"),
+                     [{'name': f"Package {i}"} for i in range(PACKAGES)])
+        batch = []
+        for i in range(bookings):
+            start = first_day + timedelta(days=rng.randrange(730))
+            batch.append({'email': f"user{rng.randrange(USERS)}@test.com", 'package_id': rng.randrange(1, PACKAGES + 1),
+                          'start_date': start.isoformat(), 'end_date': (start + timedelta(days=5)).isoformat(),
+                          'status': rng.choice(STATUSES)})
+            if len(batch) == 50000:
+                conn.execute(text("""INSERT INTO Bookings (email, package_id, start_date, end_date, number_of_travellers, price, status)
+                                     VALUES (:email, :package_id, :start_date, :end_date, 2, 200, :status)"""), batch)
+                batch = []
+        if batch:
+            conn.execute(text("""INSERT INTO Bookings (email, package_id, start_date, end_date, number_of_travellers, price, status)
+                                 VALUES (:email, :package_id, :start_date, :end_date, 2, 200, :status)"""), batch)
+        conn.execute(text("ANALYZE"))
+
+
+def timed(fn, repeats=5):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return median(times)
+
+
+def offset_page(filters_sql, params, page, limit=100):
+    db.fetch_rows(admin_bookings.BOOKINGS_QUERY.format(where=filters_sql, direction='ASC') + f" OFFSET {page * limit}",
+                  {**params, 'limit': limit})
+
+
+def keyset_page(filters, pages):
+    # walk `pages` pages in, then time the next one
+    cursor = None
+    for _ in range(pages):
+        cursor = admin_bookings.fetch_bookings_page(filters, cursor, limit=1000)['next_cursor']
+    return lambda: admin_bookings.fetch_bookings_page(filters, cursor, limit=100)
+
+
+if __name__ == "__main__":
+    bookings = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    start = time.perf_counter()
+    seed(bookings)
+    print(f"Seeded {bookings} bookings in {time.perf_counter() - start:.1f}s\n")
+
+    deep = bookings // 200   # page number ~half way through at 100 per page
+    print(f"{'case':<34} {'keyset ms':>10} {'offset ms':>10}")
+    cases = [
+        ("all, first page", {}, "", {}, 0),
+        (f"all, page {deep}", {}, "", {}, deep),
+        ("status=pending, first page", {'status': 'pending'}, "WHERE b.status = :s", {'s': 'pending'}, 0),
+        (f"status=pending, page {deep // 4}", {'status': 'pending'}, "WHERE b.status = :s", {'s': 'pending'}, deep // 4),
+        ("package_id=7, first page", {'package_id': 7}, "WHERE b.package_id = :p", {'p': 7}, 0),
+        ("user42, all", {'email': 'user42@test.com'}, "WHERE b.email = :e", {'e': 'user42@test.com'}, 0),
+    ]
+    for label, filters, where, params, page in cases:
+        keyset = timed(keyset_page(filters, page // 10))
+        offset = timed(lambda: offset_page(where, params, page))
+        print(f"{label:<34} {keyset:>10.2f} {offset:>10.2f}")
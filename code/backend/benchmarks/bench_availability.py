@@ -0,0 +1,94 @@
+"""
+Availability at scale: the in-memory occupancy arrays (helper_modules/availability.py) against answering
+the same questions from Bookings (overlapping bookings fetched per request, occupancy summed in Python).
+
+Run from backend/:  python benchmarks/bench_availability.py [bookings]
+"""
+import os
+import sys
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from statistics import median
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.join(BACKEND_DIR, "db"))
+
+# Point the engine at a scratch database before db_config gets imported
+tmp_dir = tempfile.mkdtemp()
+os.environ["DB_PATH"] = os.path.join(tmp_dir, "bench.db")
+
+from sqlalchemy import text
+from models import Base
+from db.db_config import engine
+from helper_modules import db_helper as db
+from helper_modules import availability
+
+PACKAGES = 200
+FIRST_DAY = date.today()
+
+
+def seed(bookings):
+    Base.metadata.create_all(engine)
+    rng = random.Random(1)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO Locations (country, city) VALUES ('Australia', 'Sydney')"))
+        conn.execute(text("INSERT INTO Users VALUES ('user@test.com', 'x', '0', 'First', 'Last', 0)"))
+        conn.execute(text("INSERT INTO Packages (location_id, name, description, duration, price, capacity) VALUES (1, :name, 'd', 5, 100, 100000)"),
+                     [{'name': f"Package {i}"} for i in range(PACKAGES)])
+        batch = []
+        for i in range(bookings):
+            start = FIRST_DAY + timedelta(days=rng.randrange(365))
+            batch.append({'package_id': rng.randrange(1, PACKAGES + 1), 'start_date': start.isoformat(),
+                          'end_date': (start + timedelta(days=5)).isoformat(), 'travellers': rng.randrange(1, 5),
+                          'status': rng.choice(['pending', 'confirmed', 'in-cart', 'cancelled'])})
+            if len(batch) == 50000 or i == bookings - 1:
+                conn.execute(text("""INSERT INTO Bookings (email, package_id, start_date, end_date, number_of_travellers, price, status)
+                                     VALUES ('user@test.com', :package_id, :start_date, :end_date, :travellers, 200, :status)"""), batch)
+                batch = []
+        conn.execute(text("ANALYZE"))
+
+
+def timed(fn, repeats=50):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return median(times)
+
+
+def sql_remaining(package_id, start, end):
+    rows = db.fetch_rows("""
+        SELECT start_date, end_date, number_of_travellers FROM Bookings
+        WHERE package_id = :package_id AND status IN ('pending', 'confirmed') AND start_date < :end AND end_date > :start
+    """, {'package_id': package_id, 'start': start.isoformat(), 'end': end.isoformat()}, as_tuples=True)
+    days = [0] * (end - start).days
+    for s, e, travellers in rows:
+        s, e = date.fromisoformat(s), date.fromisoformat(e)
+        for i in range(max((s - start).days, 0), min((e - start).days, len(days))):
+            days[i] += travellers
+    return 100000 - max(days)
+
+
+def main():
+    bookings = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    seed(bookings)
+    start = time.perf_counter()
+    availability.check_availability(1, FIRST_DAY, FIRST_DAY + timedelta(days=1))
+    print(f"{bookings} bookings, index loaded in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    trip_start = FIRST_DAY + timedelta(days=100)
+    trip_end = trip_start + timedelta(days=5)
+    month = FIRST_DAY + timedelta(days=120)
+    print(f"  {'range check, SQL':<30} {timed(lambda: sql_remaining(7, trip_start, trip_end)):>8.3f} ms")
+    print(f"  {'range check, index':<30} {timed(lambda: availability.check_availability(7, trip_start, trip_end, 4), 1000):>8.3f} ms")
+    first = month.replace(day=1)
+    print(f"  {'month calendar, SQL':<30} {timed(lambda: sql_remaining(7, first, first + timedelta(days=35))):>8.3f} ms")
+    print(f"  {'month calendar, index':<30} {timed(lambda: availability.get_calendar(7, month.year, month.month, 4), 1000):>8.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Checkout latency vs cart size: the old per-item write path (one session + commit per statement,
+order id found again with a SELECT) against checkout.finalize_order (one transaction).
+
+Run from backend/:  python benchmarks/bench_checkout.py [repeats]
+Set DB_MODE=production to benchmark with WAL / synchronous=NORMAL instead of the defaults.
+"""
+import os
+import sys
+import tempfile
+import time
+from statistics import median
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.join(BACKEND_DIR, "db"))
+
+# Point the engine at a scratch database before db_config gets imported
+tmp_dir = tempfile.mkdtemp()
+os.environ["DB_PATH"] = os.path.join(tmp_dir, "bench.db")
+
+from datetime import datetime
+from sqlalchemy import text
+from models import Base
+from db.db_config import engine
+from helper_modules import db_helper as db
+from helper_modules import checkout
+
+CART_SIZES = [1, 5, 10, 25, 50]
+EMAIL = 'bench@test.com'
+
+
+def seed():
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text(f"INSERT INTO Users VALUES ('{EMAIL}', 'x', '0', 'Bench', 'User', 0)"))
+        conn.execute(text("INSERT INTO Locations (country, city) VALUES ('Australia', 'Sydney')"))
+        conn.execute(text("INSERT INTO Packages (location_id, name, description, duration, price) VALUES (1, 'p', 'd', 5, 100)"))
+
+
+def make_cart(size):
+    with engine.begin() as conn:
+        return [
+            conn.execute(text(f"""
+                INSERT INTO Bookings (email, package_id, start_date, end_date, number_of_travellers, price, status)
+                VALUES ('{EMAIL}', 1, '2025-01-01', '2025-01-06', 2, 200, 'in-cart') RETURNING booking_id
+            """)).scalar_one()
+            for _ in range(size)
+        ]
+
+
+def legacy_checkout(booking_ids, total_price):
+    # the write path update_bookings_and_orders used before finalize_order
+    order_params = {
+        'email': EMAIL,
+        'total_price': total_price,
+        'order_date': datetime.now().strftime('%Y-%m-%d'),
+        'payment_date': datetime.now().strftime('%Y-%m-%d')
+    }
+    db.execute_query("""
+        INSERT INTO Orders (email, total_price, order_date, payment_date, payment_status)
+        VALUES (:email, :total_price, :order_date, :payment_date, 'paid')
+    """, order_params)
+    order_id = int(db.fetch_data("""
+        SELECT order_id FROM Orders
+        WHERE email = :email AND total_price = :total_price AND order_date = :order_date AND payment_date = :payment_date
+        ORDER BY order_id DESC LIMIT 1
+    """, order_params)['order_id'][0])
+    for booking_id in booking_ids:
+        db.execute_query("INSERT INTO OrderItems (order_id, booking_id) VALUES (:order_id, :booking_id)",
+                         {'order_id': order_id, 'booking_id': booking_id})
+        db.execute_query("UPDATE Bookings SET status = 'pending' WHERE booking_id = :booking_id",
+                         {'booking_id': booking_id})
+    return order_id
+
+
+def time_checkout(func, size, repeats):
+    timings = []
+    for _ in range(repeats):
+        cart = make_cart(size)
+        start = time.perf_counter()
+        func(cart, 200.0 * size)
+        timings.append(time.perf_counter() - start)
+    return median(timings) * 1000
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    seed()
+    print(f"DB_MODE={os.getenv('DB_MODE', 'development')}, median of {repeats} runs")
+    print(f"{'cart size':>9} {'legacy ms':>10} {'finalize_order ms':>18} {'speedup':>8}")
+    for size in CART_SIZES:
+        legacy = time_checkout(legacy_checkout, size, repeats)
+        batched = time_checkout(lambda cart, total: checkout.finalize_order(EMAIL, cart, total), size, repeats)
+        print(f"{size:>9} {legacy:>10.2f} {batched:>18.2f} {legacy / batched:>7.1f}x")
@@ -0,0 +1,74 @@
+"""
+Exporting a big table: the old backup path (fetch_data -> DataFrame -> to_json(indent=4)) against the
+streaming exporter (NDJSON / CSV / gzipped, batch by batch). Reports time and peak Python memory.
+
+Run from backend/:  python benchmarks/bench_export.py [bookings]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.join(BACKEND_DIR, "db"))
+
+# Point the engine at a scratch database before db_config gets imported
+tmp_dir = tempfile.mkdtemp()
+os.environ["DB_PATH"] = os.path.join(tmp_dir, "bench.db")
+
+from sqlalchemy import text
+from models import Base
+from db.db_config import engine
+from helper_modules import db_helper as db
+from helper_modules import exporter
+
+QUERY = "SELECT * FROM Bookings"
+
+
+def seed(bookings):
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO Locations (country, city) VALUES ('Australia', 'Sydney')"))
+        conn.execute(text("INSERT INTO Users VALUES ('user@test.com', 'x', '0', 'First', 'Last', 0)"))
+        conn.execute(text("INSERT INTO Packages (location_id, name, description, duration, price) VALUES (1, 'Package', 'd', 5, 100)"))
+        conn.execute(text("""
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :bookings)
+            INSERT INTO Bookings (email, package_id, start_date, end_date, number_of_travellers, price, status)
+            SELECT 'user@test.com', 1, date('2024-01-01', '+' || (i % 730) || ' days'),
+                   date('2024-01-06', '+' || (i % 730) || ' days'), 2, 200.5, 'confirmed' FROM n
+        """), {'bookings': bookings})
+
+
+def measure(label, fn):
+    path = os.path.join(tmp_dir, "out")
+    start = time.perf_counter()
+    fn(path)
+    elapsed = time.perf_counter() - start
+    # second run just for the memory peak, tracemalloc slows everything down too much to time it
+    tracemalloc.start()
+    fn(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = os.path.getsize(path)
+    os.remove(path)
+    print(f"  {label:<28} {elapsed * 1000:>9.0f} ms   peak {peak / 2**20:>8.1f} MB   file {size / 2**20:>7.1f} MB")
+
+
+def dataframe_backup(path):
+    db.fetch_data(QUERY).to_json(path, orient='records', indent=4)
+
+
+def main():
+    bookings = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    seed(bookings)
+    print(f"Exporting {bookings} bookings")
+    measure("DataFrame to_json (old)", dataframe_backup)
+    measure("stream ndjson", lambda path: exporter.export_to_file(QUERY, path))
+    measure("stream csv", lambda path: exporter.export_to_file(QUERY, path, fmt='csv'))
+    measure("stream ndjson + gzip", lambda path: exporter.export_to_file(QUERY, path, gzip=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Catalog facets at scale: the bitset index (helper_modules/facets.py) against working out the same
+matches and per-facet counts with SQL (one filtered id query plus a GROUP BY per facet).
+
+Run from backend/:  python benchmarks/bench_facets.py [packages]
+"""
+import os
+import sys
+import random
+import tempfile
+import time
+from statistics import median
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.join(BACKEND_DIR, "db"))
+
+# Point the engine at a scratch database before db_config gets imported
+tmp_dir = tempfile.mkdtemp()
+os.environ["DB_PATH"] = os.path.join(tmp_dir, "bench.db")
+
+from sqlalchemy import text
+from models import Base
+from db.db_config import engine
+from helper_modules import facets
+
+CATEGORIES = ["Adventure", "Budget", "Cultural", "Family", "Historical", "Luxury", "Nature", "Wellness"]
+LOCATIONS = 50
+
+
+def seed(packages):
+    Base.metadata.create_all(engine)
+    rng = random.Random(1)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO Locations (country, city) VALUES (:country, :city)"),
+                     [{'country': f"Country {i % 10}", 'city': f"City {i}"} for i in range(LOCATIONS)])
+        conn.execute(text("INSERT INTO Categories (name) VALUES (:name)"), [{'name': name} for name in CATEGORIES])
+        conn.execute(text("INSERT INTO Packages (location_id, name, description, duration, price) VALUES (:location_id, 'p', 'd', :duration, :price)"),
+                     [{'location_id': rng.randrange(1, LOCATIONS + 1), 'duration': rng.randrange(2, 20),
+                       'price': rng.randrange(20000, 800000) / 100} for _ in range(packages)])
+        conn.execute(text("INSERT INTO PackageCategory (package_id, category_id) VALUES (:package_id, :category_id)"),
+                     [{'package_id': package_id, 'category_id': category_id}
+                      for package_id in range(1, packages + 1)
+                      for category_id in rng.sample(range(1, len(CATEGORIES) + 1), rng.randrange(1, 4))])
+        conn.execute(text("ANALYZE"))
+
+
+def timed(fn, repeats=20):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return median(times)
+
+
+# The SQL side gets the same answers: matching ids, then each facet counted with every other filter applied
+def sql_facets(categories, city_ids, max_price, min_duration):
+    category_ids = ', '.join(str(CATEGORIES.index(name) + 1) for name in categories)
+    conditions = {
+        'category': f"EXISTS (SELECT 1 FROM PackageCategory pc WHERE pc.package_id = p.package_id AND pc.category_id IN ({category_ids}))",
+        'location': f"p.location_id IN ({', '.join(map(str, city_ids))})",
+        'price': f"p.price <= {max_price}",
+        'duration': f"p.duration >= {min_duration}",
+    }
+
+    def where(skip=None):
+        return ' AND '.join(condition for facet, condition in conditions.items() if facet != skip)
+
+    with engine.connect() as conn:
+        ids = conn.execute(text(f"SELECT p.package_id FROM Packages p WHERE {where()}")).fetchall()
+        conn.execute(text(f"SELECT pc.category_id, COUNT(*) FROM Packages p JOIN PackageCategory pc ON pc.package_id = p.package_id WHERE {where('category')} GROUP BY pc.category_id")).fetchall()
+        conn.execute(text(f"SELECT p.location_id, COUNT(*) FROM Packages p WHERE {where('location')} GROUP BY p.location_id")).fetchall()
+        conn.execute(text(f"SELECT CAST(p.price / 500 AS INTEGER), COUNT(*) FROM Packages p WHERE {where('price')} GROUP BY 1")).fetchall()
+        conn.execute(text(f"SELECT p.duration / 4, COUNT(*) FROM Packages p WHERE {where('duration')} GROUP BY 1")).fetchall()
+    return ids
+
+
+def main():
+    packages = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    seed(packages)
+    start = time.perf_counter()
+    facets.search(include_ids=False)
+    print(f"{packages} packages, index loaded in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    filters = {'category': 'Adventure,Luxury', 'location_id': ','.join(str(i) for i in range(1, 11)),
+               'max_price': 3000, 'min_duration': 5}
+    print(f"  {'ids + counts, SQL':<30} {timed(lambda: sql_facets(['Adventure', 'Luxury'], range(1, 11), 3000, 5)):>8.2f} ms")
+    print(f"  {'ids + counts, bitsets':<30} {timed(lambda: facets.search(filters)):>8.2f} ms")
+    print(f"  {'counts only, bitsets':<30} {timed(lambda: facets.search(filters, include_ids=False)):>8.2f} ms")
+    print(f"  {'counts only, bitsets, buckets':<30} {timed(lambda: facets.search({'category': 'Adventure', 'price': '1000-2000', 'duration': '4-8'}, include_ids=False)):>8.2f} ms")
+
+    start = time.perf_counter()
+    facets.update_packages([7])
+    print(f"  {'update one package':<30} {(time.perf_counter() - start) * 1000:>8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Compares the DataFrame read path (fetch_data -> to_dict) with the plain row path (fetch_rows)
+on a throwaway copy of the schema with a 100k row Bookings table.
+
+Run from backend/:  python benchmarks/bench_fetch_rows.py [row_count]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.join(BACKEND_DIR, "db"))
+
+# Point the engine at a scratch database before db_config gets imported
+tmp_dir = tempfile.mkdtemp()
+os.environ["DB_PATH"] = os.path.join(tmp_dir, "bench.db")
+
+from sqlalchemy import text
+from models import Base
+from db.db_config import engine
+from helper_modules import db_helper as db
+
+
+def seed(row_count):
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO Users VALUES ('bench@test.com', 'x', '0', 'Bench', 'User', 0)"))
+        conn.execute(text("INSERT INTO Locations (country, city) VALUES ('Australia', 'Sydney')"))
+        conn.execute(text("INSERT INTO Packages (location_id, name, description, duration, price) VALUES (1, 'p', 'd', 5, 100)"))
+        conn.execute(
+            text("""
+                INSERT INTO Bookings (email, package_id, start_date, end_date, number_of_travellers, price, status)
+                VALUES ('bench@test.com', 1, '2024-01-01', '2024-01-06', :n, :price, 'confirmed')
+            """),
+            [{"n": i % 6 + 1, "price": 100.0 + i % 50} for i in range(row_count)],
+        )
+
+
+def measure(label, func):
+    # time and memory are measured in separate runs since tracemalloc slows everything down
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    del result
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<32} {elapsed * 1000:9.1f} ms   peak {peak / 1024 / 1024:7.1f} MiB   rows {len(result)}")
+
+
+if __name__ == "__main__":
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    seed(row_count)
+    query = "SELECT * FROM Bookings"
+    db.fetch_rows(query)  # warm the schema cache so both paths start equal
+
+    print(f"SELECT * FROM Bookings, {row_count} rows")
+    measure("fetch_data + to_dict (before)", lambda: db.fetch_data(query).to_dict(orient='records'))
+    measure("fetch_rows dicts (after)", lambda: db.fetch_rows(query))
+    measure("fetch_rows tuples (after)", lambda: db.fetch_rows(query, as_tuples=True))
@@ -0,0 +1,53 @@
+"""
+PayPal create+capture throughput against the local fake server: the stock PayPalHttpClient
+(new connection per call, no timeouts) against the pooled gateway client, both from a thread pool.
+
+Run from backend/:  python benchmarks/bench_paypal_gateway.py [orders] [threads] [latency_s]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from benchmarks.fake_paypal import start_fake_paypal
+from paypalcheckoutsdk.core import PayPalHttpClient, PayPalEnvironment
+from paypalcheckoutsdk.orders import OrdersCreateRequest, OrdersCaptureRequest
+from helper_modules import payment_gateway
+
+
+def checkout_once(client):
+    create = OrdersCreateRequest()
+    create.prefer('return=minimal')
+    create.request_body({"intent": "CAPTURE",
+                         "purchase_units": [{"amount": {"currency_code": "AUD", "value": "100.00"}}]})
+    order_id = client.execute(create).result.id
+    return client.execute(OrdersCaptureRequest(order_id)).result.status
+
+
+def run(label, client, orders, threads, state):
+    before = dict(state.stats)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        statuses = list(pool.map(lambda _: checkout_once(client), range(orders)))
+    elapsed = time.perf_counter() - start
+    connections = state.stats['connections'] - before['connections']
+    tokens = state.stats['token'] - before['token']
+    print(f"{label:<22} {orders / elapsed:8.1f} orders/s  {elapsed * 1000:8.0f} ms  "
+          f"{connections:5} connections  {tokens:3} token calls  "
+          f"{statuses.count('COMPLETED')}/{orders} completed")
+
+
+if __name__ == "__main__":
+    orders = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.005
+
+    server, state, base_url = start_fake_paypal(latency=latency)
+    environment = PayPalEnvironment("bench-id", "bench-secret", base_url, base_url)
+
+    run("stock PayPalHttpClient", PayPalHttpClient(environment), orders, threads, state)
+    run("pooled gateway client", payment_gateway.PooledPayPalHttpClient(environment), orders, threads, state)
+    server.shutdown()
@@ -0,0 +1,124 @@
+"""
+Sales analytics at scale: helper_modules/sales.py answering from the SalesRollup table against grouping the raw
+order history (Orders x OrderItems x Bookings) for the same monthly time series, top 10 and cohort questions.
+The rollup has a row per day x package x status, so the gap grows with bookings per package per day.
+
+Run from backend/:  python benchmarks/bench_sales.py [bookings]
+"""
+import os
+import sys
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from statistics import median
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.join(BACKEND_DIR, "db"))
+
+# Point the engine at a scratch database before db_config gets imported
+tmp_dir = tempfile.mkdtemp()
+os.environ["DB_PATH"] = os.path.join(tmp_dir, "bench.db")
+
+import pandas as pd
+from sqlalchemy import text
+from models import Base
+from db.db_config import engine
+from sales_schema import create_sales_rollup
+from helper_modules import sales, query_cache
+
+PACKAGES = 50
+LOCATIONS = 50
+DAYS = 365
+STATUSES = ['pending', 'confirmed', 'confirmed', 'cancelled']
+
+
+def seed(bookings):
+    Base.metadata.create_all(engine)
+    rng = random.Random(1)
+    first_day = date(2024, 10, 1)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO Users (email, first_name, last_name, password, phone_number, is_admin) VALUES ('bench@example.com', 'B', 'B', 'x', '0', 0)"))
+        conn.execute(text("INSERT INTO Locations (country, city) VALUES (:country, :city)"),
+                     [{'country': f"Country {i % 10}", 'city': f"City {i}"} for i in range(LOCATIONS)])
+        conn.execute(text("INSERT INTO Packages (location_id, name, description, duration, price) VALUES (:location_id, :name, 'd', 7, :price)"),
+                     [{'location_id': rng.randrange(1, LOCATIONS + 1), 'name': f"Package {i}",
+                       'price': rng.randrange(20000, 800000) / 100} for i in range(PACKAGES)])
+        conn.execute(text("""INSERT INTO Bookings (email, package_id, start_date, end_date, number_of_travellers, price, status)
+                             VALUES ('bench@example.com', :package_id, '2027-01-01', '2027-01-08', :travellers, :price, :status)"""),
+                     [{'package_id': rng.randrange(1, PACKAGES + 1), 'travellers': rng.randrange(1, 5),
+                       'price': rng.randrange(20000, 3000000) / 100, 'status': rng.choice(STATUSES)} for _ in range(bookings)])
+        # One order per booking. create_all doesn't add the rollup triggers, create_sales_rollup does and backfills
+        conn.execute(text("INSERT INTO Orders (email, total_price, order_date, payment_status) VALUES ('bench@example.com', 0, :day, 'paid')"),
+                     [{'day': (first_day + timedelta(days=rng.randrange(DAYS))).isoformat()} for _ in range(bookings)])
+        conn.execute(text("INSERT INTO OrderItems (order_id, booking_id) SELECT booking_id, booking_id FROM Bookings"))
+        conn.execute(text("ANALYZE"))
+
+
+def timed(fn, repeats=10, cold=True):
+    times = []
+    for _ in range(repeats):
+        if cold:
+            query_cache.cache.clear()
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return median(times)
+
+
+RAW_QUERY = """
+    SELECT DATE(o.order_date) AS day, b.package_id, b.status, b.number_of_travellers AS travellers, b.price,
+           p.name AS package_name, p.location_id, l.city, l.country
+    FROM Orders o
+    JOIN OrderItems oi ON oi.order_id = o.order_id
+    JOIN Bookings b ON b.booking_id = oi.booking_id
+    JOIN Packages p ON p.package_id = b.package_id
+    JOIN Locations l ON l.location_id = p.location_id
+    WHERE b.status IN ('pending', 'confirmed')
+"""
+
+
+def raw_frame():
+    df = pd.read_sql(text(RAW_QUERY), engine)
+    df['day'] = pd.to_datetime(df['day'])
+    return df
+
+
+def raw_timeseries():
+    df = raw_frame()
+    df['period'] = df['day'].dt.to_period('M')
+    return df.groupby(['period', 'location_id']).agg(bookings=('package_id', 'size'), revenue=('price', 'sum'))
+
+
+def raw_top():
+    return raw_frame().groupby('package_id')['price'].sum().nlargest(10)
+
+
+def main():
+    bookings = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    seed(bookings)
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        create_sales_rollup(conn)
+    rows = pd.read_sql(text("SELECT COUNT(*) AS n FROM SalesRollup"), engine)['n'][0]
+    print(f"{bookings} ordered bookings, rollup backfilled to {rows} rows in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    print(f"  {'monthly by location, raw':<30} {timed(raw_timeseries):>8.2f} ms")
+    print(f"  {'monthly by location, rollup':<30} {timed(lambda: sales.timeseries('month', 'location')):>8.2f} ms")
+    print(f"  {'top 10 packages, raw':<30} {timed(raw_top):>8.2f} ms")
+    print(f"  {'top 10 packages, rollup':<30} {timed(lambda: sales.top('package', 'revenue', 10)):>8.2f} ms")
+    print(f"  {'cohorts, rollup':<30} {timed(lambda: sales.cohorts('revenue')):>8.2f} ms")
+    print(f"  {'top 10 packages, rollup cached':<30} {timed(lambda: sales.top('package', 'revenue', 10), cold=False):>8.2f} ms")
+
+    # Incremental cost: one booking changing status runs the Bookings update trigger
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for booking_id in range(1, 101):
+            conn.execute(text("UPDATE Bookings SET status = 'cancelled' WHERE booking_id = :b"), {'b': booking_id})
+        conn.commit()
+    print(f"  {'status change + rollup update':<30} {(time.perf_counter() - start) * 10:>8.2f} ms each")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Package search at scale: the FTS5 index (helper_modules/package_search.py) against the catalog's
+LIKE '%q%' filter over name and description.
+
+Run from backend/:  python benchmarks/bench_search.py [packages]
+"""
+import os
+import sys
+import random
+import tempfile
+import time
+from statistics import median
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.join(BACKEND_DIR, "db"))
+
+# Point the engine at a scratch database before db_config gets imported
+tmp_dir = tempfile.mkdtemp()
+os.environ["DB_PATH"] = os.path.join(tmp_dir, "bench.db")
+
+from sqlalchemy import text
+from models import Base
+from db.db_config import engine
+from db.search_schema import create_search_index
+from helper_modules import catalog
+from helper_modules import package_search
+
+WORDS = ("beach island city tour museum hiking mountain lake river wine food market castle temple safari "
+         "snorkel reef desert rainforest cruise spa luxury family budget adventure culture history night "
+         "walking cycling kayak festival ancient harbour coast village valley glacier volcano").split()
+# Descriptions are mostly filler from a big vocabulary with a few of the theme words mixed in
+FILLER = [f"word{i}" for i in range(5000)]
+CITIES = [("Australia", "Sydney"), ("France", "Paris"), ("Italy", "Rome"), ("Japan", "Kyoto"), ("Peru", "Cusco")]
+
+
+def seed(packages):
+    Base.metadata.create_all(engine)
+    rng = random.Random(1)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO Locations (country, city) VALUES (:country, :city)"),
+                     [{'country': country, 'city': city} for country, city in CITIES])
+        conn.execute(text("INSERT INTO Packages (location_id, name, description, duration, price) VALUES (:location_id, :name, :description, :duration, :price)"),
+                     [{'location_id': rng.randrange(1, len(CITIES) + 1),
+                       'name': ' '.join(rng.choice(WORDS).title() for _ in range(3)),
+                       'description': ' '.join(rng.sample(FILLER, 50) + rng.sample(WORDS, 4)),
+                       'duration': rng.randrange(2, 15), 'price': rng.randrange(300, 5000)}
+                      for _ in range(packages)])
+        # create_all doesn't know about the FTS table, build it the way the migration does
+        create_search_index(conn)
+        conn.execute(text("ANALYZE"))
+
+
+def timed(fn, repeats=20):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return median(times)
+
+
+# Both sides without the response cache: a page of 50 ids plus the total, like the endpoints return
+def like_search(q, **filters):
+    where, params = catalog.build_filters({'q': q, **filters})
+    from_sql = f"FROM Packages p LEFT JOIN Locations l ON p.location_id = l.location_id {where}"
+    with engine.connect() as conn:
+        conn.execute(text(f"SELECT COUNT(*) {from_sql}"), params).scalar()
+        return conn.execute(text(f"SELECT p.package_id {from_sql} ORDER BY p.package_id LIMIT 50"), params).fetchall()
+
+
+def fts_search(q, **filters):
+    where, params = catalog.build_filters(filters)
+    match = package_search.build_match(q)
+    params.update({'match': match, 'limit': 50, 'offset': 0})
+    filters_sql = where.replace('WHERE', 'AND', 1) if where else ''
+    with engine.connect() as conn:
+        rows = conn.execute(text(package_search.SEARCH_QUERY.format(filters=filters_sql)), params).fetchall()
+        id_params = {f"id{i}": row[0] for i, row in enumerate(rows)}
+        if id_params:
+            conn.execute(text(package_search.HIGHLIGHT_QUERY.format(placeholders=', '.join(f":{key}" for key in id_params))),
+                         {'match': match, **id_params}).fetchall()
+        return rows
+
+
+def main():
+    packages = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    start = time.perf_counter()
+    seed(packages)
+    print(f"{packages} packages seeded and indexed in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    for label, q, filters in (("one word", "volcano", {}),
+                              ("rare word", "word4242", {}),
+                              ("prefix", "glac", {}),
+                              ("two words + price", "wine castle", {'max_price': 1500})):
+        print(f"  {label + ', LIKE':<30} {timed(lambda: like_search(q, **filters)):>8.2f} ms")
+        print(f"  {label + ', FTS5':<30} {timed(lambda: fts_search(q, **filters)):>8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""
+Local stand-in for the PayPal sandbox, for load runs and offline testing of the checkout flow.
+
+Serves the endpoints the backend uses (OAuth token, create, get and capture order) with
+responses shaped like the real ones, so the capture route's result parsing works unchanged.
+
+Run from backend/:
+    python benchmarks/fake_paypal.py --port 8099 --latency 0.05 --fail-rate 0.1
+then start the app with PAYPAL_API_URL=http://localhost:8099
+"""
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakePayPalState:
+    def __init__(self, latency=0.0, fail_rate=0.0, token_ttl=32400):
+        self.latency = latency          # seconds added to every response
+        self.fail_rate = fail_rate      # share of order calls answered with a 503
+        self.token_ttl = token_ttl
+        self.orders = {}                # order_id -> purchase unit (amount, custom_id) until captured
+        self.captures = {}              # PayPal-Request-Id -> capture response, to mimic PayPal's idempotency
+        self.stats = {'token': 0, 'create': 0, 'capture': 0, 'failed': 0, 'connections': 0}
+        self.lock = threading.Lock()
+
+
+def _now():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _capture_body(order_id, amount):
+    value = float(amount['value'])
+    fee = round(value * 0.026 + 0.30, 2)
+    money = lambda v: {"currency_code": amount['currency_code'], "value": f"{v:.2f}"}
+    link = lambda rel: {"href": f"https://api.sandbox.paypal.com/v2/checkout/orders/{order_id}", "rel": rel, "method": "GET"}
+    return {
+        "id": order_id,
+        "status": "COMPLETED",
+        "payment_source": {"paypal": {
+            "email_address": "buyer@example.com", "account_id": "FAKEBUYER01", "account_status": "VERIFIED",
+            "name": {"given_name": "Test", "surname": "Buyer"}, "address": {"country_code": "AU"},
+        }},
+        "purchase_units": [{
+            "reference_id": "default",
+            "shipping": {"name": {"full_name": "Test Buyer"}, "address": {
+                "address_line_1": "1 Test St", "address_line_2": None, "admin_area_1": "NSW",
+                "admin_area_2": "Sydney", "postal_code": "2000", "country_code": "AU",
+            }},
+            "payments": {"captures": [{
+                "id": uuid.uuid4().hex[:17].upper(),
+                "status": "COMPLETED",
+                "amount": money(value),
+                "final_capture": True,
+                "seller_protection": {"status": "ELIGIBLE"},
+                "seller_receivable_breakdown": {
+                    "gross_amount": money(value), "paypal_fee": money(fee), "net_amount": money(value - fee),
+                },
+                "create_time": _now(), "update_time": _now(),
+                "links": [link("self")],
+            }]},
+        }],
+        "payer": {
+            "name": {"given_name": "Test", "surname": "Buyer"}, "email_address": "buyer@example.com",
+            "payer_id": "FAKEBUYER01", "address": {"country_code": "AU"},
+        },
+        "links": [link("self")],
+    }
+
+
+def make_handler(state):
+    class FakePayPalHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive, so pooled clients reuse connections
+        disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+        def setup(self):
+            super().setup()
+            with state.lock:
+                state.stats['connections'] += 1
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            if state.latency:
+                time.sleep(state.latency)
+
+            if self.path == "/v1/oauth2/token":
+                with state.lock:
+                    state.stats['token'] += 1
+                return self._send(200, {"access_token": f"FAKE-{uuid.uuid4().hex}", "token_type": "Bearer",
+                                        "expires_in": state.token_ttl, "scope": "fake"})
+
+            if not self.headers.get("Authorization", "").startswith("Bearer "):
+                return self._send(401, {"name": "AUTHENTICATION_FAILURE"})
+
+            if random.random() < state.fail_rate:
+                with state.lock:
+                    state.stats['failed'] += 1
+                return self._send(503, {"name": "SERVICE_UNAVAILABLE"})
+
+            if self.path == "/v2/checkout/orders":
+                body = json.loads(raw or b"{}")
+                order_id = uuid.uuid4().hex[:17].upper()
+                with state.lock:
+                    state.orders[order_id] = body["purchase_units"][0]
+                    state.stats['create'] += 1
+                return self._send(201, {"id": order_id, "status": "CREATED", "links": [
+                    {"href": f"https://www.sandbox.paypal.com/checkoutnow?token={order_id}", "rel": "approve", "method": "GET"},
+                    {"href": f"https://api.sandbox.paypal.com/v2/checkout/orders/{order_id}/capture", "rel": "capture", "method": "POST"},
+                ]})
+
+            if self.path.startswith("/v2/checkout/orders/") and self.path.endswith("/capture"):
+                order_id = self.path.split("/")[4]
+                request_id = self.headers.get("PayPal-Request-Id")
+                with state.lock:
+                    if request_id and request_id in state.captures:
+                        return self._send(201, state.captures[request_id])
+                    unit = state.orders.pop(order_id, None)
+                    if unit is None:
+                        return self._send(422, {"name": "UNPROCESSABLE_ENTITY", "details": [{"issue": "ORDER_ALREADY_CAPTURED"}]})
+                    body = _capture_body(order_id, unit["amount"])
+                    if request_id:
+                        state.captures[request_id] = body
+                    state.stats['capture'] += 1
+                return self._send(201, body)
+
+            self._send(404, {"name": "RESOURCE_NOT_FOUND"})
+
+        def do_GET(self):
+            if state.latency:
+                time.sleep(state.latency)
+            if not self.headers.get("Authorization", "").startswith("Bearer "):
+                return self._send(401, {"name": "AUTHENTICATION_FAILURE"})
+            if self.path.startswith("/v2/checkout/orders/"):
+                order_id = self.path.split("/")[4].split("?")[0]
+                with state.lock:
+                    unit = state.orders.get(order_id)
+                if unit is not None:
+                    return self._send(200, {"id": order_id, "status": "APPROVED", "intent": "CAPTURE",
+                                            "purchase_units": [{"reference_id": "default", **unit}]})
+            self._send(404, {"name": "RESOURCE_NOT_FOUND"})
+
+    return FakePayPalHandler
+
+
+def start_fake_paypal(port=0, latency=0.0, fail_rate=0.0):
+    """
+    Starts the fake server on a background thread.
+
+    Returns:
+        tuple: (server, state, base_url). Call server.shutdown() when done.
+    """
+    state = FakePayPalState(latency=latency, fail_rate=fail_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fake PayPal REST API")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of order calls answered with a 503")
+    args = parser.parse_args()
+
+    server, state, base_url = start_fake_paypal(args.port, args.latency, args.fail_rate)
+    print(f"Fake PayPal listening on {base_url} (set PAYPAL_API_URL={base_url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"Stats: {state.stats}")
+        sys.exit(0)
@@ -1,12 +1,102 @@
 import os
-from sqlalchemy import create_engine
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+load_dotenv()
 
 # Fetch the database URL from the environment variables, or use a default
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATABASE_URL = f'sqlite:///{os.path.join(BASE_DIR, "holidaybookingsystem.db")}'
-# Create the engine
-engine = create_engine(DATABASE_URL)
+DATABASE_PATH = os.getenv("DB_PATH", os.path.join(BASE_DIR, "holidaybookingsystem.db"))
+DATABASE_URL = f'sqlite:///{DATABASE_PATH}'
+
+# "production" turns on WAL + tuned pragmas + a sized pool, anything else keeps the plain defaults
+DB_MODE = os.getenv("DB_MODE", "development").lower()
+
+# Engine tuning, all overridable from the environment / .env file
+DB_CONFIG = {
+    "pool_size":        int(os.getenv("DB_POOL_SIZE", 10)),
+    "max_overflow":     int(os.getenv("DB_MAX_OVERFLOW", 20)),
+    "pool_timeout":     int(os.getenv("DB_POOL_TIMEOUT", 30)),        # seconds to wait for a free connection
+    "pool_recycle":     int(os.getenv("DB_POOL_RECYCLE", 3600)),      # seconds before a connection is replaced
+    "busy_timeout":     int(os.getenv("DB_BUSY_TIMEOUT_MS", 5000)),   # ms sqlite waits on a locked db
+    "synchronous":      os.getenv("DB_SYNCHRONOUS", "NORMAL"),
+    "mmap_size":        int(os.getenv("DB_MMAP_SIZE", 256 * 1024 * 1024)),
+    "cache_size":       int(os.getenv("DB_CACHE_SIZE_KB", 64 * 1024)),  # in KiB
+}
+
+
+def _apply_pragmas(dbapi_connection, read_only=False):
+    """
+    Runs the tuning pragmas on a freshly opened sqlite connection.
+
+    Args:
+        dbapi_connection: The raw sqlite3 connection handed to the connect event.
+        read_only (bool): Skip the pragmas that need write access (journal_mode / synchronous).
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {DB_CONFIG['busy_timeout']}")
+    if read_only:
+        cursor.execute("PRAGMA query_only = ON")
+    else:
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute(f"PRAGMA synchronous = {DB_CONFIG['synchronous']}")
+    cursor.execute(f"PRAGMA mmap_size = {DB_CONFIG['mmap_size']}")
+    cursor.execute(f"PRAGMA cache_size = -{DB_CONFIG['cache_size']}")  # negative means KiB rather than pages
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    cursor.close()
+
+
+def build_engine(read_only=False):
+    """
+    Creates an engine for the booking database.
+
+    In production mode the engine gets a sized QueuePool with pre-ping and every new
+    connection is tuned through a connect event. The read-only engine opens the file
+    with mode=ro so SELECT traffic can run alongside writers under WAL.
+
+    Args:
+        read_only (bool): Whether to build the read-only engine.
+
+    Returns:
+        Engine: The configured SQLAlchemy engine.
+    """
+    if DB_MODE != "production":
+        return create_engine(DATABASE_URL)
+
+    url = f'sqlite:///file:{DATABASE_PATH}?mode=ro&uri=true' if read_only else DATABASE_URL
+    new_engine = create_engine(
+        url,
+        poolclass=QueuePool,
+        pool_size=DB_CONFIG["pool_size"],
+        max_overflow=DB_CONFIG["max_overflow"],
+        pool_timeout=DB_CONFIG["pool_timeout"],
+        pool_recycle=DB_CONFIG["pool_recycle"],
+        pool_pre_ping=True,
+        connect_args={
+            "check_same_thread": False,  # pooled connections get handed between request threads
+            "timeout": DB_CONFIG["busy_timeout"] / 1000,
+        },
+    )
+
+    @event.listens_for(new_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        _apply_pragmas(dbapi_connection, read_only=read_only)
+
+    return new_engine
+
+
+# Create the engines
+engine = build_engine()
+if DB_MODE == "production":
+    # make sure the file is in WAL mode before any read-only connection opens it
+    with engine.connect():
+        pass
+    read_engine = build_engine(read_only=True)
+else:
+    read_engine = engine
 
-# Create a sessionmaker factory that binds to the engine
+# Create sessionmaker factories that bind to the engines
 Session = sessionmaker(bind=engine)
+ReadSession = sessionmaker(bind=read_engine)
@@ -1,19 +1,32 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from models import Users, Packages, Bookings, Orders, OrderItems, Locations, Categories, PackageCategory, PackageImages
+from models import Users, Packages, Bookings, Orders, OrderItems, Locations, Categories, PackageCategory, PackageImages, PackagePopularity, IdempotencyKeys, PackageImageVariants, PackageCapacity, BookingHolds, SalesRollup
 from db_config import engine, Session
+from schema_registry import invalidate_schema_cache
+from migrations import stamp_latest
+from search_schema import create_search_index
+from sales_schema import create_sales_rollup
+from sqlalchemy import text
 from datetime import datetime, timedelta
 
 
 def reset_database():
     from models import Base  # Ensure that the Base is imported from the correct location
     Base.metadata.drop_all(engine)  # Drop all tables if they exist
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS PackageSearch"))  # FTS table isn't a model
+    invalidate_schema_cache()
     print("Database wiped!")
 
 
 def setup_database():
     from models import Base  # Ensure that the Base is imported from the correct location
-    Base.metadata.create_all(engine)  # This creates all tables defined
+    Base.metadata.create_all(engine)  # This creates all tables defined (and their indexes)
+    with engine.begin() as conn:
+        create_search_index(conn)  # FTS table + the triggers that keep it in sync
+        create_sales_rollup(conn)  # rollup triggers (the table itself comes from create_all)
+    stamp_latest()  # a fresh db already has everything the migrations would add
+    invalidate_schema_cache()
     print("Database and tables created!")
 
 
@@ -0,0 +1,219 @@
+import sys
+from sqlalchemy import text
+from db_config import engine
+from models import Base
+from schema_registry import invalidate_schema_cache
+from search_schema import create_search_index
+from sales_schema import create_sales_rollup, recreate_sales_triggers
+
+# Versioned, in-place upgrades for an existing holidaybookingsystem.db.
+# The applied version lives in PRAGMA user_version, so a fresh db (setup_database) is stamped with
+# the latest version and an old db is walked forward one migration at a time.
+#
+# To add a migration: write a function taking a connection, append it to MIGRATIONS. Never edit or
+# reorder ones that already shipped.
+
+
+def _create_popularity_table(conn):
+    """Adds PackagePopularity and backfills it from the order history."""
+    Base.metadata.tables['PackagePopularity'].create(conn, checkfirst=True)
+    conn.execute(text("DELETE FROM PackagePopularity"))
+    conn.execute(text("""
+        INSERT INTO PackagePopularity (package_id, day, order_count)
+        SELECT b.package_id, DATE(o.order_date), COUNT(*)
+        FROM Orders o
+        JOIN OrderItems oi ON oi.order_id = o.order_id
+        JOIN Bookings b ON b.booking_id = oi.booking_id
+        GROUP BY b.package_id, DATE(o.order_date)
+    """))
+
+
+def _create_indexes(conn, statements):
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+# Index migrations spell out their statements instead of reading the models, so what they create stays fixed
+# at the tables that existed at their version (fresh dbs get the models' indexes from create_all)
+HOT_PATH_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_bookings_email_status ON Bookings (email, status)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_email_order_date ON Orders (email, order_date)",
+    "CREATE INDEX IF NOT EXISTS ix_packageimages_package_id ON PackageImages (package_id)",
+    "CREATE INDEX IF NOT EXISTS ix_packagecategory_category_id ON PackageCategory (category_id)",
+    "CREATE INDEX IF NOT EXISTS ix_packages_location_id ON Packages (location_id)",
+    "CREATE INDEX IF NOT EXISTS ix_orderitems_booking_id ON OrderItems (booking_id)",
+]
+
+ADMIN_BOOKINGS_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_bookings_start_date_id ON Bookings (start_date, booking_id)",
+    "CREATE INDEX IF NOT EXISTS ix_bookings_status_start_date ON Bookings (status, start_date, booking_id)",
+    "CREATE INDEX IF NOT EXISTS ix_bookings_package_start_date ON Bookings (package_id, start_date, booking_id)",
+    "CREATE INDEX IF NOT EXISTS ix_bookings_email_start_date ON Bookings (email, start_date, booking_id)",
+]
+
+
+def _create_hot_path_indexes(conn):
+    """Secondary indexes for the cart, orders, images, category and location lookups."""
+    _create_indexes(conn, HOT_PATH_INDEXES)
+
+
+def _create_admin_bookings_indexes(conn):
+    """Keyset indexes for the admin bookings listing, each ends in (start_date, booking_id)."""
+    _create_indexes(conn, ADMIN_BOOKINGS_INDEXES)
+
+
+def _create_idempotency_table(conn):
+    """Adds IdempotencyKeys for replaying capture / update-orders responses."""
+    Base.metadata.tables['IdempotencyKeys'].create(conn, checkfirst=True)
+
+
+def _create_image_variants_table(conn):
+    """Adds PackageImageVariants (run helper_modules.image_variants backfill afterwards to fill it)."""
+    Base.metadata.tables['PackageImageVariants'].create(conn, checkfirst=True)
+
+
+CAPACITY_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_booking_holds_package_start ON BookingHolds (package_id, start_date)",
+]
+
+
+def _add_capacity(conn):
+    """Adds Packages.capacity (NULL = unlimited), the PackageCapacity overrides and BookingHolds."""
+    columns = [row[1] for row in conn.execute(text("PRAGMA table_info(Packages)")).fetchall()]
+    if 'capacity' not in columns:
+        conn.execute(text("ALTER TABLE Packages ADD COLUMN capacity INTEGER"))
+    Base.metadata.tables['PackageCapacity'].create(conn, checkfirst=True)
+    Base.metadata.tables['BookingHolds'].create(conn, checkfirst=True)
+    _create_indexes(conn, CAPACITY_INDEXES)
+
+
+MIGRATIONS = [
+    (1, "PackagePopularity table + backfill", _create_popularity_table),
+    (2, "hot path secondary indexes", _create_hot_path_indexes),
+    (3, "IdempotencyKeys table", _create_idempotency_table),
+    (4, "PackageImageVariants table", _create_image_variants_table),
+    (5, "admin bookings keyset indexes", _create_admin_bookings_indexes),
+    (6, "package capacity + booking holds", _add_capacity),
+    (7, "PackageSearch full-text index + sync triggers", create_search_index),
+    (8, "SalesRollup table + triggers + backfill", create_sales_rollup),
+    (9, "SalesRollup triggers drop emptied rows", recreate_sales_triggers),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# Hot queries and the table each one must reach through an index rather than a full scan
+# (no table aliases, the plan names the alias instead of the table)
+HOT_QUERIES = [
+    ("cart items", "Bookings",
+     "SELECT * FROM Bookings WHERE email = 'x' AND status = 'in-cart'"),
+    ("user orders", "Orders",
+     "SELECT * FROM Orders WHERE email = 'x' ORDER BY order_date DESC"),
+    ("package images", "PackageImages",
+     "SELECT image_path FROM PackageImages WHERE package_id = 1 ORDER BY image_id"),
+    ("packages in category", "PackageCategory",
+     "SELECT package_id FROM PackageCategory WHERE category_id = 1"),
+    ("packages at location", "Packages",
+     "SELECT package_id FROM Packages WHERE location_id = 1"),
+    ("order items for booking", "OrderItems",
+     "SELECT order_id FROM OrderItems WHERE booking_id = 1"),
+    ("admin bookings page", "Bookings",
+     "SELECT * FROM Bookings WHERE (start_date, booking_id) > ('2025-01-01', 1) ORDER BY start_date, booking_id LIMIT 101"),
+    ("admin bookings by status", "Bookings",
+     "SELECT * FROM Bookings WHERE status = 'pending' AND (start_date, booking_id) > ('2025-01-01', 1) ORDER BY start_date, booking_id LIMIT 101"),
+    ("admin bookings by package", "Bookings",
+     "SELECT * FROM Bookings WHERE package_id = 1 AND start_date >= '2025-01-01' ORDER BY start_date, booking_id LIMIT 101"),
+    ("package occupancy", "Bookings",
+     "SELECT start_date, end_date FROM Bookings WHERE package_id = 1 AND start_date < '2025-02-01' AND end_date > '2025-01-01'"),
+    ("package holds", "BookingHolds",
+     "SELECT start_date, end_date FROM BookingHolds WHERE package_id = 1 AND start_date < '2025-02-01'"),
+    ("package search", "PackageSearch",
+     "SELECT rowid FROM PackageSearch WHERE PackageSearch MATCH '\"beach\"*' ORDER BY rank LIMIT 50"),
+    ("sales rollup by package", "SalesRollup",
+     "SELECT day, status, revenue_cents FROM SalesRollup WHERE package_id = 1 AND day >= '2025-01-01'"),
+    ("admin bookings by user", "Bookings",
+     "SELECT * FROM Bookings WHERE email = 'x' ORDER BY start_date, booking_id LIMIT 101"),
+]
+
+
+def get_version(conn):
+    return conn.execute(text("PRAGMA user_version")).scalar()
+
+
+def _set_version(conn, version):
+    # PRAGMA can't take bind parameters, version is always an int from MIGRATIONS
+    conn.execute(text(f"PRAGMA user_version = {int(version)}"))
+
+
+def stamp_latest():
+    """
+    Marks the database as fully migrated. Used after create_all on a fresh database.
+    """
+    with engine.begin() as conn:
+        _set_version(conn, LATEST_VERSION)
+
+
+def upgrade():
+    """
+    Applies every migration newer than the database's current version, each in its own transaction.
+
+    Returns:
+        int: The version the database ends up at.
+    """
+    with engine.connect() as conn:
+        current = get_version(conn)
+
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        print(f"Applying migration {version}: {description}")
+        with engine.begin() as conn:
+            migrate(conn)
+            _set_version(conn, version)
+        current = version
+
+    invalidate_schema_cache()
+    print(f"Database at version {current}.")
+    return current
+
+
+def _uses_index(step):
+    # FTS5 reports a MATCH lookup as a SCAN of the virtual table with an M in its index string
+    if "VIRTUAL TABLE INDEX" in step:
+        return ":M" in step
+    return step.startswith("SEARCH") and "INDEX" in step
+
+
+def verify_indexes():
+    """
+    Runs EXPLAIN QUERY PLAN on each hot query and checks its table is searched through an index.
+
+    Returns:
+        list: (name, table, uses_index, plan lines) per hot query.
+    """
+    results = []
+    with engine.connect() as conn:
+        for name, table, query in HOT_QUERIES:
+            plan = [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {query}")).fetchall()]
+            table_steps = [step for step in plan if f" {table} " in f" {step} "]
+            uses_index = bool(table_steps) and all(_uses_index(step) for step in table_steps)
+            results.append((name, table, uses_index, plan))
+    return results
+
+
+if __name__ == "__main__":
+    # Run from backend/db:  python migrations.py [upgrade|status|verify]
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if command == "upgrade":
+        upgrade()
+    elif command == "status":
+        with engine.connect() as conn:
+            print(f"Database at version {get_version(conn)}, latest is {LATEST_VERSION}.")
+    elif command == "verify":
+        all_ok = True
+        for name, table, uses_index, plan in verify_indexes():
+            all_ok = all_ok and uses_index
+            print(f"{'OK  ' if uses_index else 'SCAN'} {name:<26} {' | '.join(plan)}")
+        sys.exit(0 if all_ok else 1)
+    else:
+        print("Usage: python migrations.py [upgrade|status|verify]")
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, Date, DateTime, ForeignKey, Index
+from models import Base
+
+class BookingHolds(Base):
+    __tablename__ = 'BookingHolds'
+    __table_args__ = (
+        Index('ix_booking_holds_package_start', 'package_id', 'start_date'),
+    )
+
+    # Capacity held for an in-cart booking while its PayPal payment is in flight, gone once expires_at passes
+    booking_id              = Column(Integer, ForeignKey('Bookings.booking_id', ondelete='CASCADE'), primary_key=True)
+    package_id              = Column(Integer, ForeignKey('Packages.package_id'), nullable=False)
+    start_date              = Column(Date, nullable=False)
+    end_date                = Column(Date, nullable=False)
+    number_of_travellers    = Column(Integer, nullable=False)
+    expires_at              = Column(DateTime, nullable=False)
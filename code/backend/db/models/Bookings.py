@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, Date, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Numeric, Date, ForeignKey, Enum, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -6,6 +6,14 @@ from models import Base
 
 class Bookings(Base):
     __tablename__ = 'Bookings'
+    __table_args__ = (
+        Index('ix_bookings_email_status', 'email', 'status'),
+        # admin listing keyset indexes, each ends in (start_date, booking_id) so filtered pages are range seeks
+        Index('ix_bookings_start_date_id', 'start_date', 'booking_id'),
+        Index('ix_bookings_status_start_date', 'status', 'start_date', 'booking_id'),
+        Index('ix_bookings_package_start_date', 'package_id', 'start_date', 'booking_id'),
+        Index('ix_bookings_email_start_date', 'email', 'start_date', 'booking_id'),
+    )
     
     booking_id              = Column(Integer, primary_key=True, autoincrement=True)
     email                   = Column(String, ForeignKey('Users.email'), nullable=False)
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from models import Base
+
+class IdempotencyKeys(Base):
+    __tablename__ = 'IdempotencyKeys'
+
+    # One row per completed idempotent request, e.g. scope 'capture' + the PayPal order id
+    scope           = Column(String, primary_key=True)
+    idem_key        = Column(String, primary_key=True)
+    status_code     = Column(Integer, nullable=False)
+    response        = Column(Text, nullable=False)      # JSON body that was returned
+    created_at      = Column(DateTime, nullable=False)
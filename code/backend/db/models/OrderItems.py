@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Numeric, Date, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -6,6 +6,9 @@ from models import Base
 
 class OrderItems(Base):
     __tablename__ = 'OrderItems'
+    __table_args__ = (
+        Index('ix_orderitems_booking_id', 'booking_id'),
+    )
     
     order_id        = Column(Integer, ForeignKey('Orders.order_id'), primary_key=True, nullable=False)
     booking_id      = Column(Integer, ForeignKey('Bookings.booking_id'), primary_key=True, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Numeric, Date, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Boolean, Numeric, Date, ForeignKey, Enum, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from decimal import Decimal
@@ -7,6 +7,9 @@ from models import Base
 
 class Orders(Base):
     __tablename__ = 'Orders'
+    __table_args__ = (
+        Index('ix_orders_email_order_date', 'email', 'order_date'),
+    )
     
     order_id        = Column(Integer, primary_key=True, autoincrement=True)
     email           = Column(String, ForeignKey('Users.email'), nullable=False)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey
+from sqlalchemy.orm import relationship
+from models import Base
+
+class PackageCapacity(Base):
+    __tablename__ = 'PackageCapacity'
+
+    # Per-day capacity that overrides Packages.capacity, e.g. an extra departure or a smaller group on one date
+    package_id      = Column(Integer, ForeignKey('Packages.package_id', ondelete='CASCADE'), primary_key=True)
+    day             = Column(Date, primary_key=True)
+    capacity        = Column(Integer, nullable=False)
+
+    # Relationships
+    package         = relationship('Packages', back_populates='capacity_overrides')
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Numeric, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, Numeric, Date, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from decimal import Decimal
@@ -7,6 +7,9 @@ from models import Base
 
 class PackageCategory(Base):
     __tablename__ = 'PackageCategory'
+    __table_args__ = (
+        Index('ix_packagecategory_category_id', 'category_id'),
+    )
     
     package_id      = Column(Integer, ForeignKey('Packages.package_id'), primary_key=True)
     category_id     = Column(Integer, ForeignKey('Categories.category_id'), primary_key=True)
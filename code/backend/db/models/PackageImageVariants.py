@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy.orm import relationship
+from models import Base
+
+class PackageImageVariants(Base):
+    __tablename__ = 'PackageImageVariants'
+
+    # Resized copies of a PackageImages row, e.g. ('card', 'webp') -> package_images/variants/3_card.webp
+    image_id        = Column(Integer, ForeignKey('PackageImages.image_id'), primary_key=True)
+    variant         = Column(String, primary_key=True)      # thumb / card / hero
+    format          = Column(String, primary_key=True)      # webp / jpeg
+    image_path      = Column(String, nullable=False)        # relative to backend/images, like PackageImages.image_path
+    width           = Column(Integer, nullable=False)
+    height          = Column(Integer, nullable=False)
+
+    # Relationships
+    image           = relationship('PackageImages', back_populates='variants')
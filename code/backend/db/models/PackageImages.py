@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Numeric, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, Numeric, Date, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from decimal import Decimal
@@ -7,10 +7,14 @@ from models import Base
 
 class PackageImages(Base):
     __tablename__ = 'PackageImages'
+    __table_args__ = (
+        Index('ix_packageimages_package_id', 'package_id'),
+    )
     
     image_id        = Column(Integer, primary_key=True, autoincrement=True)
     package_id      = Column(Integer, ForeignKey('Packages.package_id'), nullable=False)
     image_path      = Column(String, nullable=False)
     
     # Relationships
-    package         = relationship('Packages', back_populates='images')
\ No newline at end of file
+    package         = relationship('Packages', back_populates='images')
+    variants        = relationship('PackageImageVariants', back_populates='image')
\ No newline at end of file
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey
+from sqlalchemy.orm import relationship
+from models import Base
+
+class PackagePopularity(Base):
+    __tablename__ = 'PackagePopularity'
+
+    # One row per package per day, order_count = order items for that package on that day
+    package_id      = Column(Integer, ForeignKey('Packages.package_id'), primary_key=True)
+    day             = Column(Date, primary_key=True)
+    order_count     = Column(Integer, nullable=False, default=0)
+
+    # Relationships
+    package         = relationship('Packages', back_populates='popularity')
@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String, Numeric, ForeignKey
+from sqlalchemy import Column, Integer, String, Numeric, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from models import Base
 
 class Packages(Base):
     __tablename__ = 'Packages'
+    __table_args__ = (
+        Index('ix_packages_location_id', 'location_id'),
+    )
     
     package_id          = Column(Integer, primary_key=True, autoincrement=True)
     location_id         = Column(Integer, ForeignKey('Locations.location_id'), nullable=False)
@@ -12,9 +15,12 @@ class Packages(Base):
     description         = Column(String, nullable=False)
     duration            = Column(Integer, nullable=False)
     price               = Column(Numeric(10, 2), nullable=False)
+    capacity            = Column(Integer, nullable=True)   # travellers per day, NULL = unlimited
     
     # Relationships
     bookings            = relationship('Bookings', back_populates='package')
     images              = relationship('PackageImages', back_populates='package')
     package_categories  = relationship('PackageCategory', back_populates='package')
-    location            = relationship('Locations', back_populates='packages')
\ No newline at end of file
+    location            = relationship('Locations', back_populates='packages')
+    popularity          = relationship('PackagePopularity', back_populates='package')
+    capacity_overrides  = relationship('PackageCapacity', back_populates='package')
\ No newline at end of file
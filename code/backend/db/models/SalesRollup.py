@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Index
+from models import Base
+
+class SalesRollup(Base):
+    __tablename__ = 'SalesRollup'
+    __table_args__ = (
+        Index('ix_sales_rollup_package_day', 'package_id', 'day'),
+    )
+
+    # One row per order day per package per booking status, kept up to date by triggers (db/sales_schema.py).
+    # Money is in integer cents so the +/- updates never drift.
+    day             = Column(Date, primary_key=True)
+    package_id      = Column(Integer, ForeignKey('Packages.package_id'), primary_key=True)
+    status          = Column(String, primary_key=True)
+    bookings        = Column(Integer, nullable=False, default=0)
+    travellers      = Column(Integer, nullable=False, default=0)
+    revenue_cents   = Column(Integer, nullable=False, default=0)
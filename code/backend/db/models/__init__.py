@@ -13,3 +13,9 @@ from .Locations import Locations
 from .Categories import Categories
 from .PackageCategory import PackageCategory
 from .PackageImages import PackageImages
+from .PackagePopularity import PackagePopularity
+from .IdempotencyKeys import IdempotencyKeys
+from .PackageImageVariants import PackageImageVariants
+from .PackageCapacity import PackageCapacity
+from .BookingHolds import BookingHolds
+from .SalesRollup import SalesRollup
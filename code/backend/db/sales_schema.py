@@ -0,0 +1,138 @@
+import re
+from sqlalchemy import text
+from models import Base
+
+# SalesRollup holds, per order day / package / booking status, the number of ordered bookings, their
+# travellers and revenue (Bookings.price, in cents). The triggers below keep it in step with checkout
+# (OrderItems inserts, then the bookings going to 'pending') and every later booking change (status, price,
+# travellers, package), whichever code path makes it, inside the same transaction.
+#
+# Triggers write SalesRollup behind the app's back, so the query cache is told which tables feed it
+# (see SALES_SOURCES and query_cache.add_dependents).
+SALES_TABLE = 'SalesRollup'
+SALES_SOURCES = ('Bookings', 'OrderItems', 'Orders')
+SALES_INDEX = "CREATE INDEX IF NOT EXISTS ix_sales_rollup_package_day ON SalesRollup (package_id, day)"
+
+_UPSERT = """
+    ON CONFLICT (day, package_id, status) DO UPDATE SET
+        bookings = bookings + excluded.bookings,
+        travellers = travellers + excluded.travellers,
+        revenue_cents = revenue_cents + excluded.revenue_cents;
+"""
+
+# {sign} is 1 to add a booking's contribution, -1 to take it away
+_BOOKING_ROW = "{sign} * 1, {sign} * {b}.number_of_travellers, {sign} * CAST(ROUND({b}.price * 100) AS INTEGER)"
+
+
+def _apply(keys, source, booking, sign):
+    """
+    Upserts the (day, package_id, status) rows selected by keys / source. Taking away (sign -1) also deletes the
+    rows it brought down to zero, so a booking moving between statuses doesn't leave empty rows behind.
+    """
+    statement = f"""
+        INSERT INTO SalesRollup (day, package_id, status, bookings, travellers, revenue_cents)
+        SELECT {keys}, {_BOOKING_ROW.format(sign=sign, b=booking)}
+        {source}
+        {_UPSERT}
+    """
+    if sign < 0:
+        statement += f"""
+        DELETE FROM SalesRollup
+        WHERE (day, package_id, status) IN (SELECT {keys} {source})
+          AND bookings = 0 AND travellers = 0 AND revenue_cents = 0;
+    """
+    return statement
+
+
+def _for_orders_of(booking, sign):
+    """Adds / removes a booking (OLD or NEW) on the day of every order it's in."""
+    return _apply(f"DATE(o.order_date), {booking}.package_id, {booking}.status",
+                  f"""FROM OrderItems oi JOIN Orders o ON o.order_id = oi.order_id
+        WHERE oi.booking_id = {booking}.booking_id""", booking, sign)
+
+
+def _for_item(item, sign):
+    """Adds / removes one OrderItems row's booking (OLD or NEW) on its order's day."""
+    return _apply("DATE(o.order_date), b.package_id, b.status",
+                  f"""FROM Bookings b JOIN Orders o ON o.order_id = {item}.order_id
+        WHERE b.booking_id = {item}.booking_id""", 'b', sign)
+
+
+def _for_order(order, sign):
+    """Adds / removes every booking in an order (OLD or NEW) on that order's day."""
+    return _apply(f"DATE({order}.order_date), b.package_id, b.status",
+                  f"""FROM OrderItems oi JOIN Bookings b ON b.booking_id = oi.booking_id
+        WHERE oi.order_id = {order}.order_id""", 'b', sign)
+
+
+SALES_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS sales_rollup_item_insert AFTER INSERT ON OrderItems BEGIN
+        {_for_item('NEW', 1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS sales_rollup_item_delete AFTER DELETE ON OrderItems BEGIN
+        {_for_item('OLD', -1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS sales_rollup_booking_update
+        AFTER UPDATE OF status, price, number_of_travellers, package_id ON Bookings BEGIN
+        {_for_orders_of('OLD', -1)}
+        {_for_orders_of('NEW', 1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS sales_rollup_booking_delete AFTER DELETE ON Bookings BEGIN
+        {_for_orders_of('OLD', -1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS sales_rollup_order_date AFTER UPDATE OF order_date ON Orders BEGIN
+        {_for_order('OLD', -1)}
+        {_for_order('NEW', 1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS sales_rollup_order_delete AFTER DELETE ON Orders BEGIN
+        {_for_order('OLD', -1)}
+    END""",
+]
+
+
+def recreate_sales_triggers(conn):
+    """
+    Swaps the rollup triggers for the current SALES_TRIGGERS and deletes the all-zero rows older triggers left behind.
+
+    Args:
+        conn: A SQLAlchemy connection inside a transaction.
+    """
+    for name in re.findall(r'CREATE TRIGGER IF NOT EXISTS (\w+)', ' '.join(SALES_TRIGGERS)):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+    for statement in SALES_TRIGGERS:
+        conn.execute(text(statement))
+    conn.execute(text("DELETE FROM SalesRollup WHERE bookings = 0 AND travellers = 0 AND revenue_cents = 0"))
+
+
+def create_sales_rollup(conn):
+    """
+    Creates SalesRollup, its package / day index and its triggers (if missing) and fills it from the order history.
+
+    Args:
+        conn: A SQLAlchemy connection inside a transaction.
+    """
+    Base.metadata.tables[SALES_TABLE].create(conn, checkfirst=True)
+    conn.execute(text(SALES_INDEX))
+    for statement in SALES_TRIGGERS:
+        conn.execute(text(statement))
+    rebuild_sales_rollup(conn)
+
+
+def rebuild_sales_rollup(conn):
+    """
+    Refills SalesRollup from Orders / OrderItems / Bookings in one grouped INSERT (backfills, or if it ever drifts).
+
+    Returns:
+        int: Rows written.
+    """
+    conn.execute(text("DELETE FROM SalesRollup"))
+    result = conn.execute(text("""
+        INSERT INTO SalesRollup (day, package_id, status, bookings, travellers, revenue_cents)
+        SELECT DATE(o.order_date), b.package_id, b.status, COUNT(*), SUM(b.number_of_travellers),
+               SUM(CAST(ROUND(b.price * 100) AS INTEGER))
+        FROM Orders o
+        JOIN OrderItems oi ON oi.order_id = o.order_id
+        JOIN Bookings b ON b.booking_id = oi.booking_id
+        GROUP BY DATE(o.order_date), b.package_id, b.status
+    """))
+    return result.rowcount
@@ -0,0 +1,92 @@
+import threading
+from sqlalchemy import inspect, Boolean
+
+# Process-wide cache of table schemas so the helpers don't reflect the db on every call.
+# Keys are lower-cased table names since sqlite table names are case-insensitive.
+_tables = {}
+_loaded = False
+_lock = threading.Lock()
+
+
+class TableSchema:
+    """
+    Cached description of a single table.
+
+    Attributes:
+        name (str): The table name as stored in the database.
+        column_types (dict): Column name -> SQLAlchemy type instance.
+        defaults (dict): Column name -> server default (only columns that have one).
+        primary_key (list): Primary key column names, in key order.
+        boolean_columns (set): Names of the Boolean columns.
+        required_columns (list): NOT NULL columns without a server default.
+        converters (dict): Result column tuple -> row converters, filled in by db_helper.fetch_rows.
+    """
+
+    def __init__(self, name, columns, primary_key):
+        self.name = name
+        self.column_types = {col['name']: col['type'] for col in columns}
+        self.defaults = {col['name']: col['default'] for col in columns if col.get('default') is not None}
+        self.primary_key = list(primary_key)
+        self.boolean_columns = {name for name, col_type in self.column_types.items() if isinstance(col_type, Boolean)}
+        self.required_columns = [col['name'] for col in columns
+                                 if not col.get('nullable', True) and col.get('default') is None]
+        self.converters = {}
+
+    @property
+    def columns(self):
+        return list(self.column_types.keys())
+
+
+def _load(bind):
+    """
+    Reflects every table once and fills the cache. Caller must hold the lock.
+    """
+    global _loaded
+    inspector = inspect(bind)
+    _tables.clear()
+    for table_name in inspector.get_table_names():
+        columns = inspector.get_columns(table_name)
+        primary_key = inspector.get_pk_constraint(table_name).get('constrained_columns') or []
+        _tables[table_name.lower()] = TableSchema(table_name, columns, primary_key)
+    _loaded = True
+
+
+def get_table_schema(bind, table_name):
+    """
+    Returns the cached schema for a table, reflecting the database the first time it is needed.
+
+    The whole database is reflected once; after that lookups never touch the db until
+    invalidate_schema_cache() is called.
+
+    Args:
+        bind: Engine or connection used if the cache needs to be (re)built.
+        table_name (str): The table to look up.
+
+    Returns:
+        TableSchema: The table's schema, or None if the table doesn't exist.
+    """
+    if not table_name:
+        return None
+    key = table_name.lower()
+    schema = _tables.get(key)
+    if schema is not None:
+        return schema
+
+    if _loaded:
+        return None
+
+    with _lock:
+        if not _loaded:
+            _load(bind)
+        return _tables.get(key)
+
+
+def invalidate_schema_cache():
+    """
+    Drops the cached schemas. Call after anything that changes the schema (setup, reset, migrations).
+    """
+    global _loaded
+    with _lock:
+        _tables.clear()
+        _loaded = False
+    print("Schema cache invalidated.")
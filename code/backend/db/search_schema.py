@@ -0,0 +1,90 @@
+from sqlalchemy import text
+
+# Full-text index over packages (FTS5): one row per package, rowid = package_id, with the location and
+# category names copied in so a single MATCH covers all of them. The triggers below keep it in sync with
+# Packages, Locations, PackageCategory and Categories, so nothing in the app writes to it directly.
+#
+# Triggers write PackageSearch behind the app's back, so the query cache is told which tables feed it
+# (see SEARCH_SOURCES and query_cache.add_dependents).
+SEARCH_TABLE = 'PackageSearch'
+SEARCH_SOURCES = ('Packages', 'Locations', 'PackageCategory', 'Categories')
+
+# bm25 weight per column (name, description, city, country, categories), stored as the table's default
+# rank so ORDER BY rank uses it without calling bm25() in every query
+RANK_WEIGHTS = (10.0, 1.0, 5.0, 5.0, 3.0)
+
+_CATEGORY_NAMES = """
+    (SELECT COALESCE(group_concat(c.name, ' '), '') FROM PackageCategory pc
+     JOIN Categories c ON c.category_id = pc.category_id WHERE pc.package_id = {package_id})
+"""
+
+_REFRESH_PACKAGE = f"""
+    DELETE FROM PackageSearch WHERE rowid = {{package_id}};
+    INSERT INTO PackageSearch (rowid, name, description, city, country, categories)
+    SELECT p.package_id, p.name, p.description, COALESCE(l.city, ''), COALESCE(l.country, ''),
+           {_CATEGORY_NAMES.format(package_id='p.package_id')}
+    FROM Packages p LEFT JOIN Locations l ON l.location_id = p.location_id
+    WHERE p.package_id = {{package_id}};
+"""
+
+SEARCH_DDL = [
+    # unicode61 folds case and accents, the prefix indexes make 2-3 letter prefix queries index lookups
+    """CREATE VIRTUAL TABLE IF NOT EXISTS PackageSearch USING fts5(
+        name, description, city, country, categories,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS package_search_insert AFTER INSERT ON Packages BEGIN
+        {_REFRESH_PACKAGE.format(package_id='NEW.package_id')}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS package_search_update AFTER UPDATE ON Packages BEGIN
+        DELETE FROM PackageSearch WHERE rowid = OLD.package_id;
+        {_REFRESH_PACKAGE.format(package_id='NEW.package_id')}
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS package_search_delete AFTER DELETE ON Packages BEGIN
+        DELETE FROM PackageSearch WHERE rowid = OLD.package_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS package_search_location AFTER UPDATE OF city, country ON Locations BEGIN
+        UPDATE PackageSearch SET city = COALESCE(NEW.city, ''), country = COALESCE(NEW.country, '')
+        WHERE rowid IN (SELECT package_id FROM Packages WHERE location_id = NEW.location_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS package_search_category_add AFTER INSERT ON PackageCategory BEGIN
+        UPDATE PackageSearch SET categories = {_CATEGORY_NAMES.format(package_id='NEW.package_id')}
+        WHERE rowid = NEW.package_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS package_search_category_remove AFTER DELETE ON PackageCategory BEGIN
+        UPDATE PackageSearch SET categories = {_CATEGORY_NAMES.format(package_id='OLD.package_id')}
+        WHERE rowid = OLD.package_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS package_search_category_rename AFTER UPDATE OF name ON Categories BEGIN
+        UPDATE PackageSearch SET categories = {_CATEGORY_NAMES.format(package_id='PackageSearch.rowid')}
+        WHERE rowid IN (SELECT package_id FROM PackageCategory WHERE category_id = NEW.category_id);
+    END""",
+]
+
+
+def create_search_index(conn):
+    """
+    Creates the PackageSearch table and its triggers (if missing) and fills it from the current packages.
+
+    Args:
+        conn: A SQLAlchemy connection inside a transaction.
+    """
+    for statement in SEARCH_DDL:
+        conn.execute(text(statement))
+    conn.execute(text(f"INSERT INTO PackageSearch (PackageSearch, rank) VALUES ('rank', 'bm25({', '.join(map(str, RANK_WEIGHTS))})')"))
+    rebuild_search_index(conn)
+
+
+def rebuild_search_index(conn):
+    """
+    Refills PackageSearch from scratch and merges its b-trees (for backfills, or if it ever drifts).
+    """
+    conn.execute(text("DELETE FROM PackageSearch"))
+    conn.execute(text(f"""
+        INSERT INTO PackageSearch (rowid, name, description, city, country, categories)
+        SELECT p.package_id, p.name, p.description, COALESCE(l.city, ''), COALESCE(l.country, ''),
+               {_CATEGORY_NAMES.format(package_id='p.package_id')}
+        FROM Packages p LEFT JOIN Locations l ON l.location_id = p.location_id
+    """))
+    conn.execute(text("INSERT INTO PackageSearch (PackageSearch) VALUES ('optimize')"))
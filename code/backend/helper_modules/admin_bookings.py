@@ -0,0 +1,108 @@
+import json
+import base64
+from datetime import date
+from helper_modules import db_helper as db
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+STATUSES = ('in-cart', 'pending', 'confirmed', 'cancelled')
+
+# Keyset pagination on (start_date, booking_id): each page continues after the last row of the previous one,
+# so page 5000 costs the same as page 1 (no OFFSET scan). Every filter combination has an index that ends
+# in (start_date, booking_id), see Bookings.__table_args__.
+BOOKINGS_QUERY = """
+    SELECT b.booking_id, b.email, u.first_name, u.last_name, b.package_id, p.name AS package_name,
+           b.start_date, b.end_date, b.number_of_travellers, b.price, b.status
+    FROM Bookings b
+    LEFT JOIN Users u ON u.email = b.email
+    LEFT JOIN Packages p ON p.package_id = b.package_id
+    {where}
+    ORDER BY b.start_date {direction}, b.booking_id {direction}
+    LIMIT :limit
+"""
+
+
+def encode_cursor(start_date, booking_id):
+    raw = json.dumps([str(start_date), int(booking_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Raises:
+        ValueError: If the cursor wasn't made by encode_cursor.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        start_date, booking_id = json.loads(raw)
+        return date.fromisoformat(start_date).isoformat(), int(booking_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def fetch_bookings_page(filters=None, cursor=None, limit=DEFAULT_LIMIT, order='asc'):
+    """
+    Returns one page of bookings joined with the user's name and the package name.
+
+    Args:
+        filters (dict): status (one or a comma separated list), package_id, email,
+            start_from / start_to ('YYYY-MM-DD', inclusive range on start_date).
+        cursor (str): next_cursor from the previous page, None for the first page.
+        limit (int): Rows per page, capped at MAX_LIMIT.
+        order (str): 'asc' (oldest start date first) or 'desc'.
+
+    Returns:
+        dict: {'bookings': [...], 'next_cursor': str or None, 'limit': int}
+
+    Raises:
+        ValueError: For a bad cursor, status, date or paging value.
+    """
+    filters = filters or {}
+    limit = min(int(limit), MAX_LIMIT)
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    if order.lower() not in ('asc', 'desc'):
+        raise ValueError(f"Unknown sort order: {order}")
+    direction = order.upper()
+
+    conditions = []
+    params = {'limit': limit + 1}  # one extra row tells us whether there's another page
+
+    statuses = [s.strip() for s in str(filters.get('status') or '').split(',') if s.strip()]
+    if statuses:
+        unknown = [s for s in statuses if s not in STATUSES]
+        if unknown:
+            raise ValueError(f"Unknown status: {unknown}")
+        placeholders = ', '.join(f":status{i}" for i in range(len(statuses)))
+        conditions.append(f"b.status IN ({placeholders})")
+        params.update({f"status{i}": s for i, s in enumerate(statuses)})
+
+    if filters.get('package_id') not in (None, ''):
+        conditions.append("b.package_id = :package_id")
+        params['package_id'] = int(filters['package_id'])
+
+    if filters.get('email'):
+        conditions.append("b.email = :email")
+        params['email'] = filters['email'].strip().lower()
+
+    if filters.get('start_from'):
+        conditions.append("b.start_date >= :start_from")
+        params['start_from'] = date.fromisoformat(filters['start_from']).isoformat()
+    if filters.get('start_to'):
+        conditions.append("b.start_date <= :start_to")
+        params['start_to'] = date.fromisoformat(filters['start_to']).isoformat()
+
+    if cursor:
+        params['cursor_date'], params['cursor_id'] = decode_cursor(cursor)
+        op = '>' if direction == 'ASC' else '<'
+        conditions.append(f"(b.start_date, b.booking_id) {op} (:cursor_date, :cursor_id)")
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = db.fetch_rows(BOOKINGS_QUERY.format(where=where, direction=direction), params)
+    if rows is None:
+        raise RuntimeError("Failed to fetch bookings")
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]['start_date'], rows[-1]['booking_id']) if has_more else None
+    return {'bookings': rows, 'next_cursor': next_cursor, 'limit': limit}
@@ -0,0 +1,539 @@
+import os
+import heapq
+import threading
+import traceback
+import calendar as month_calendar
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+import numpy as np
+from sqlalchemy import text
+from db.db_config import Session
+from helper_modules import db_helper as db
+
+# Per-package, per-day occupancy kept in memory as numpy arrays, so availability and month calendars
+# are a slice + min instead of a scan over Bookings. A booking uses its package for the nights
+# [start_date, end_date). Pending / confirmed bookings and live holds count, in-cart ones don't.
+#
+# The arrays are loaded lazily, updated in place by update_booking, checkout and holds, and reloaded
+# every AVAILABILITY_REFRESH seconds as a backstop for writes made by other processes. Placing a hold
+# always re-checks capacity against the db inside the write transaction, so two processes can't both
+# take the last places.
+HOLD_TTL = int(os.getenv("BOOKING_HOLD_TTL", 900))                  # seconds a checkout holds its places
+REFRESH_INTERVAL = float(os.getenv("AVAILABILITY_REFRESH", 60))     # seconds before the arrays are reloaded
+PAST_DAYS = 62                                                      # days before today kept (calendars of last month)
+OCCUPYING_STATUSES = ('pending', 'confirmed')
+UNLIMITED = np.iinfo(np.int32).max
+
+_lock = threading.Lock()
+_index = None
+
+
+class CapacityError(Exception):
+    """
+    Raised when bookings don't fit in the remaining capacity.
+
+    Attributes:
+        conflicts (list): [{'booking_id', 'package_id', 'start_date', 'end_date', 'travellers', 'remaining'}]
+    """
+
+    def __init__(self, conflicts):
+        super().__init__("Not enough places left for: " + ', '.join(str(c['booking_id']) for c in conflicts))
+        self.conflicts = conflicts
+
+
+def _parse_day(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _parse_time(value):
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+def _occupancy(intervals, first, length):
+    """
+    Per-day occupancy over [first, first + length) (ordinals) from (start, end, travellers) intervals,
+    built with a difference array so it's one pass whatever the number of bookings.
+    """
+    diff = np.zeros(length + 1, dtype=np.int64)
+    for start, end, travellers in intervals:
+        s = max(start - first, 0)
+        e = min(end - first, length)
+        if s < e:
+            diff[s] += travellers
+            diff[e] -= travellers
+    return np.cumsum(diff[:-1]).astype(np.int32)
+
+
+class _PackageDays:
+    """
+    Occupancy and capacity of one package, one array cell per day from the index origin onwards.
+    """
+
+    def __init__(self, origin, capacity, duration, overrides=None):
+        self.origin = origin
+        self.base = UNLIMITED if capacity is None else int(capacity)
+        self.duration = max(int(duration or 1), 1)
+        self.overrides = dict(overrides or {})     # day ordinal -> capacity
+        self.occupied = np.zeros(0, dtype=np.int32)
+        self.capacity = np.zeros(0, dtype=np.int32)
+
+    @property
+    def limited(self):
+        return self.base != UNLIMITED or bool(self.overrides)
+
+    def ensure(self, end):
+        """Grows the arrays so they cover every day before the end ordinal."""
+        needed = end - self.origin
+        size = len(self.occupied)
+        if needed <= size:
+            return
+        new_size = max(needed, size * 2, 366)
+        self.occupied = np.concatenate([self.occupied, np.zeros(new_size - size, dtype=np.int32)])
+        grown = np.full(new_size - size, self.base, dtype=np.int32)
+        for day, capacity in self.overrides.items():
+            if size <= day - self.origin < new_size:
+                grown[day - self.origin - size] = capacity
+        self.capacity = np.concatenate([self.capacity, grown])
+
+    def set_override(self, day, capacity):
+        if capacity is None:
+            self.overrides.pop(day, None)
+        else:
+            self.overrides[day] = int(capacity)
+        offset = day - self.origin
+        if 0 <= offset < len(self.capacity):
+            self.capacity[offset] = self.base if capacity is None else capacity
+
+    def add(self, start, end, travellers):
+        s, e = max(start, self.origin), end
+        if s >= e:
+            return
+        self.ensure(e)
+        self.occupied[s - self.origin:e - self.origin] += travellers
+
+    def remaining(self, start, end):
+        """Remaining places per day over [start, end) (ordinals), days before the origin count as full."""
+        self.ensure(end)
+        s, e = start - self.origin, end - self.origin
+        if e <= 0:
+            return np.zeros(end - start, dtype=np.int64)
+        values = self.capacity[max(s, 0):e].astype(np.int64) - self.occupied[max(s, 0):e]
+        if s < 0:
+            values = np.concatenate([np.zeros(-s, dtype=np.int64), values])
+        return values
+
+
+class _AvailabilityIndex:
+    def __init__(self):
+        self.origin = (date.today() - timedelta(days=PAST_DAYS)).toordinal()
+        self.packages = {}
+        self.holds = {}               # booking_id -> (package_id, start, end, travellers, expires_at)
+        self.expiries = []            # heap of (expires_at, booking_id)
+        self.loaded_at = datetime.now()
+
+    def load(self):
+        origin_day = date.fromordinal(self.origin).isoformat()
+        for package_id, capacity, duration in db.fetch_rows("SELECT package_id, capacity, duration FROM Packages", as_tuples=True) or []:
+            self.packages[package_id] = _PackageDays(self.origin, capacity, duration)
+        for package_id, day, capacity in db.fetch_rows(
+                "SELECT package_id, day, capacity FROM PackageCapacity WHERE day >= :origin", {'origin': origin_day}, as_tuples=True) or []:
+            if package_id in self.packages:
+                self.packages[package_id].set_override(_parse_day(day).toordinal(), capacity)
+
+        intervals = defaultdict(list)
+        placeholders = ', '.join(f"'{status}'" for status in OCCUPYING_STATUSES)
+        for package_id, start, end, travellers in db.fetch_rows(f"""
+                SELECT package_id, start_date, end_date, SUM(number_of_travellers) FROM Bookings
+                WHERE status IN ({placeholders}) AND end_date > :origin
+                GROUP BY package_id, start_date, end_date
+            """, {'origin': origin_day}, as_tuples=True) or []:
+            intervals[package_id].append((_parse_day(start).toordinal(), _parse_day(end).toordinal(), int(travellers)))
+        for package_id, package_intervals in intervals.items():
+            package = self.packages.get(package_id)
+            if package is not None:
+                package.ensure(max(end for _, end, _ in package_intervals))
+                package.occupied += _occupancy(package_intervals, self.origin, len(package.occupied))
+
+        for booking_id, package_id, start, end, travellers, expires_at in db.fetch_rows(
+                "SELECT booking_id, package_id, start_date, end_date, number_of_travellers, expires_at FROM BookingHolds WHERE expires_at > :now",
+                {'now': _format_time(datetime.now())}, as_tuples=True) or []:
+            self.add_hold(booking_id, package_id, _parse_day(start).toordinal(), _parse_day(end).toordinal(),
+                          travellers, _parse_time(expires_at))
+        return self
+
+    def add_booking(self, package_id, start, end, travellers, sign=1):
+        package = self.packages.get(package_id)
+        if package is not None:
+            package.add(start, end, sign * travellers)
+
+    def add_hold(self, booking_id, package_id, start, end, travellers, expires_at):
+        self.remove_hold(booking_id)
+        self.holds[booking_id] = (package_id, start, end, travellers, expires_at)
+        heapq.heappush(self.expiries, (expires_at, booking_id))
+        self.add_booking(package_id, start, end, travellers)
+
+    def remove_hold(self, booking_id):
+        hold = self.holds.pop(booking_id, None)
+        if hold is not None:
+            package_id, start, end, travellers, _ = hold
+            self.add_booking(package_id, start, end, travellers, sign=-1)
+
+    def expire(self, now):
+        while self.expiries and self.expiries[0][0] <= now:
+            expires_at, booking_id = heapq.heappop(self.expiries)
+            hold = self.holds.get(booking_id)
+            if hold is not None and hold[4] == expires_at:  # not since renewed
+                self.remove_hold(booking_id)
+
+
+def _format_time(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def _get_index():
+    """The loaded index with expired holds dropped (caller holds the lock)."""
+    global _index
+    now = datetime.now()
+    if _index is None or (now - _index.loaded_at).total_seconds() > REFRESH_INTERVAL:
+        _index = _AvailabilityIndex().load()
+    _index.expire(now)
+    return _index
+
+
+def _get_package(index, package_id):
+    package = index.packages.get(int(package_id))
+    if package is None:
+        raise KeyError(f"Unknown package: {package_id}")
+    return package
+
+
+def invalidate():
+    """
+    Drops the in-memory index so it's reloaded on the next read.
+    Call when packages, their capacity or bookings change outside the functions below.
+    """
+    global _index
+    with _lock:
+        _index = None
+
+
+def check_availability(package_id, start_date, end_date, travellers=1):
+    """
+    Whether a group can book a package for the nights [start_date, end_date).
+
+    Returns:
+        dict: {'package_id', 'start_date', 'end_date', 'travellers', 'available', 'remaining'}
+              (remaining is the fewest places left on any of those days, None if the package is unlimited)
+
+    Raises:
+        KeyError: If the package doesn't exist.
+        ValueError: For bad dates or travellers.
+    """
+    start, end = _parse_day(start_date), _parse_day(end_date)
+    travellers = int(travellers)
+    if end <= start:
+        raise ValueError("end_date must be after start_date")
+    if travellers < 1:
+        raise ValueError("travellers must be at least 1")
+
+    with _lock:
+        package = _get_package(_get_index(), package_id)
+        if package.limited:
+            remaining = int(package.remaining(start.toordinal(), end.toordinal()).min())
+        else:
+            remaining = None
+    return {
+        'package_id': int(package_id),
+        'start_date': start.isoformat(),
+        'end_date': end.isoformat(),
+        'travellers': travellers,
+        'available': remaining is None or remaining >= travellers,
+        'remaining': remaining,
+    }
+
+
+def get_calendar(package_id, year, month, travellers=1):
+    """
+    Month view of a package: places left per day, and whether a trip of the package's duration for
+    `travellers` people can start that day.
+
+    Returns:
+        dict: {'package_id', 'month', 'duration', 'travellers',
+               'days': [{'date', 'remaining', 'can_start'}]} (remaining None if unlimited)
+
+    Raises:
+        KeyError: If the package doesn't exist.
+    """
+    travellers = int(travellers)
+    if travellers < 1:
+        raise ValueError("travellers must be at least 1")
+    first = date(int(year), int(month), 1)
+    days_in_month = month_calendar.monthrange(first.year, first.month)[1]
+    today = date.today().toordinal()
+
+    with _lock:
+        package = _get_package(_get_index(), package_id)
+        duration, limited = package.duration, package.limited
+        if limited:
+            # remaining for the month plus the nights a trip starting on its last day runs into
+            remaining = package.remaining(first.toordinal(), first.toordinal() + days_in_month + duration - 1)
+            trip_min = np.lib.stride_tricks.sliding_window_view(remaining, duration).min(axis=1)[:days_in_month]
+            remaining = remaining[:days_in_month]
+
+    days = []
+    for i in range(days_in_month):
+        day = first.toordinal() + i
+        if limited:
+            days.append({'date': date.fromordinal(day).isoformat(), 'remaining': int(remaining[i]),
+                         'can_start': day >= today and int(trip_min[i]) >= travellers})
+        else:
+            days.append({'date': date.fromordinal(day).isoformat(), 'remaining': None, 'can_start': day >= today})
+    return {'package_id': int(package_id), 'month': f"{first.year:04d}-{first.month:02d}",
+            'duration': duration, 'travellers': travellers, 'days': days}
+
+
+def check_booking_change(old, new):
+    """
+    Checks that updating a booking from old to new (dicts with package_id, start_date, end_date,
+    number_of_travellers, status; old None for a new booking) doesn't go over capacity.
+
+    Raises:
+        CapacityError: If the new version doesn't fit.
+    """
+    if not new or new['status'] not in OCCUPYING_STATUSES:
+        return
+    start, end = _parse_day(new['start_date']).toordinal(), _parse_day(new['end_date']).toordinal()
+    travellers = int(new['number_of_travellers'])
+
+    with _lock:
+        index = _get_index()
+        package = index.packages.get(int(new['package_id']))
+        if package is None or not package.limited:
+            return
+        remaining = package.remaining(start, end)
+        if old and old['status'] in OCCUPYING_STATUSES and int(old['package_id']) == int(new['package_id']):
+            # the booking's current places free up when it changes
+            old_start, old_end = _parse_day(old['start_date']).toordinal(), _parse_day(old['end_date']).toordinal()
+            s, e = max(start, old_start), min(end, old_end)
+            if s < e:
+                remaining[s - start:e - start] += int(old['number_of_travellers'])
+        fewest = int(remaining.min()) if len(remaining) else 0
+    if fewest < travellers:
+        raise CapacityError([{'booking_id': new.get('booking_id'), 'package_id': int(new['package_id']),
+                              'start_date': new['start_date'], 'end_date': new['end_date'],
+                              'travellers': travellers, 'remaining': fewest}])
+
+
+def record_booking_change(old, new):
+    """
+    Applies a committed booking update (same dicts as check_booking_change) to the in-memory index.
+    """
+    with _lock:
+        if _index is None:
+            return
+        for booking, sign in ((old, -1), (new, 1)):
+            if booking and booking['status'] in OCCUPYING_STATUSES:
+                _index.add_booking(int(booking['package_id']), _parse_day(booking['start_date']).toordinal(),
+                                   _parse_day(booking['end_date']).toordinal(), int(booking['number_of_travellers']), sign)
+
+
+def _db_capacity(session, package_id, first, length):
+    base, = session.execute(text("SELECT capacity FROM Packages WHERE package_id = :package_id"),
+                            {'package_id': package_id}).one()
+    capacity = np.full(length, UNLIMITED if base is None else base, dtype=np.int64)
+    overrides = session.execute(
+        text("SELECT day, capacity FROM PackageCapacity WHERE package_id = :package_id AND day >= :first AND day < :last"),
+        {'package_id': package_id, 'first': date.fromordinal(first).isoformat(),
+         'last': date.fromordinal(first + length).isoformat()},
+    ).fetchall()
+    for day, day_capacity in overrides:
+        capacity[_parse_day(day).toordinal() - first] = day_capacity
+    return None if base is None and not overrides else capacity
+
+
+def _db_occupancy(session, package_id, first, length, now):
+    placeholders = ', '.join(f"'{status}'" for status in OCCUPYING_STATUSES)
+    params = {'package_id': package_id, 'first': date.fromordinal(first).isoformat(),
+              'last': date.fromordinal(first + length).isoformat(), 'now': _format_time(now)}
+    rows = session.execute(text(f"""
+        SELECT start_date, end_date, number_of_travellers FROM Bookings
+        WHERE package_id = :package_id AND status IN ({placeholders}) AND start_date < :last AND end_date > :first
+        UNION ALL
+        SELECT start_date, end_date, number_of_travellers FROM BookingHolds
+        WHERE package_id = :package_id AND expires_at > :now AND start_date < :last AND end_date > :first
+    """), params).fetchall()
+    return _occupancy([(_parse_day(s).toordinal(), _parse_day(e).toordinal(), t) for s, e, t in rows], first, length)
+
+
+def place_holds(booking_ids, ttl=HOLD_TTL):
+    """
+    Holds capacity for in-cart bookings while they're being paid for. Re-holding a booking renews it.
+
+    The hold rows are written first and capacity is then checked against the db in the same
+    transaction, so sqlite's write lock keeps any other checkout out until this one has decided.
+
+    Args:
+        booking_ids (list): The in-cart bookings about to be paid for.
+        ttl (int): Seconds until the holds expire on their own.
+
+    Returns:
+        str: When the holds expire ('YYYY-MM-DD HH:MM:SS.ffffff').
+
+    Raises:
+        ValueError: If a booking doesn't exist or isn't in a cart.
+        CapacityError: If some of the bookings don't fit (nothing is held then).
+    """
+    booking_ids = list(dict.fromkeys(int(booking_id) for booking_id in booking_ids))
+    if not booking_ids:
+        raise ValueError("No bookings to hold")
+    now = datetime.now()
+    expires_at = now + timedelta(seconds=ttl)
+
+    session = Session()
+    try:
+        placeholders = ', '.join(f":b{i}" for i in range(len(booking_ids)))
+        rows = session.execute(
+            text(f"""SELECT booking_id, package_id, start_date, end_date, number_of_travellers, status
+                     FROM Bookings WHERE booking_id IN ({placeholders})"""),
+            {f"b{i}": booking_id for i, booking_id in enumerate(booking_ids)},
+        ).fetchall()
+        found = {row[0] for row in rows}
+        missing = [booking_id for booking_id in booking_ids if booking_id not in found]
+        if missing:
+            raise ValueError(f"Unknown bookings: {missing}")
+        not_in_cart = [row[0] for row in rows if row[5] != 'in-cart']
+        if not_in_cart:
+            raise ValueError(f"Bookings not in a cart: {not_in_cart}")
+
+        session.execute(text("DELETE FROM BookingHolds WHERE expires_at <= :now"), {'now': _format_time(now)})
+        session.execute(
+            text("""
+                INSERT INTO BookingHolds (booking_id, package_id, start_date, end_date, number_of_travellers, expires_at)
+                VALUES (:booking_id, :package_id, :start_date, :end_date, :number_of_travellers, :expires_at)
+                ON CONFLICT (booking_id) DO UPDATE SET
+                    package_id = excluded.package_id, start_date = excluded.start_date, end_date = excluded.end_date,
+                    number_of_travellers = excluded.number_of_travellers, expires_at = excluded.expires_at
+            """),
+            [{'booking_id': b, 'package_id': p, 'start_date': str(s), 'end_date': str(e), 'number_of_travellers': t,
+              'expires_at': _format_time(expires_at)} for b, p, s, e, t, _ in rows],
+        )
+
+        conflicts = []
+        by_package = defaultdict(list)
+        for booking_id, package_id, start, end, travellers, _ in rows:
+            by_package[package_id].append((booking_id, _parse_day(start).toordinal(), _parse_day(end).toordinal(), travellers))
+        for package_id, held in by_package.items():
+            first = min(start for _, start, _, _ in held)
+            length = max(end for _, _, end, _ in held) - first
+            capacity = _db_capacity(session, package_id, first, length)
+            if capacity is None:
+                continue
+            remaining = capacity - _db_occupancy(session, package_id, first, length, now)
+            for booking_id, start, end, travellers in held:
+                fewest = int(remaining[start - first:end - first].min())
+                if fewest < 0:
+                    conflicts.append({'booking_id': booking_id, 'package_id': package_id,
+                                      'start_date': date.fromordinal(start).isoformat(), 'end_date': date.fromordinal(end).isoformat(),
+                                      'travellers': travellers, 'remaining': fewest + travellers})
+        if conflicts:
+            session.rollback()
+            raise CapacityError(conflicts)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+    with _lock:
+        if _index is not None:
+            for booking_id, package_id, start, end, travellers, _ in rows:
+                _index.add_hold(booking_id, package_id, _parse_day(start).toordinal(), _parse_day(end).toordinal(),
+                                travellers, expires_at)
+    return _format_time(expires_at)
+
+
+def release_holds(booking_ids):
+    """
+    Drops the holds of the given bookings (checkout abandoned, booking edited or removed).
+    """
+    booking_ids = [int(booking_id) for booking_id in booking_ids]
+    if not booking_ids:
+        return
+    placeholders = ', '.join(f":b{i}" for i in range(len(booking_ids)))
+    db.execute_query(f"DELETE FROM BookingHolds WHERE booking_id IN ({placeholders})",
+                     {f"b{i}": booking_id for i, booking_id in enumerate(booking_ids)})
+    with _lock:
+        if _index is not None:
+            for booking_id in booking_ids:
+                _index.remove_hold(booking_id)
+
+
+def record_checkout(booking_ids, session):
+    """
+    Turns the holds of bookings being paid for into real occupancy, inside finalize_order's transaction.
+    Call before the bookings' status is set, then pass the result to apply_checkout() after the commit.
+
+    Returns:
+        list: (booking_id, package_id, start, end, travellers) of the bookings that start counting now.
+    """
+    placeholders = ', '.join(f":b{i}" for i in range(len(booking_ids)))
+    params = {f"b{i}": booking_id for i, booking_id in enumerate(booking_ids)}
+    rows = session.execute(
+        text(f"""SELECT booking_id, package_id, start_date, end_date, number_of_travellers, status
+                 FROM Bookings WHERE booking_id IN ({placeholders})"""), params,
+    ).fetchall()
+    session.execute(text(f"DELETE FROM BookingHolds WHERE booking_id IN ({placeholders})"), params)
+    return [(b, p, _parse_day(s).toordinal(), _parse_day(e).toordinal(), t) for b, p, s, e, t, status in rows
+            if status not in OCCUPYING_STATUSES]
+
+
+def apply_checkout(changes):
+    """Adds committed checkout changes (from record_checkout) to the in-memory index."""
+    with _lock:
+        if _index is None:
+            return
+        for booking_id, package_id, start, end, travellers in changes:
+            _index.remove_hold(booking_id)
+            _index.add_booking(package_id, start, end, travellers)
+
+
+def set_capacity_overrides(package_id, overrides):
+    """
+    Sets per-day capacity overrides for a package ({'YYYY-MM-DD': capacity, or None to remove it}).
+    """
+    upserts = [{'package_id': int(package_id), 'day': _parse_day(day).isoformat(), 'capacity': int(capacity)}
+               for day, capacity in overrides.items() if capacity is not None]
+    removals = [{'package_id': int(package_id), 'day': _parse_day(day).isoformat()}
+                for day, capacity in overrides.items() if capacity is None]
+    if any(u['capacity'] < 0 for u in upserts):
+        raise ValueError("capacity can't be negative")
+
+    session = Session()
+    try:
+        if upserts:
+            session.execute(text("""
+                INSERT INTO PackageCapacity (package_id, day, capacity) VALUES (:package_id, :day, :capacity)
+                ON CONFLICT (package_id, day) DO UPDATE SET capacity = excluded.capacity
+            """), upserts)
+        if removals:
+            session.execute(text("DELETE FROM PackageCapacity WHERE package_id = :package_id AND day = :day"), removals)
+        session.commit()
+    except Exception:
+        session.rollback()
+        print(f"Error setting capacity: {traceback.format_exc()}")
+        raise
+    finally:
+        session.close()
+
+    with _lock:
+        if _index is not None and int(package_id) in _index.packages:
+            package = _index.packages[int(package_id)]
+            for day, capacity in overrides.items():
+                package.set_override(_parse_day(day).toordinal(), capacity)
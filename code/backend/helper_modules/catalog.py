@@ -0,0 +1,377 @@
+import json
+import time
+import threading
+import traceback
+from sqlalchemy import text
+from db.db_config import Session
+from helper_modules import db_helper as db
+from helper_modules import image_server
+from helper_modules import query_cache
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+CATALOG_CACHE_TTL = 60
+
+# Whitelisted sort keys -> SQL expression (never put user input straight into ORDER BY)
+SORT_COLUMNS = {
+    'package_id': 'p.package_id',
+    'name': 'p.name',
+    'price': 'p.price',
+    'duration': 'p.duration',
+    'popularity': """(SELECT COALESCE(SUM(pp.order_count), 0) FROM PackagePopularity pp
+                      WHERE pp.package_id = p.package_id)""",
+}
+
+# Images, their resized variants and categories are folded into JSON arrays per package so the whole page
+# comes back in one query. The inner SELECTs are ordered so the arrays come out in image_id / name order.
+CATALOG_QUERY = """
+    SELECT p.package_id, p.name, p.description, p.duration, p.price, p.capacity, p.location_id,
+           l.city AS location_city, l.country AS location_country,
+           (SELECT json_group_array(json_array(image_id, image_path)) FROM (
+                SELECT pi.image_id, pi.image_path FROM PackageImages pi
+                WHERE pi.package_id = p.package_id
+                ORDER BY pi.image_id)) AS images,
+           (SELECT json_group_array(json_array(image_id, variant, format, image_path, width, height)) FROM (
+                SELECT v.image_id, v.variant, v.format, v.image_path, v.width, v.height
+                FROM PackageImages pi
+                JOIN PackageImageVariants v ON v.image_id = pi.image_id
+                WHERE pi.package_id = p.package_id
+                ORDER BY pi.image_id)) AS image_variants,
+           (SELECT json_group_array(json_array(category_id, name)) FROM (
+                SELECT c.category_id, c.name FROM PackageCategory pc
+                JOIN Categories c ON c.category_id = pc.category_id
+                WHERE pc.package_id = p.package_id
+                ORDER BY c.name)) AS categories,
+           COUNT(*) OVER () AS total_count
+    FROM Packages p
+    LEFT JOIN Locations l ON p.location_id = l.location_id
+    {where}
+    ORDER BY {order_by}
+    LIMIT :limit OFFSET :offset
+"""
+
+COUNT_QUERY = """
+    SELECT COUNT(*) AS total_count
+    FROM Packages p
+    LEFT JOIN Locations l ON p.location_id = l.location_id
+    {where}
+"""
+
+
+def _split(value):
+    """Accepts either a list or a comma separated string and returns a list of stripped values."""
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [v.strip() for v in str(value).split(',') if v.strip()]
+
+
+def build_filters(filters):
+    """
+    Turns catalog filters into a WHERE clause and bind parameters.
+
+    Supported filters: package_id, location_id, city, country, category (names, matches any),
+    min_price, max_price, min_duration, max_duration and q (text match on name/description).
+
+    Args:
+        filters (dict): The filter values, usually straight from request.args.
+
+    Returns:
+        tuple: (where clause string, params dict)
+
+    Raises:
+        ValueError: If a numeric filter can't be parsed.
+    """
+    conditions = []
+    params = {}
+
+    package_ids = [int(v) for v in _split(filters.get('package_id'))]
+    if package_ids:
+        placeholders = ', '.join(f":package_id{i}" for i in range(len(package_ids)))
+        conditions.append(f"p.package_id IN ({placeholders})")
+        params.update({f"package_id{i}": v for i, v in enumerate(package_ids)})
+
+    location_ids = [int(v) for v in _split(filters.get('location_id'))]
+    if location_ids:
+        placeholders = ', '.join(f":location_id{i}" for i in range(len(location_ids)))
+        conditions.append(f"p.location_id IN ({placeholders})")
+        params.update({f"location_id{i}": v for i, v in enumerate(location_ids)})
+
+    for key in ('city', 'country'):
+        if filters.get(key):
+            conditions.append(f"l.{key} = :{key}")
+            params[key] = filters[key]
+
+    categories = _split(filters.get('category'))
+    if categories:
+        placeholders = ', '.join(f":category{i}" for i in range(len(categories)))
+        conditions.append(f"""EXISTS (SELECT 1 FROM PackageCategory pc
+                   JOIN Categories c ON c.category_id = pc.category_id
+                   WHERE pc.package_id = p.package_id AND c.name IN ({placeholders}))""")
+        params.update({f"category{i}": v for i, v in enumerate(categories)})
+
+    for key, column, op, cast in (('min_price', 'p.price', '>=', float),
+                                  ('max_price', 'p.price', '<=', float),
+                                  ('min_duration', 'p.duration', '>=', int),
+                                  ('max_duration', 'p.duration', '<=', int)):
+        if filters.get(key) not in (None, ''):
+            conditions.append(f"{column} {op} :{key}")
+            params[key] = cast(filters[key])
+
+    if filters.get('q'):
+        conditions.append("(p.name LIKE :q OR p.description LIKE :q)")
+        params['q'] = f"%{filters['q']}%"
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+
+def format_package(row):
+    """
+    Shapes one catalog row the way the frontend expects a package.
+    """
+    images = json.loads(row['images']) if row['images'] else []
+    categories = json.loads(row['categories']) if row['categories'] else []
+
+    # One dict per image, in the same order as images: {'card': {'webp': url, 'jpeg': url, 'width': .., 'height': ..}, ...}
+    # Empty until the background job has resized that image
+    variants_by_image = {}
+    for image_id, variant, fmt, path, width, height in (json.loads(row['image_variants']) if row['image_variants'] else []):
+        sizes = variants_by_image.setdefault(image_id, {})
+        sizes.setdefault(variant, {'width': width, 'height': height})[fmt] = image_server.versioned_url(path)
+
+    return {
+        'package_id': row['package_id'],
+        'name': row['name'],
+        'description': row['description'],
+        'duration': row['duration'],
+        'price': row['price'],
+        'capacity': row['capacity'],
+        'location_id': row['location_id'],
+        'location_city': row['location_city'],
+        'location_country': row['location_country'],
+        # ?v=<content hash> URLs, so browsers can cache the images as immutable
+        'images': [image_server.versioned_url(path) for _, path in images] if images else None,
+        'image_variants': [variants_by_image.get(image_id, {}) for image_id, _ in images],
+        'hasImages': len(images) > 0,
+        'categories': [name for _, name in categories],
+        'category_ids': [category_id for category_id, _ in categories],
+    }
+
+
+def fetch_catalog(filters=None, sort='package_id', order='asc', page=1, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Returns fully assembled packages (location, ordered images, category names) in one query.
+
+    Args:
+        filters (dict): See build_filters.
+        sort (str): One of SORT_COLUMNS.
+        order (str): 'asc' or 'desc'.
+        page (int): 1-based page number.
+        page_size (int): Packages per page, capped at MAX_PAGE_SIZE.
+
+    Returns:
+        dict: {'packages': [...], 'total': int, 'page': int, 'page_size': int}
+
+    Raises:
+        ValueError: For unknown sort keys or bad filter / paging values.
+    """
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Unknown sort key: {sort}")
+    if order.lower() not in ('asc', 'desc'):
+        raise ValueError(f"Unknown sort order: {order}")
+    page = int(page)
+    page_size = min(int(page_size), MAX_PAGE_SIZE)
+    if page < 1 or page_size < 1:
+        raise ValueError("page and page_size must be positive")
+
+    where, params = build_filters(filters or {})
+    order_by = f"{SORT_COLUMNS[sort]} {order.upper()}, p.package_id ASC"
+    params.update({'limit': page_size, 'offset': (page - 1) * page_size})
+
+    # Cached per filter/sort/page, any write to a table the query reads drops it
+    rows = db.fetch_rows(CATALOG_QUERY.format(where=where, order_by=order_by), params, cache=True, ttl=CATALOG_CACHE_TTL)
+    if rows is None:
+        raise RuntimeError("Failed to fetch the package catalog")
+
+    if rows:
+        total = rows[0]['total_count']
+    elif page > 1:
+        # Past the last page the window count has no row to ride on, so count separately
+        count_rows = db.fetch_rows(COUNT_QUERY.format(where=where), params)
+        total = count_rows[0]['total_count'] if count_rows else 0
+    else:
+        total = 0
+
+    return {
+        'packages': [format_package(row) for row in rows],
+        'total': total,
+        'page': page,
+        'page_size': page_size,
+    }
+
+
+# ---- Package writes ----
+
+# Category name -> category_id, filled lazily; names not in it are looked up with one IN query.
+# Dropped on any commit that writes Categories, and every CATEGORY_CACHE_TTL seconds for other processes' writes
+CATEGORY_CACHE_TTL = 300
+_category_ids = {}
+_category_lock = threading.Lock()
+_category_loaded_at = time.monotonic()
+
+
+def resolve_category_ids(names, session=None):
+    """
+    Maps category names to ids using the cached map, fetching any unknown names in a single query.
+
+    Args:
+        names (iterable): Category names.
+        session (Session): Optional session to query with (e.g. the caller's transaction).
+
+    Returns:
+        dict: name -> category_id for every name that exists (unknown names are left out).
+    """
+    if time.monotonic() - _category_loaded_at > CATEGORY_CACHE_TTL:
+        invalidate_category_cache()
+    names = list(dict.fromkeys(names))
+    missing = [name for name in names if name not in _category_ids]
+    if missing:
+        placeholders = ', '.join(f":name{i}" for i in range(len(missing)))
+        query = text(f"SELECT name, category_id FROM Categories WHERE name IN ({placeholders})")
+        params = {f"name{i}": name for i, name in enumerate(missing)}
+        if session is not None:
+            rows = session.execute(query, params).fetchall()
+        else:
+            rows = db.fetch_rows(f"SELECT name, category_id FROM Categories WHERE name IN ({placeholders})", params, as_tuples=True) or []
+        with _category_lock:
+            _category_ids.update({name: category_id for name, category_id in rows})
+    return {name: _category_ids[name] for name in names if name in _category_ids}
+
+
+def invalidate_category_cache():
+    global _category_loaded_at
+    with _category_lock:
+        _category_ids.clear()
+        _category_loaded_at = time.monotonic()
+
+
+query_cache.on_write(['Categories'], invalidate_category_cache)
+
+
+def _sync_categories(session, wanted, replace=True):
+    """
+    Applies category changes for many packages at once inside the caller's transaction.
+
+    Args:
+        session (Session): The open session.
+        wanted (dict): package_id -> set of category_ids the package should have.
+        replace (bool): Remove categories not in the wanted set (False only adds).
+
+    Returns:
+        tuple: (number of links added, number of links removed)
+    """
+    if not wanted:
+        return 0, 0
+    package_ids = list(wanted)
+    placeholders = ', '.join(f":p{i}" for i in range(len(package_ids)))
+    rows = session.execute(
+        text(f"SELECT package_id, category_id FROM PackageCategory WHERE package_id IN ({placeholders})"),
+        {f"p{i}": package_id for i, package_id in enumerate(package_ids)},
+    ).fetchall()
+    existing = {package_id: set() for package_id in package_ids}
+    for package_id, category_id in rows:
+        existing[package_id].add(category_id)
+
+    to_add = [{'package_id': package_id, 'category_id': category_id}
+              for package_id, category_ids in wanted.items()
+              for category_id in category_ids - existing[package_id]]
+    to_remove = []
+    if replace:
+        to_remove = [{'package_id': package_id, 'category_id': category_id}
+                     for package_id, category_ids in wanted.items()
+                     for category_id in existing[package_id] - category_ids]
+
+    if to_add:
+        session.execute(text("INSERT INTO PackageCategory (package_id, category_id) VALUES (:package_id, :category_id)"), to_add)
+    if to_remove:
+        session.execute(text("DELETE FROM PackageCategory WHERE package_id = :package_id AND category_id = :category_id"), to_remove)
+    return len(to_add), len(to_remove)
+
+
+def upsert_package(package_data, category_names):
+    """
+    Inserts or updates a package and syncs its categories in one transaction.
+
+    Args:
+        package_data (dict): package_id ('new'/None for a new package), name, description,
+            location_id, duration, price and optionally capacity.
+        category_names (list): The category names the package should end up with.
+
+    Returns:
+        int: The package_id.
+    """
+    package_data = dict(package_data)
+    is_new = package_data.get('package_id') in (None, '', 'new')
+    # capacity is only written when it's given, so older clients don't reset it to unlimited
+    columns = ['name', 'description', 'location_id', 'duration', 'price'] + (['capacity'] if 'capacity' in package_data else [])
+    if is_new:
+        package_data.pop('package_id', None)
+        package_query = f"""
+            INSERT INTO Packages ({', '.join(columns)})
+            VALUES ({', '.join(':' + c for c in columns)})
+            RETURNING package_id
+        """
+    else:
+        package_query = f"""
+            INSERT INTO Packages (package_id, {', '.join(columns)})
+            VALUES (:package_id, {', '.join(':' + c for c in columns)})
+            ON CONFLICT(package_id) DO UPDATE SET
+                {', '.join(f"{c} = excluded.{c}" for c in columns)}
+            RETURNING package_id
+        """
+
+    session = Session()
+    try:
+        package_id = session.execute(text(package_query), package_data).scalar_one()
+        category_ids = set(resolve_category_ids(category_names, session=session).values())
+        _sync_categories(session, {package_id: category_ids})
+        session.commit()
+        return package_id
+    except Exception:
+        session.rollback()
+        print(traceback.format_exc())
+        raise
+    finally:
+        session.close()
+
+
+def retag_packages(assignments, replace=True):
+    """
+    Re-tags many packages at once: one name lookup, one read of the current links and one
+    executemany each for inserts and deletes, all in a single transaction.
+
+    Args:
+        assignments (dict): package_id -> list of category names.
+        replace (bool): True to make each package's categories exactly the given list,
+            False to only add the given categories.
+
+    Returns:
+        dict: {'added': int, 'removed': int, 'unknown_categories': [names]}
+    """
+    all_names = {name for names in assignments.values() for name in names}
+    session = Session()
+    try:
+        name_to_id = resolve_category_ids(all_names, session=session)
+        wanted = {int(package_id): {name_to_id[name] for name in names if name in name_to_id}
+                  for package_id, names in assignments.items()}
+        added, removed = _sync_categories(session, wanted, replace=replace)
+        session.commit()
+    except Exception:
+        session.rollback()
+        print(traceback.format_exc())
+        raise
+    finally:
+        session.close()
+    return {'added': added, 'removed': removed, 'unknown_categories': sorted(all_names - set(name_to_id))}
@@ -0,0 +1,86 @@
+import traceback
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from db.db_config import Session
+from helper_modules import popularity
+from helper_modules import idempotency
+from helper_modules import availability
+
+
+def finalize_order(user_email, booking_ids, total_price, order_date=None, idempotency_key=None, booking_prices=None):
+    """
+    Writes a paid order in a single transaction: the Orders row (id via RETURNING), every
+    OrderItems link in one executemany, one set-based status update for the bookings, the
+    popularity counters and the bookings' capacity holds. Either all of it lands or none of it does.
+
+    Args:
+        user_email (str): The customer's email.
+        booking_ids (list): The in-cart booking ids being paid for.
+        total_price (float): The order total.
+        order_date (str): 'YYYY-MM-DD', defaults to today.
+        idempotency_key (str): If given, the update-orders response is stored under this key in the
+            same transaction. If another request already stored it, nothing is written and that
+            request's order_id is returned instead.
+        booking_prices (dict): booking_id -> the line total actually charged (from the pricing quote),
+            written to Bookings.price with the status change.
+
+    Returns:
+        int: The new order_id.
+    """
+    order_date = order_date or datetime.now().strftime('%Y-%m-%d')
+    booking_ids = list(dict.fromkeys(int(booking_id) for booking_id in booking_ids))  # dedupe, keep order
+
+    session = Session()
+    try:
+        order_id = session.execute(
+            text("""
+                INSERT INTO Orders (email, total_price, order_date, payment_date, payment_status)
+                VALUES (:email, :total_price, :order_date, :payment_date, 'paid')
+                RETURNING order_id
+            """),
+            {'email': user_email, 'total_price': total_price, 'order_date': order_date, 'payment_date': order_date},
+        ).scalar_one()
+
+        # executemany for the links
+        session.execute(
+            text("INSERT INTO OrderItems (order_id, booking_id) VALUES (:order_id, :booking_id)"),
+            [{'order_id': order_id, 'booking_id': booking_id} for booking_id in booking_ids],
+        )
+
+        # the checkout holds become real occupancy (read before the status changes)
+        capacity_changes = availability.record_checkout(booking_ids, session)
+
+        # one UPDATE for all the bookings
+        placeholders = ', '.join(f":b{i}" for i in range(len(booking_ids)))
+        session.execute(
+            text(f"UPDATE Bookings SET status = 'pending' WHERE booking_id IN ({placeholders})"),
+            {f"b{i}": booking_id for i, booking_id in enumerate(booking_ids)},
+        )
+        if booking_prices:
+            session.execute(
+                text("UPDATE Bookings SET price = :price WHERE booking_id = :booking_id"),
+                [{'booking_id': int(booking_id), 'price': price} for booking_id, price in booking_prices.items()],
+            )
+
+        popularity_counts = popularity.record_bookings(booking_ids, order_date, session=session)
+
+        if idempotency_key is not None:
+            try:
+                idempotency.remember('update-orders', idempotency_key, {'success': True, 'order_id': order_id}, 200, session=session)
+            except IntegrityError:
+                # Lost the race to another worker finalizing the same payment, keep its order
+                session.rollback()
+                return idempotency.lookup('update-orders', idempotency_key)[0]['order_id']
+
+        session.commit()
+    except Exception:
+        session.rollback()
+        print(f"Error finalizing order: {traceback.format_exc()}")
+        raise
+    finally:
+        session.close()
+
+    popularity.apply_to_snapshot(popularity_counts, order_date)
+    availability.apply_checkout(capacity_changes)
+    return order_id
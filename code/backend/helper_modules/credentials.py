@@ -0,0 +1,162 @@
+import os
+import time
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import bcrypt
+from helper_modules import db_helper as db
+
+# bcrypt runs on a bounded process pool instead of the request thread, so a burst of logins can only
+# use CREDENTIAL_WORKERS cores and every other endpoint keeps responding.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))                  # work factor for new / rehashed passwords
+WORKERS = int(os.getenv("CREDENTIAL_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+MAX_QUEUE = int(os.getenv("CREDENTIAL_MAX_QUEUE", 64))               # jobs waiting + running before we refuse
+TIMEOUT = float(os.getenv("CREDENTIAL_TIMEOUT", 10))                 # seconds a request waits for its hash
+
+_executor = None
+_lock = threading.Lock()
+# The rehash UPDATE runs here, not in the process pool's done callback, so verifications waiting on the
+# pool's result thread never queue behind a db write
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="credentials-db")
+_stats = {'submitted': 0, 'completed': 0, 'rejected': 0, 'rehashed': 0,
+          'queue_depth': 0, 'max_queue_depth': 0, 'wait_ms_total': 0.0, 'run_ms_total': 0.0}
+
+
+class CredentialServiceBusy(Exception):
+    """Raised when too many hashing jobs are already queued."""
+
+
+def _check(password, hashed):
+    start = time.perf_counter()
+    ok = bcrypt.checkpw(password, hashed)
+    return ok, (time.perf_counter() - start) * 1000
+
+
+def _hash(password, rounds):
+    start = time.perf_counter()
+    hashed = bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+    return hashed, (time.perf_counter() - start) * 1000
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=WORKERS)
+    return _executor
+
+
+def _submit(fn, *args):
+    with _lock:
+        if _stats['queue_depth'] >= MAX_QUEUE:
+            _stats['rejected'] += 1
+            raise CredentialServiceBusy("Too many login attempts in progress, try again shortly.")
+        _stats['queue_depth'] += 1
+        _stats['max_queue_depth'] = max(_stats['max_queue_depth'], _stats['queue_depth'])
+        _stats['submitted'] += 1
+    submitted_at = time.perf_counter()
+    try:
+        future = _get_executor().submit(fn, *args)
+    except BaseException:
+        # Nothing was queued, so nothing will call _done to give the slot back
+        with _lock:
+            _stats['queue_depth'] -= 1
+            _stats['submitted'] -= 1
+        raise
+
+    def _done(f):
+        with _lock:
+            _stats['queue_depth'] -= 1
+            _stats['completed'] += 1
+            if not f.cancelled() and f.exception() is None:
+                run_ms = f.result()[1]
+                _stats['run_ms_total'] += run_ms
+                _stats['wait_ms_total'] += max(0.0, (time.perf_counter() - submitted_at) * 1000 - run_ms)
+    future.add_done_callback(_done)
+    return future
+
+
+def hash_password(password):
+    """
+    Hashes a password at the configured work factor on the pool.
+
+    Returns:
+        str: The bcrypt hash.
+
+    Raises:
+        CredentialServiceBusy: If the queue is full.
+    """
+    hashed, _ = _submit(_hash, password.encode('utf-8'), BCRYPT_ROUNDS).result(timeout=TIMEOUT)
+    return hashed.decode('utf-8')
+
+
+def verify_password(password, stored_hash):
+    """
+    Checks a password against a stored bcrypt hash on the pool.
+
+    Raises:
+        CredentialServiceBusy: If the queue is full.
+    """
+    ok, _ = _submit(_check, password.encode('utf-8'), stored_hash.encode('utf-8')).result(timeout=TIMEOUT)
+    return ok
+
+
+def get_rounds(stored_hash):
+    """The work factor of a bcrypt hash ('$2b$12$...' -> 12), or None if it isn't one."""
+    try:
+        return int(stored_hash.split('$')[2])
+    except (IndexError, ValueError, AttributeError):
+        return None
+
+
+def needs_rehash(stored_hash):
+    """Only hashes weaker than BCRYPT_ROUNDS are redone, stronger ones are kept as they are."""
+    rounds = get_rounds(stored_hash)
+    return rounds is None or rounds < BCRYPT_ROUNDS
+
+
+def rehash_in_background(email, password, old_hash):
+    """
+    Re-hashes a just verified password at the configured cost and stores it, without holding up the
+    login. Only replaces the hash if it hasn't changed in the meantime (e.g. a password change).
+    """
+    try:
+        future = _submit(_hash, password.encode('utf-8'), BCRYPT_ROUNDS)
+    except CredentialServiceBusy:
+        return  # not important, it'll happen on a later login
+
+    def _store(f):
+        try:
+            new_hash = f.result()[0].decode('utf-8')
+            result = db.execute_query(
+                "UPDATE Users SET password = :new_hash WHERE email = :email AND password = :old_hash",
+                {'new_hash': new_hash, 'email': email, 'old_hash': old_hash},
+            )
+            if result is not None and result.rowcount:
+                with _lock:
+                    _stats['rehashed'] += 1
+        except Exception:
+            print(f"Error rehashing password: {traceback.format_exc()}")
+    future.add_done_callback(lambda f: _writer.submit(_store, f))
+
+
+def get_stats():
+    """
+    Returns pool size, current / peak queue depth, rejections and average wait / run times.
+    """
+    with _lock:
+        completed = _stats['completed'] or 1
+        return {
+            'workers': WORKERS,
+            'bcrypt_rounds': BCRYPT_ROUNDS,
+            'max_queue': MAX_QUEUE,
+            'queue_depth': _stats['queue_depth'],
+            'max_queue_depth': _stats['max_queue_depth'],
+            'submitted': _stats['submitted'],
+            'completed': _stats['completed'],
+            'rejected': _stats['rejected'],
+            'rehashed': _stats['rehashed'],
+            'avg_wait_ms': round(_stats['wait_ms_total'] / completed, 2),
+            'avg_run_ms': round(_stats['run_ms_total'] / completed, 2),
+        }
@@ -1,8 +1,11 @@
 from sqlalchemy.orm import sessionmaker
 import pandas as pd
 import traceback
-from sqlalchemy import text, inspect, Boolean
-from db.db_config import Session
+from sqlalchemy import text, Boolean, Date, DateTime, Numeric
+from db.db_config import Session, ReadSession, engine
+from db.schema_registry import get_table_schema
+from helper_modules import query_cache
+from helper_modules.query_cache import statement_verb
 import sys, os, re
 from datetime import datetime
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -15,7 +18,20 @@ if current_dir not in sys.path:
 
 # Define the session
 
-def fetch_data(query, params=None):
+# Commits through the write engine drop the cached results of the tables they touched
+query_cache.install(engine, Session)
+
+
+def _cache_lookup(query, params):
+    """Returns (key, tables, versions, cached value or None) for a cacheable read query, or Nones if it isn't one."""
+    key = query_cache.make_key(query, params) if is_read_query(query) else None
+    if key is None:
+        return None, None, None, None
+    tables = query_cache.referenced_tables(query)
+    return key, tables, query_cache.cache.versions(tables), query_cache.cache.get(key)
+
+
+def fetch_data(query, params=None, cache=False, ttl=None):
     """
     Fetches data from the database using a raw SQL query and returns a pandas DataFrame.
     Automatically converts BOOLEAN-like columns to Python booleans.
@@ -23,12 +39,20 @@ def fetch_data(query, params=None):
     Args:
         query (str): The SQL query to execute.
         params (dict): Optional dictionary of parameters to bind to the query.
+        cache (bool): Serve / store the result in the query cache (read queries only). Meant for
+            reference tables that rarely change; writes to any table the query reads invalidate it.
+        ttl (float): Seconds the cached result stays valid, defaults to QUERY_CACHE_TTL.
     
     Returns:
         pd.DataFrame: A pandas DataFrame containing the retrieved rows, with boolean columns converted.
     """
+    if cache:
+        key, tables, versions, cached = _cache_lookup(query, params)
+        if cached is not None:
+            return cached.copy()
     try:
-        session = Session()
+        # Plain SELECTs go to the read-only engine so they don't queue behind writers
+        session = ReadSession() if is_read_query(query) else Session()
 
         # Extract table name from the SQL query
         table_name = extract_table_name(query)
@@ -46,95 +70,293 @@ def fetch_data(query, params=None):
         # Convert to a pandas DataFrame
         df = pd.DataFrame(rows, columns=column_names)
 
-        # If a table name was successfully extracted, inspect its columns for boolean types
-        if table_name:
-            boolean_columns = []
-            # Get table metadata
-            inspector = inspect(session.get_bind())
-            columns_info = inspector.get_columns(table_name)
-            
-            # Identify boolean columns
-            for column_info in columns_info:
-                if isinstance(column_info['type'], Boolean):
-                    boolean_columns.append(column_info['name'])
-            
-            # Convert boolean-like columns to Python booleans
-            for col in boolean_columns:
+        # If a table name was successfully extracted, convert its boolean columns (schema comes from the cache)
+        schema = get_table_schema(session.get_bind(), table_name)
+        if schema:
+            for col in schema.boolean_columns:
                 if col in df.columns:
                     df[col] = df[col].astype(bool)
 
         # Close the session
         session.close()
 
+        if cache and key is not None:
+            query_cache.cache.put(key, tables, df.copy(), versions, ttl)
         return df
     except Exception:
         print(traceback.format_exc())
         return None
     
-def upsert_data(table_name, df):
+def fetch_rows(query, params=None, as_tuples=False, cache=False, ttl=None):
     """
-    Performs an UPSERT operation on the specified table using the data in the DataFrame.
-    
+    Fetches data from the database using a raw SQL query without going through pandas.
+    Boolean, Date and Numeric columns are converted with per-column converters that are
+    compiled once per (table, column list) and reused.
+
+    Use this for request handlers; fetch_data (DataFrame) is still there for analytics.
+
     Args:
-        table_name (str): The name of the table to upsert data into.
-        df (pd.DataFrame): The DataFrame containing data to insert/update.
-    
+        query (str): The SQL query to execute.
+        params (dict): Optional dictionary of parameters to bind to the query.
+        as_tuples (bool): Return plain tuples instead of dicts.
+        cache (bool): Serve / store the result in the query cache, see fetch_data.
+        ttl (float): Seconds the cached result stays valid.
+
     Returns:
-        bool: True if the operation is successful, False otherwise.
+        list: A list of dicts (or tuples) for the retrieved rows, or None if the query failed.
     """
+    if cache:
+        key, tables, versions, cached = _cache_lookup(query, params)
+        if cached is not None:
+            column_names, rows = cached
+            if as_tuples:
+                return list(rows)
+            return [dict(zip(column_names, row)) for row in rows]
+
     session = None
     try:
-        session = Session()
+        session = ReadSession() if is_read_query(query) else Session()
+
+        if params:
+            result = session.execute(text(query), params)
+        else:
+            result = session.execute(text(query))
+
+        column_names = tuple(result.keys())
+        rows = result.fetchall()
+
+        converters = get_row_converters(session.get_bind(), extract_table_name(query), column_names)
+        rows = apply_row_converters(rows, converters)
+
+        if cache and key is not None:
+            # cached as immutable tuples, every hit builds fresh dicts
+            query_cache.cache.put(key, tables, (column_names, [tuple(row) for row in rows]), versions, ttl)
+
+        if as_tuples:
+            return [tuple(row) for row in rows]
+        return [dict(zip(column_names, row)) for row in rows]
+    except Exception:
+        print(traceback.format_exc())
+        return None
+    finally:
+        if session:
+            session.close()
 
-        # Ensure all required columns (including those with defaults like is_admin) are in the DataFrame
-        table_metadata = session.execute(text(f"PRAGMA table_info({table_name})")).fetchall()
 
-        table_columns = {col[1]: col for col in table_metadata}  # Dictionary of column names and info
+def _to_bool(value):
+    return bool(value)
 
-        # Check if the primary key (email in this case) already exists in the database
-        conflict_column = df.columns[0]  # Assuming the first column (email) is the conflict target (primary key)
-        existing_record = session.execute(
-            text(f"SELECT * FROM {table_name} WHERE {conflict_column} = :conflict_value"),
-            {'conflict_value': df.iloc[0][conflict_column]}
-        ).fetchone()
 
-        # If the user exists, ensure we keep their password if it's not in the DataFrame
-        if existing_record:
-            for col_name, col_info in table_columns.items():
-                if col_name == 'password' and col_name not in df.columns:  # Fetch the existing password
-                    df[col_name] = existing_record.password
+def _to_date_string(value):
+    # sqlite already hands dates back as ISO strings, only real date objects need formatting
+    if value.__class__ is str or value is None:
+        return value
+    return value.isoformat()
 
-        # Add default values for missing columns, if necessary
-        for col_name, col_info in table_columns.items():
-            if col_name not in df.columns and col_info[4] is not None:  # col_info[4] is the default value
-                df[col_name] = col_info[4]  # Assign the default value to the missing column
 
-        # Prepare the insert/update SQL
-        columns = df.columns.tolist()
-        values = df.iloc[0].to_dict()
+def _to_number(value):
+    if value is None or value.__class__ is float:
+        return value
+    return float(value)
 
-        # Build SQL query
-        column_names = ', '.join(columns)
-        value_placeholders = ', '.join([f":{col}" for col in columns])
 
-        # Conflict target is assumed to be the first column (e.g., email)
-        conflict_target = columns[0]
-        set_clause = ', '.join([f"{col} = :{col}" for col in columns if col != conflict_target])
+def get_row_converters(bind, table_name, column_names):
+    """
+    Returns the per-column converters for a result set, built from the cached table schema.
+
+    Args:
+        bind: Engine used if the schema cache needs to be built.
+        table_name (str): The table the query reads from (from extract_table_name).
+        column_names (tuple): The result's column names, in order.
+
+    Returns:
+        tuple: One converter (or None) per column, or None if nothing needs converting.
+    """
+    schema = get_table_schema(bind, table_name)
+    if schema is None:
+        return None
+
+    # Cached on the schema itself so invalidating the schema cache drops these too
+    if column_names in schema.converters:
+        return schema.converters[column_names]
+
+    converters = []
+    for col in column_names:
+        col_type = schema.column_types.get(col)
+        if isinstance(col_type, Boolean):
+            converters.append(_to_bool)
+        elif isinstance(col_type, (Date, DateTime)):
+            converters.append(_to_date_string)
+        elif isinstance(col_type, Numeric):
+            converters.append(_to_number)
+        else:
+            converters.append(None)
+    converters = tuple(converters) if any(converters) else None
+
+    schema.converters[column_names] = converters
+    return converters
+
+
+def apply_row_converters(rows, converters):
+    """
+    Applies converters from get_row_converters to fetched rows.
+
+    Args:
+        rows (list): Rows as returned by fetchall()/fetchmany().
+        converters (tuple): One converter (or None) per column, or None for no conversion.
+
+    Returns:
+        list: The converted rows (the original rows if nothing needs converting).
+    """
+    if not converters:
+        return rows
+    # Only touch the columns that actually need converting
+    to_convert = [(i, conv) for i, conv in enumerate(converters) if conv]
+    converted = []
+    for row in rows:
+        values = list(row)
+        for i, conv in to_convert:
+            values[i] = conv(values[i])
+        converted.append(values)
+    return converted
+
 
-        # Construct the UPSERT SQL command
-        cmd_text = f"""
+UPSERT_CHUNK_SIZE = 500
+
+# (table, columns, conflict target, update columns) -> compiled text() UPSERT statement, so each shape is only built once
+_upsert_statements = {}
+
+
+def _get_upsert_statement(table_name, columns, conflict_target, update_columns):
+    key = (table_name, columns, conflict_target, update_columns)
+    statement = _upsert_statements.get(key)
+    if statement is None:
+        column_names = ', '.join(columns)
+        value_placeholders = ', '.join([f":{col}" for col in columns])
+        if update_columns:
+            conflict_action = "DO UPDATE SET " + ', '.join([f"{col} = excluded.{col}" for col in update_columns])
+        else:
+            conflict_action = "DO NOTHING"
+        statement = text(f"""
         INSERT INTO {table_name} ({column_names})
         VALUES ({value_placeholders})
-        ON CONFLICT ({conflict_target})
-        DO UPDATE SET {set_clause};
-        """
+        ON CONFLICT ({', '.join(conflict_target)})
+        {conflict_action}
+        """)
+        _upsert_statements[key] = statement
+    return statement
+
+
+def _to_records(data):
+    """
+    Turns a DataFrame, a single dict or an iterable of dicts into a list of plain dicts
+    (native Python values, NaN -> None) with the same keys in every row.
+    """
+    if isinstance(data, pd.DataFrame):
+        records = data.astype(object).where(pd.notna(data), None).to_dict(orient='records')
+    elif isinstance(data, dict):
+        records = [dict(data)]
+    else:
+        records = [dict(row) for row in data]
+
+    columns = list(dict.fromkeys(col for row in records for col in row))
+    return [{col: row.get(col) for col in columns} for row in records], columns
+
+
+def _fetch_existing(session, schema, key_columns, fill_columns, records):
+    """
+    Looks up which of the records' primary keys already exist (one query per chunk), along with
+    the values of any NOT NULL columns the records don't carry.
+
+    Returns:
+        dict: primary key tuple -> {column: existing value}
+    """
+    keyed = [tuple(row[col] for col in key_columns) for row in records]
+    keyed = [key for key in dict.fromkeys(keyed) if None not in key]
+    if not keyed:
+        return {}
+
+    select_columns = ', '.join(list(key_columns) + fill_columns)
+    if len(key_columns) == 1:
+        placeholders = ', '.join(f":k{i}_0" for i in range(len(keyed)))
+        where = f"{key_columns[0]} IN ({placeholders})"
+    else:
+        placeholders = ', '.join(
+            "(" + ', '.join(f":k{i}_{j}" for j in range(len(key_columns))) + ")" for i in range(len(keyed))
+        )
+        where = f"({', '.join(key_columns)}) IN (VALUES {placeholders})"
+    params = {f"k{i}_{j}": value for i, key in enumerate(keyed) for j, value in enumerate(key)}
+
+    rows = session.execute(text(f"SELECT {select_columns} FROM {schema.name} WHERE {where}"), params).fetchall()
+    n_keys = len(key_columns)
+    return {tuple(row[:n_keys]): dict(zip(fill_columns, row[n_keys:])) for row in rows}
+
+
+def upsert_data(table_name, data, chunk_size=UPSERT_CHUNK_SIZE):
+    """
+    Performs a bulk UPSERT on the specified table.
+
+    Rows go out in chunks through one cached INSERT ... ON CONFLICT (<primary key>) DO UPDATE
+    statement with executemany, all inside a single transaction. Columns that aren't in the data
+    are left alone on update; NOT NULL columns the data doesn't carry (e.g. a user's password) are
+    filled from the existing row so the INSERT half of the statement stays valid.
+
+    Args:
+        table_name (str): The name of the table to upsert data into.
+        data (pd.DataFrame | dict | iterable of dicts): The rows to insert/update.
+        chunk_size (int): Rows per executemany batch.
+
+    Returns:
+        dict: {'inserted': int, 'updated': int} if the operation is successful, False otherwise.
+    """
+    session = None
+    try:
+        session = Session()
+
+        schema = get_table_schema(session.get_bind(), table_name)
+        if schema is None:
+            raise ValueError(f"Unknown table: {table_name}")
+
+        records, columns = _to_records(data)
+        unknown = [col for col in columns if col not in schema.column_types]
+        if unknown:
+            raise ValueError(f"Unknown columns for {table_name}: {unknown}")
+
+        # Conflict target is the table's real primary key
+        conflict_target = tuple(schema.primary_key) or (columns[0],)
+        key_columns = [col for col in conflict_target if col in columns]
+        fill_columns = [col for col in schema.required_columns if col not in columns and col not in conflict_target]
+        # Only the caller's columns get updated, filled-in values are just there to satisfy NOT NULL
+        update_columns = tuple(col for col in columns if col not in conflict_target)
+
+        inserted = updated = 0
+        for start in range(0, len(records), chunk_size):
+            chunk = records[start:start + chunk_size]
+
+            existing = {}
+            if len(key_columns) == len(conflict_target):
+                existing = _fetch_existing(session, schema, key_columns, fill_columns, chunk)
+
+            # Fill the NOT NULL columns the caller left out from the rows that already exist
+            for row in chunk:
+                key = tuple(row[col] for col in key_columns)
+                if key in existing:
+                    updated += 1
+                    for col in fill_columns:
+                        row[col] = existing[key][col]
+                else:
+                    inserted += 1
+                    for col in fill_columns:
+                        row[col] = None  # new row missing a NOT NULL column, sqlite will reject it
+
+            chunk_columns = tuple(chunk[0].keys())
+            statement = _get_upsert_statement(schema.name, chunk_columns, conflict_target, update_columns)
+            session.execute(statement, chunk)
 
-        # Execute the UPSERT
-        session.execute(text(cmd_text), values)
         session.commit()
 
-        print("UPSERT operation completed successfully.")
-        return True
+        print(f"UPSERT operation completed successfully ({inserted} inserted, {updated} updated).")
+        return {'inserted': inserted, 'updated': updated}
 
     except Exception as e:
         if session:
@@ -144,7 +366,7 @@ def upsert_data(table_name, df):
     finally:
         if session:
             session.close()
-  
+
 def execute_query(query, params=None):
     """
     Executes a given SQL query and returns the result.
@@ -177,14 +399,29 @@ def execute_query(query, params=None):
         if session:
             session.close()  # Always close the session after the query is done
 
-def make_backup(tablename):
-    # Fetch the data
-    df = fetch_data(f"SELECT * FROM {tablename}")
-    
-    if df is None or df.empty:
+def make_backup(tablename, gzip=False):
+    """
+    Streams a table to db/backups as NDJSON (one JSON object per line), batch by batch, so a big table
+    never has to fit in memory.
+
+    Args:
+        tablename (str): The table to back up.
+        gzip (bool): Compress the backup (.ndjson.gz).
+
+    Returns:
+        str: The backup file path, or None if the table is empty or the backup failed.
+    """
+    from helper_modules import exporter  # exporter builds on this module
+
+    schema = get_table_schema(engine, tablename)
+    if schema is None:
+        print(f"Unknown table: {tablename}")
+        return None
+    tablename = schema.name
+    if not fetch_rows(f"SELECT 1 FROM {tablename} LIMIT 1"):
         print(f"No data found in table: {tablename}")
-        return
-    
+        return None
+
     # Get the absolute path to the current file (db_helper.py)
     current_dir = os.path.dirname(os.path.abspath(__file__))
     
@@ -199,14 +436,16 @@ def make_backup(tablename):
     current_time = datetime.now().strftime("%d-%m-%Y_%H-%M")
     
     # Create the backup file path
-    backup_file = os.path.join(backup_folder, f"{tablename} backup - {current_time}.json")
+    extension = "ndjson.gz" if gzip else "ndjson"
+    backup_file = os.path.join(backup_folder, f"{tablename} backup - {current_time}.{extension}")
     
-    # Convert the DataFrame to JSON and save it to the backup file
     try:
-        df.to_json(backup_file, orient='records', indent=4)  # Save the DataFrame to a JSON file
+        exporter.export_to_file(f"SELECT * FROM {tablename}", backup_file, gzip=gzip)
         print(f"Backup of {tablename} saved to {backup_file}")
+        return backup_file
     except Exception as e:
         print(f"Error saving backup: {traceback.format_exc()}")
+        return None
 
 
 def read_backup(filename):
@@ -222,9 +461,10 @@ def read_backup(filename):
         print(f"File {filename} does not exist in backups folder.")
         return None
     
-    # Read the JSON file and convert it to a DataFrame
+    # Read the backup into a DataFrame: NDJSON (optionally gzipped) from make_backup, or the older plain JSON array
     try:
-        df = pd.read_json(backup_file)
+        lines = filename.endswith(('.ndjson', '.ndjson.gz'))
+        df = pd.read_json(backup_file, lines=lines, compression='infer')
         print(f"Backup {filename} successfully read.")
         return df
     except Exception as e:
@@ -233,6 +473,20 @@ def read_backup(filename):
     
 
 
+def is_read_query(query):
+    """
+    Checks whether a SQL query only reads data (SELECT or WITH ... SELECT, not WITH ... INSERT / UPDATE / DELETE).
+
+    Args:
+        query (str): The SQL query to check.
+
+    Returns:
+        bool: True if the query can run on the read-only engine.
+    """
+    return (re.match(r'\s*(SELECT|WITH)\b', query, re.IGNORECASE) is not None
+            and statement_verb(query) in ('SELECT', 'VALUES'))
+
+
 def extract_table_name(query):
     """
     Extracts the table name from the SQL query string.
@@ -0,0 +1,156 @@
+import io
+import os
+import csv
+import json
+import zlib
+import traceback
+from decimal import Decimal
+from datetime import date, datetime
+from sqlalchemy import text
+from flask import Response, stream_with_context
+from db.db_config import ReadSession, engine
+from db.schema_registry import get_table_schema
+from helper_modules import db_helper as db
+
+# Streaming exports: rows are pulled from the cursor BATCH_SIZE at a time and serialized batch by batch,
+# so memory stays flat however big the table is (nothing is fetchall()'d or turned into a DataFrame).
+BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 2000))
+FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+}
+
+# Columns left out of exports served over HTTP (backups keep everything)
+EXCLUDED_COLUMNS = frozenset({'password'})
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+# One shared encoder, json.dumps(default=...) would build a new one for every row
+_encoder = json.JSONEncoder(default=_json_default)
+
+
+def iter_batches(query, params=None, batch_size=BATCH_SIZE, exclude=(), table=None):
+    """
+    Runs a read query and yields its rows in batches, with the same type conversion as fetch_rows
+    (using table's schema, default the table after FROM). Columns named in exclude are dropped.
+
+    Yields:
+        tuple: The column names first, then lists of row tuples.
+    """
+    session = ReadSession()
+    try:
+        statement = text(query).execution_options(yield_per=batch_size)
+        result = session.execute(statement, params or {})
+        column_names = tuple(result.keys())
+        converters = db.get_row_converters(session.get_bind(), table or db.extract_table_name(query), column_names)
+
+        keep = [i for i, name in enumerate(column_names) if name not in exclude]
+        if len(keep) == len(column_names):
+            keep = None     # nothing to drop, pass the rows straight through
+        yield column_names if keep is None else tuple(column_names[i] for i in keep)
+        for partition in result.partitions(batch_size):
+            rows = db.apply_row_converters(partition, converters)
+            yield rows if keep is None else [tuple(row[i] for i in keep) for row in rows]
+    finally:
+        session.close()
+
+
+def resolve_table(table):
+    """The table's name as stored in the db (so it's safe to put in SQL), or None if there's no such table."""
+    schema = get_table_schema(engine, table)
+    return schema.name if schema else None
+
+
+def iter_ndjson(batches):
+    column_names = next(batches)
+    encode = _encoder.encode
+    for rows in batches:
+        yield ''.join([encode(dict(zip(column_names, row))) + '\n' for row in rows]).encode('utf-8')
+
+
+def iter_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(next(batches))
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def iter_gzip(chunks, level=6):
+    """gzip-compresses a stream of byte chunks on the fly."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)   # wbits 31 = gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def iter_export(query, params=None, fmt='ndjson', gzip=False, batch_size=BATCH_SIZE, exclude=(), table=None):
+    """
+    Yields the encoded export (NDJSON or CSV, optionally gzipped) of a read query.
+
+    Raises:
+        ValueError: For an unknown format or a query that isn't a plain read.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if not db.is_read_query(query):
+        raise ValueError("Only read queries can be exported")
+    batches = iter_batches(query, params, batch_size, exclude, table)
+    chunks = iter_ndjson(batches) if fmt == 'ndjson' else iter_csv(batches)
+    return iter_gzip(chunks) if gzip else chunks
+
+
+def export_response(query, params=None, fmt='ndjson', gzip=False, filename='export', table=None):
+    """
+    Flask streaming response for an export, sent as a file download (EXCLUDED_COLUMNS left out).
+    """
+    chunks = iter_export(query, params, fmt, gzip, exclude=EXCLUDED_COLUMNS, table=table)
+    mimetype, extension = FORMATS[fmt]
+    filename = f"{filename}.{extension}"
+    if gzip:
+        mimetype, filename = 'application/gzip', f"{filename}.gz"
+
+    def generate():
+        try:
+            yield from chunks
+        except Exception:
+            # headers are long gone by now, all we can do is log and cut the stream short
+            print(f"Error during export: {traceback.format_exc()}")
+
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+def export_to_file(query, path, params=None, fmt='ndjson', gzip=False):
+    """
+    Streams an export to a file (written under a temp name and renamed once complete).
+
+    Returns:
+        int: Bytes written.
+    """
+    tmp_path = path + '.tmp'
+    written = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in iter_export(query, params, fmt, gzip):
+                f.write(chunk)
+                written += len(chunk)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return written
@@ -0,0 +1,323 @@
+import os
+import bisect
+import threading
+from collections import defaultdict
+from datetime import datetime
+import numpy as np
+from helper_modules import db_helper as db
+from helper_modules.catalog import _split
+
+# Catalog facets as bitsets: bit n of a value's int is set when package n has that value, so the packages
+# matching a set of filters are an AND (across facets) of ORs (within a facet), and a facet count is
+# popcount(matches & value). Python ints are arbitrary length bitsets with C speed &, | and bit_count().
+#
+# Loaded lazily, patched one package at a time by update_packages / remove_packages (upsert_package, retag
+# and delete_package call them) and reloaded every FACET_REFRESH seconds for writes made by other processes.
+PRICE_EDGES = [int(v) for v in os.getenv("FACET_PRICE_EDGES", "500,1000,2000,5000").split(',')]   # $ bucket edges
+DURATION_EDGES = [int(v) for v in os.getenv("FACET_DURATION_EDGES", "4,8,15").split(',')]         # day bucket edges
+RANGE_STEPS = {'price': float(os.getenv("FACET_PRICE_STEP", 50)), 'duration': 1}                  # bin widths for min/max ranges
+REFRESH_INTERVAL = float(os.getenv("FACET_REFRESH", 300))                                        # seconds before a reload
+FACETS = ('category', 'location', 'price', 'duration')
+
+_lock = threading.Lock()
+_index = None
+
+
+def _buckets(edges, label):
+    """[(key, label, low, high)] for the half-open ranges between the edges, the last one open ended."""
+    bounds = [0] + edges + [None]
+    return [(f"{low}-{high}" if high is not None else f"{low}+", label(low, high), low, high)
+            for low, high in zip(bounds, bounds[1:])]
+
+
+PRICE_BUCKETS = _buckets(PRICE_EDGES, lambda low, high: f"${low} - ${high}" if high is not None else f"${low}+")
+DURATION_BUCKETS = _buckets(DURATION_EDGES, lambda low, high: f"{low}-{high - 1} days" if high is not None else f"{low}+ days")
+
+
+def _bucket_of(buckets, edges, value):
+    return buckets[bisect.bisect_right(edges, value)][0]
+
+
+def _bin_of(facet, value):
+    return int(value // RANGE_STEPS[facet])
+
+
+def _bit_ids(bits):
+    """Package ids of the set bits, ascending."""
+    if not bits:
+        return []
+    raw = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, 'little'), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(raw, bitorder='little')).tolist()
+
+
+class _FacetIndex:
+    def __init__(self):
+        self.all = 0
+        self.values = {facet: defaultdict(int) for facet in FACETS}   # facet -> value -> bitset
+        # min / max ranges: fixed width bins are ORed whole, the exact values only at the two edge bins
+        self.exact = {facet: defaultdict(int) for facet in RANGE_STEPS}   # value -> bitset
+        self.exact_keys = {facet: [] for facet in RANGE_STEPS}            # sorted keys of exact
+        self.bins = {facet: defaultdict(int) for facet in RANGE_STEPS}    # value // step -> bitset
+        self.bin_keys = {facet: [] for facet in RANGE_STEPS}              # sorted keys of bins
+        self.package_values = {}                                      # package_id -> {facet: values}
+        self.package_exact = {}                                       # package_id -> (price, duration)
+        self.locations = {}                                           # location_id -> (city, country)
+        self.loaded_at = datetime.now()
+
+    def load(self):
+        for name, in db.fetch_rows("SELECT name FROM Categories", as_tuples=True) or []:
+            self.values['category'].setdefault(name, 0)
+        for location_id, city, country in db.fetch_rows("SELECT location_id, city, country FROM Locations", as_tuples=True) or []:
+            self.locations[location_id] = (city, country)
+            self.values['location'].setdefault(location_id, 0)
+        for facet, buckets in (('price', PRICE_BUCKETS), ('duration', DURATION_BUCKETS)):
+            for key, *_ in buckets:
+                self.values[facet].setdefault(key, 0)
+        for package in _fetch_packages():
+            self.add(package)
+        return self
+
+    def add(self, package):
+        package_id = package['package_id']
+        bit = 1 << package_id
+        values = {
+            'category': set(package['categories']),
+            'location': {package['location_id']},
+            'price': {_bucket_of(PRICE_BUCKETS, PRICE_EDGES, package['price'])},
+            'duration': {_bucket_of(DURATION_BUCKETS, DURATION_EDGES, package['duration'])},
+        }
+        for facet, facet_values in values.items():
+            for value in facet_values:
+                self.values[facet][value] |= bit
+        for facet in RANGE_STEPS:
+            value = package[facet]
+            for bitsets, keys, key in ((self.exact, self.exact_keys, value), (self.bins, self.bin_keys, _bin_of(facet, value))):
+                if not bitsets[facet][key]:
+                    bisect.insort(keys[facet], key)
+                bitsets[facet][key] |= bit
+        self.package_values[package_id] = values
+        self.package_exact[package_id] = (package['price'], package['duration'])
+        self.all |= bit
+
+    def remove(self, package_id):
+        values = self.package_values.pop(package_id, None)
+        if values is None:
+            return
+        mask = ~(1 << package_id)
+        for facet, facet_values in values.items():
+            for value in facet_values:
+                self.values[facet][value] &= mask
+        for facet, value in zip(('price', 'duration'), self.package_exact.pop(package_id)):
+            for bitsets, keys, key in ((self.exact, self.exact_keys, value), (self.bins, self.bin_keys, _bin_of(facet, value))):
+                bitsets[facet][key] &= mask
+                if not bitsets[facet][key]:
+                    del bitsets[facet][key]
+                    keys[facet].remove(key)
+        self.all &= mask
+
+    def range_bits(self, facet, low, high):
+        """OR of the packages whose exact price / duration is in [low, high] (either end may be None)."""
+        step, bin_keys, exact_keys = RANGE_STEPS[facet], self.bin_keys[facet], self.exact_keys[facet]
+        start = 0 if low is None else bisect.bisect_left(bin_keys, _bin_of(facet, low))
+        end = len(bin_keys) if high is None else bisect.bisect_right(bin_keys, _bin_of(facet, high))
+        bits = 0
+        for key in bin_keys[start:end]:
+            bin_low, bin_high = key * step, (key + 1) * step
+            if (low is None or bin_low >= low) and (high is None or bin_high <= high):
+                bits |= self.bins[facet][key]
+                continue
+            # an edge bin, only some of its values are in range
+            first = bisect.bisect_left(exact_keys, bin_low if low is None else max(low, bin_low))
+            last = bisect.bisect_right(exact_keys, high) if high is not None and high < bin_high else bisect.bisect_left(exact_keys, bin_high)
+            for value in exact_keys[first:last]:
+                bits |= self.exact[facet][value]
+        return bits
+
+
+def _fetch_packages(package_ids=None):
+    """Rows of {'package_id', 'location_id', 'price', 'duration', 'categories'} for the given (or all) packages."""
+    where, params = '', {}
+    if package_ids is not None:
+        placeholders = ', '.join(f":p{i}" for i in range(len(package_ids)))
+        where = f"WHERE p.package_id IN ({placeholders})"
+        params = {f"p{i}": package_id for i, package_id in enumerate(package_ids)}
+    rows = db.fetch_rows(f"""
+        SELECT p.package_id, p.location_id, p.price, p.duration,
+               (SELECT group_concat(c.name, char(31)) FROM PackageCategory pc
+                JOIN Categories c ON c.category_id = pc.category_id WHERE pc.package_id = p.package_id) AS categories
+        FROM Packages p {where}
+    """, params)
+    if rows is None:
+        raise RuntimeError("Loading the facet index failed")
+    for row in rows:
+        row['price'] = float(row['price'])
+        row['categories'] = row['categories'].split('\x1f') if row['categories'] else []
+    return rows
+
+
+def _get_index():
+    """The loaded index, reloaded when it's older than REFRESH_INTERVAL (caller holds the lock)."""
+    global _index
+    if _index is None or (datetime.now() - _index.loaded_at).total_seconds() > REFRESH_INTERVAL:
+        _index = _FacetIndex().load()
+    return _index
+
+
+def invalidate():
+    """
+    Drops the in-memory index so it's reloaded on the next read.
+    Call when categories or locations are renamed, or packages change outside update_packages / remove_packages.
+    """
+    global _index
+    with _lock:
+        _index = None
+
+
+def update_packages(package_ids):
+    """
+    Re-reads the given packages (price, duration, location, categories) and moves their bits, after a commit.
+
+    Args:
+        package_ids (list): The packages that were inserted or changed.
+    """
+    package_ids = [int(package_id) for package_id in package_ids]
+    if not package_ids:
+        return
+    packages = _fetch_packages(package_ids)
+    with _lock:
+        if _index is None:
+            return  # loads fresh on first use anyway
+        new_locations = {package['location_id'] for package in packages} - set(_index.locations)
+        if new_locations:
+            placeholders = ', '.join(f":l{i}" for i in range(len(new_locations)))
+            for location_id, city, country in db.fetch_rows(
+                    f"SELECT location_id, city, country FROM Locations WHERE location_id IN ({placeholders})",
+                    {f"l{i}": location_id for i, location_id in enumerate(new_locations)}, as_tuples=True) or []:
+                _index.locations[location_id] = (city, country)
+        for package_id in package_ids:
+            _index.remove(package_id)
+        for package in packages:
+            _index.add(package)
+
+
+def remove_packages(package_ids):
+    """
+    Clears the bits of deleted packages, after a commit.
+
+    Args:
+        package_ids (list): The deleted packages.
+    """
+    with _lock:
+        if _index is None:
+            return
+        for package_id in package_ids:
+            _index.remove(int(package_id))
+
+
+def _float_or_none(filters, key):
+    value = filters.get(key)
+    return None if value in (None, '') else float(value)
+
+
+def _filter_groups(index, filters):
+    """facet -> bitset of the packages that pass that facet's filters (facets without filters are left out)."""
+    groups = {}
+
+    categories = _split(filters.get('category'))
+    if categories:
+        bits = 0
+        for name in categories:
+            bits |= index.values['category'].get(name, 0)
+        groups['category'] = bits
+
+    location_ids = {int(v) for v in _split(filters.get('location_id'))}
+    cities, countries = set(_split(filters.get('city'))), set(_split(filters.get('country')))
+    if cities or countries:
+        location_ids |= {location_id for location_id, (city, country) in index.locations.items()
+                         if city in cities or country in countries}
+    if location_ids or cities or countries:
+        bits = 0
+        for location_id in location_ids:
+            bits |= index.values['location'].get(location_id, 0)
+        groups['location'] = bits
+
+    for facet in ('price', 'duration'):
+        keys = _split(filters.get(facet))
+        bits = None
+        if keys:
+            unknown = [key for key in keys if key not in index.values[facet]]
+            if unknown:
+                raise ValueError(f"Unknown {facet} bucket: {', '.join(unknown)}")
+            bits = 0
+            for key in keys:
+                bits |= index.values[facet][key]
+        low, high = _float_or_none(filters, f"min_{facet}"), _float_or_none(filters, f"max_{facet}")
+        if low is not None or high is not None:
+            in_range = index.range_bits(facet, low, high)
+            bits = in_range if bits is None else bits & in_range
+        if bits is not None:
+            groups[facet] = bits
+
+    package_ids = _split(filters.get('package_id'))
+    if package_ids:
+        # Only ids in the index, the shift is bounded by its size so a huge (or negative) id can't blow up memory
+        bits = 0
+        size = index.all.bit_length()
+        for package_id in package_ids:
+            package_id = int(package_id)
+            if 0 <= package_id < size:
+                bits |= index.all & (1 << package_id)
+        groups['package_id'] = bits
+    return groups
+
+
+def _and_all(index, groups, skip=None):
+    bits = index.all
+    for facet, group in groups.items():
+        if facet != skip:
+            bits &= group
+    return bits
+
+
+def search(filters=None, include_ids=True):
+    """
+    Packages matching the filters plus per-facet counts. A facet's counts apply every filter except its own,
+    so picking one category still shows how many packages each other category would give.
+
+    Args:
+        filters (dict): category (names), location_id / city / country, price / duration (bucket keys from
+            the response), min_price / max_price / min_duration / max_duration (exact, inclusive) and package_id.
+            List filters take a list or a comma separated string and match any of their values.
+        include_ids (bool): Include the matching package ids.
+
+    Returns:
+        dict: {'total': int, 'package_ids': [int], 'facets': {facet: [{'value', 'label', 'count'}]}}
+
+    Raises:
+        ValueError: For unknown buckets or numbers that don't parse.
+    """
+    filters = filters or {}
+    with _lock:
+        index = _get_index()
+        groups = _filter_groups(index, filters)
+        matches = _and_all(index, groups)
+
+        facets = {}
+        for facet in FACETS:
+            base = _and_all(index, groups, skip=facet) if facet in groups else matches
+            values = index.values[facet]
+            if facet == 'category':
+                entries = [{'value': name, 'label': name} for name in sorted(values)]
+            elif facet == 'location':
+                entries = [{'value': location_id, 'label': f"{city}, {country}", 'city': city, 'country': country}
+                           for location_id, (city, country) in sorted(index.locations.items(), key=lambda item: item[1])]
+            else:
+                entries = [{'value': key, 'label': label} for key, label, _, _ in (PRICE_BUCKETS if facet == 'price' else DURATION_BUCKETS)]
+            for entry in entries:
+                entry['count'] = (base & values.get(entry['value'], 0)).bit_count()
+            facets[facet] = entries
+
+    result = {'total': matches.bit_count(), 'facets': facets}
+    if include_ids:
+        result['package_ids'] = _bit_ids(matches)
+    return result
@@ -0,0 +1,164 @@
+import json
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from db.db_config import Session, ReadSession
+
+# Completed responses for idempotent endpoints (capture, update-orders), keyed by (scope, key).
+# Lookup order is: in-process LRU -> request already in flight in this process -> IdempotencyKeys table.
+# Only successful (2xx) responses are stored so failed calls can still be retried for real.
+CACHE_SIZE = 2048
+
+_lock = threading.Lock()
+_results = OrderedDict()    # (scope, key) -> (body, status_code)
+_inflight = {}              # (scope, key) -> Future of (body, status_code)
+
+INSERT_QUERY = text("""
+    INSERT INTO IdempotencyKeys (scope, idem_key, status_code, response, created_at)
+    VALUES (:scope, :idem_key, :status_code, :response, :created_at)
+""")
+
+
+def _cache_put(cache_key, result):
+    with _lock:
+        _results[cache_key] = result
+        _results.move_to_end(cache_key)
+        while len(_results) > CACHE_SIZE:
+            _results.popitem(last=False)
+
+
+def _cache_get(cache_key):
+    with _lock:
+        result = _results.get(cache_key)
+        if result is not None:
+            _results.move_to_end(cache_key)
+        return result
+
+
+def lookup(scope, key):
+    """
+    Returns the stored (body, status_code) for a key, or None if that request hasn't completed yet.
+    """
+    cache_key = (scope, str(key))
+    result = _cache_get(cache_key)
+    if result is not None:
+        return result
+
+    session = ReadSession()
+    try:
+        row = session.execute(
+            text("SELECT response, status_code FROM IdempotencyKeys WHERE scope = :scope AND idem_key = :idem_key"),
+            {'scope': scope, 'idem_key': str(key)},
+        ).fetchone()
+    finally:
+        session.close()
+    if row is None:
+        return None
+    result = (json.loads(row[0]), row[1])
+    _cache_put(cache_key, result)
+    return result
+
+
+def remember(scope, key, body, status_code, session=None):
+    """
+    Stores a completed response. Pass the caller's session to store it inside the same transaction
+    as the writes it describes (the caller commits); otherwise it's written on its own.
+
+    Raises:
+        IntegrityError: From the caller's session if another process already stored this key.
+    """
+    params = {'scope': scope, 'idem_key': str(key), 'status_code': status_code,
+              'response': json.dumps(body), 'created_at': datetime.now()}
+    if session is not None:
+        session.execute(INSERT_QUERY, params)
+        return
+
+    own_session = Session()
+    try:
+        own_session.execute(INSERT_QUERY, params)
+        own_session.commit()
+        _cache_put((scope, str(key)), (body, status_code))
+    except IntegrityError:
+        # Someone else finished the same request first, theirs is the stored answer
+        own_session.rollback()
+    except Exception:
+        own_session.rollback()
+        print(f"Error storing idempotency key: {traceback.format_exc()}")
+    finally:
+        own_session.close()
+
+
+def run_once(scope, key, compute, persist=True):
+    """
+    Runs compute() at most once per (scope, key) and replays its response afterwards.
+
+    Concurrent duplicates in this process wait for the first call and get its result instead of
+    running compute() again.
+
+    Args:
+        scope (str): Which endpoint the key belongs to, e.g. 'capture'.
+        key (str): The idempotency key (PayPal order id or Idempotency-Key header).
+        compute (callable): Does the real work, returns (body, status_code).
+        persist (bool): Write successful results to IdempotencyKeys here. Pass False when compute()
+            already stored them inside its own transaction via remember(..., session=...).
+
+    Returns:
+        tuple: (body, status_code, replayed) where replayed is True if compute() wasn't run.
+    """
+    cache_key = (scope, str(key))
+    result = _cache_get(cache_key)
+    if result is not None:
+        return result[0], result[1], True
+
+    with _lock:
+        future = _inflight.get(cache_key)
+        owner = future is None
+        if owner:
+            future = _inflight[cache_key] = Future()
+    if not owner:
+        body, status_code = future.result()
+        return body, status_code, True
+
+    try:
+        result = lookup(scope, key)
+        replayed = result is not None
+        if not replayed:
+            result = compute()
+            if 200 <= result[1] < 300:
+                if persist:
+                    remember(scope, key, result[0], result[1])
+                _cache_put(cache_key, result)
+        future.set_result(result)
+        return result[0], result[1], replayed
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(cache_key, None)
+
+
+def purge(older_than_days=30):
+    """
+    Deletes stored keys older than the given number of days (clients stop retrying long before).
+
+    Returns:
+        int: Number of rows deleted.
+    """
+    session = Session()
+    try:
+        deleted = session.execute(
+            text("DELETE FROM IdempotencyKeys WHERE created_at < :cutoff"),
+            {'cutoff': datetime.now() - timedelta(days=older_than_days)},
+        ).rowcount
+        session.commit()
+        return deleted
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
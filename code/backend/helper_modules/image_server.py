@@ -0,0 +1,150 @@
+import os
+import hashlib
+import mimetypes
+import threading
+from collections import OrderedDict
+from flask import request, Response, send_file, abort
+from werkzeug.security import safe_join
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'images')
+
+SMALL_FILE_LIMIT = int(os.getenv("IMAGE_CACHE_FILE_LIMIT", 256 * 1024))         # bytes, bigger files are always streamed
+CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", 32 * 1024 * 1024))      # total bytes kept in memory
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# path -> (mtime_ns, size, etag), so each file is hashed once until it changes on disk
+_meta = {}
+# path -> (mtime_ns, bytes) for small hot files, least recently used first
+_lru = OrderedDict()
+_lru_bytes = 0
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'not_modified': 0, 'streamed': 0}
+
+
+def _resolve(relative_path):
+    path = safe_join(IMAGES_DIR, relative_path)
+    if path is None or not os.path.isfile(path):
+        return None, None
+    return path, os.stat(path)
+
+
+def _hash_file(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _get_etag(path, stat):
+    meta = _meta.get(path)
+    if meta is not None and meta[0] == stat.st_mtime_ns and meta[1] == stat.st_size:
+        return meta[2]
+    etag = _hash_file(path)
+    with _lock:
+        _meta[path] = (stat.st_mtime_ns, stat.st_size, etag)
+    return etag
+
+
+def _cache_get(path, stat):
+    with _lock:
+        entry = _lru.get(path)
+        if entry is not None and entry[0] == stat.st_mtime_ns:
+            _lru.move_to_end(path)
+            _stats['hits'] += 1
+            return entry[1]
+        _stats['misses'] += 1
+    return None
+
+
+def _cache_put(path, stat, data):
+    global _lru_bytes
+    with _lock:
+        old = _lru.pop(path, None)
+        if old is not None:
+            _lru_bytes -= len(old[1])
+        _lru[path] = (stat.st_mtime_ns, data)
+        _lru_bytes += len(data)
+        while _lru_bytes > CACHE_MAX_BYTES and _lru:
+            _, (_, evicted) = _lru.popitem(last=False)
+            _lru_bytes -= len(evicted)
+
+
+def versioned_url(relative_path, prefix='/backend/images/'):
+    """
+    Returns a content-addressed URL for an image (?v=<content hash>) that can be cached forever,
+    since the URL changes whenever the file does. Falls back to the plain URL if the file is missing.
+    """
+    path, stat = _resolve(relative_path)
+    if path is None:
+        return f"{prefix}{relative_path}"
+    return f"{prefix}{relative_path}?v={_get_etag(path, stat)}"
+
+
+def serve_image(relative_path):
+    """
+    Serves a file from the images folder with a strong content-hash ETag.
+
+    Requests whose ?v= matches the current hash are cached as immutable for a year, others have to
+    revalidate (cheap 304s through If-None-Match). Range requests are supported. Small files are
+    served from an in-memory LRU; bigger ones go through send_file, which hands the open file to
+    wsgi.file_wrapper (sendfile under gunicorn) or X-Sendfile when USE_X_SENDFILE is configured.
+    """
+    path, stat = _resolve(relative_path)
+    if path is None:
+        abort(404)
+
+    etag = _get_etag(path, stat)
+    immutable = request.args.get('v') == etag
+    max_age = IMMUTABLE_MAX_AGE if immutable else 0
+
+    if request.if_none_match.contains(etag):
+        with _lock:
+            _stats['not_modified'] += 1
+        response = Response(status=304)
+        response.set_etag(etag)
+        _set_cache_headers(response, max_age, immutable)
+        return response
+
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if stat.st_size <= SMALL_FILE_LIMIT:
+        data = _cache_get(path, stat)
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+            _cache_put(path, stat, data)
+        response = Response(data, mimetype=mimetype)
+        response.set_etag(etag)
+        response.last_modified = stat.st_mtime
+        response.make_conditional(request, accept_ranges=True, complete_length=len(data))
+    else:
+        with _lock:
+            _stats['streamed'] += 1
+        response = send_file(path, mimetype=mimetype, etag=etag, conditional=True, max_age=max_age)
+
+    _set_cache_headers(response, max_age, immutable)
+    return response
+
+
+def _set_cache_headers(response, max_age, immutable):
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if immutable:
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+
+
+def get_stats():
+    """
+    Returns hit/miss counters and the current size of the in-memory cache.
+    """
+    with _lock:
+        lookups = _stats['hits'] + _stats['misses']
+        return {
+            **_stats,
+            'hit_rate': round(_stats['hits'] / lookups, 4) if lookups else None,
+            'cached_files': len(_lru),
+            'cached_bytes': _lru_bytes,
+            'hashed_files': len(_meta),
+        }
@@ -0,0 +1,191 @@
+import os
+import sys
+import time
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from sqlalchemy import text
+from db.db_config import Session
+from helper_modules import db_helper as db
+from helper_modules.image_server import IMAGES_DIR
+
+# Pillow is optional: without it uploads still work, they just don't get resized variants
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# variant name -> max width in px (never upscaled, aspect ratio kept)
+VARIANTS = {
+    'thumb': 320,
+    'card': 800,
+    'hero': 1920,
+}
+# format -> (file extension, Pillow save options)
+FORMATS = {
+    'webp': ('webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+VARIANTS_DIR = 'package_images/variants'
+WORKERS = int(os.getenv("IMAGE_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+
+_executor = None
+_executor_lock = threading.Lock()
+# Rows are written here rather than in the pool's done callback, which runs on the thread that collects
+# every worker result; one thread is enough since sqlite takes one writer at a time anyway
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-variants-db")
+
+UPSERT_QUERY = text("""
+    INSERT INTO PackageImageVariants (image_id, variant, format, image_path, width, height)
+    VALUES (:image_id, :variant, :format, :image_path, :width, :height)
+    ON CONFLICT (image_id, variant, format) DO UPDATE SET
+        image_path = excluded.image_path, width = excluded.width, height = excluded.height
+""")
+
+
+def is_available():
+    return Image is not None
+
+
+def render_variants(image_id, image_path):
+    """
+    Writes every variant of one image to images/package_images/variants. Runs in a worker process.
+
+    Args:
+        image_id (int): The PackageImages id.
+        image_path (str): The original, relative to the images folder (e.g. 'package_images/3.jpg').
+
+    Returns:
+        list: One dict per written file (image_id, variant, format, image_path, width, height).
+    """
+    out_dir = os.path.join(IMAGES_DIR, VARIANTS_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+
+    rows = []
+    with Image.open(os.path.join(IMAGES_DIR, image_path)) as original:
+        original = ImageOps.exif_transpose(original).convert('RGB')
+        # Biggest first, each smaller size is resized from the previous one instead of the full original
+        source = original
+        for variant, max_width in sorted(VARIANTS.items(), key=lambda item: -item[1]):
+            if source.width > max_width:
+                source = source.resize((max_width, round(source.height * max_width / source.width)), Image.LANCZOS)
+            for fmt, (extension, options) in FORMATS.items():
+                relative_path = f"{VARIANTS_DIR}/{stem}_{variant}.{extension}"
+                # write to a temp name and rename, so a half written file is never served
+                tmp_path = os.path.join(IMAGES_DIR, relative_path + '.tmp')
+                source.save(tmp_path, format=fmt.upper(), **options)
+                os.replace(tmp_path, os.path.join(IMAGES_DIR, relative_path))
+                rows.append({'image_id': image_id, 'variant': variant, 'format': fmt,
+                             'image_path': relative_path, 'width': source.width, 'height': source.height})
+    return rows
+
+
+def record_variants(rows):
+    """Saves variant rows (from render_variants) in one transaction."""
+    if not rows:
+        return
+    session = Session()
+    try:
+        session.execute(UPSERT_QUERY, rows)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=WORKERS)
+    return _executor
+
+
+def _record_rendered(future):
+    try:
+        record_variants(future.result())
+    except Exception:
+        print(f"Error generating image variants: {traceback.format_exc()}")
+
+
+def _on_rendered(future):
+    _writer.submit(_record_rendered, future)
+
+
+def schedule(image_id, image_path):
+    """
+    Queues variant generation for a freshly uploaded image on the process pool and returns
+    straight away. The rows are written once the worker finishes.
+
+    Returns:
+        Future: The pending job, or None if Pillow isn't installed.
+    """
+    if not is_available():
+        print("Pillow is not installed, skipping image variants")
+        return None
+    future = _get_executor().submit(render_variants, image_id, image_path)
+    future.add_done_callback(_on_rendered)
+    return future
+
+
+def delete_variants(image_ids):
+    """
+    Removes the variant files and rows of the given images (call when the originals are deleted).
+    """
+    if not image_ids:
+        return
+    placeholders = ', '.join(f":i{i}" for i in range(len(image_ids)))
+    params = {f"i{i}": int(image_id) for i, image_id in enumerate(image_ids)}
+    rows = db.fetch_rows(f"SELECT image_path FROM PackageImageVariants WHERE image_id IN ({placeholders})", params, as_tuples=True) or []
+    for (image_path,) in rows:
+        full_path = os.path.join(IMAGES_DIR, image_path)
+        if os.path.exists(full_path):
+            os.remove(full_path)
+    db.execute_query(f"DELETE FROM PackageImageVariants WHERE image_id IN ({placeholders})", params)
+
+
+def backfill(force=False, workers=WORKERS):
+    """
+    Generates variants for every existing image, in parallel across processes.
+
+    Args:
+        force (bool): Regenerate images that already have variants too.
+        workers (int): Number of worker processes.
+
+    Returns:
+        int: Number of images processed.
+    """
+    if not is_available():
+        raise RuntimeError("Pillow is required for the backfill: pip install pillow")
+
+    query = "SELECT image_id, image_path FROM PackageImages"
+    if not force:
+        query += " WHERE image_id NOT IN (SELECT image_id FROM PackageImageVariants)"
+    images = [(image_id, image_path) for image_id, image_path in db.fetch_rows(query, as_tuples=True) or []
+              if os.path.isfile(os.path.join(IMAGES_DIR, image_path))]
+
+    start = time.perf_counter()
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(render_variants, image_id, image_path): image_path for image_id, image_path in images}
+        for future in as_completed(futures):
+            try:
+                record_variants(future.result())
+                done += 1
+            except Exception:
+                print(f"Failed on {futures[future]}: {traceback.format_exc()}")
+    print(f"Generated variants for {done}/{len(images)} images in {time.perf_counter() - start:.1f}s with {workers} workers.")
+    return done
+
+
+if __name__ == "__main__":
+    # Run from backend/:  python -m helper_modules.image_variants backfill [--force] [--workers N]
+    if len(sys.argv) > 1 and sys.argv[1] == 'backfill':
+        workers = int(sys.argv[sys.argv.index('--workers') + 1]) if '--workers' in sys.argv else WORKERS
+        backfill(force='--force' in sys.argv, workers=workers)
+    else:
+        print("Usage: python -m helper_modules.image_variants backfill [--force] [--workers N]")
@@ -0,0 +1,122 @@
+import re
+import html
+from db.search_schema import SEARCH_TABLE, SEARCH_SOURCES
+from helper_modules import db_helper as db
+from helper_modules import catalog
+from helper_modules import query_cache
+
+SEARCH_CACHE_TTL = 60
+MAX_TERMS = 8
+
+# Triggers copy Packages / Locations / categories into PackageSearch, tell the cache about it
+query_cache.add_dependents(SEARCH_SOURCES, [SEARCH_TABLE])
+
+# rank is the table's bm25 with RANK_WEIGHTS (see db/search_schema.py), lower is better
+SEARCH_QUERY = """
+    SELECT p.package_id, PackageSearch.rank AS rank, COUNT(*) OVER () AS total_count
+    FROM PackageSearch
+    JOIN Packages p ON p.package_id = PackageSearch.rowid
+    LEFT JOIN Locations l ON p.location_id = l.location_id
+    WHERE PackageSearch MATCH :match {filters}
+    ORDER BY rank, p.package_id
+    LIMIT :limit OFFSET :offset
+"""
+
+# Highlights only for the page being returned. \x02 / \x03 mark the matches so the text can be
+# HTML escaped before they become <mark> tags.
+HIGHLIGHT_QUERY = """
+    SELECT rowid AS package_id,
+           highlight(PackageSearch, 0, char(2), char(3)) AS name_highlight,
+           snippet(PackageSearch, 1, char(2), char(3), '…', 16) AS snippet
+    FROM PackageSearch
+    WHERE PackageSearch MATCH :match AND rowid IN ({placeholders})
+"""
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+def build_match(q, prefix='last'):
+    """
+    Turns free text into an FTS5 query: every word quoted (so nothing the user types is FTS syntax),
+    all of them required, with prefix matching so partial words still hit.
+
+    Args:
+        q (str): What the user typed.
+        prefix (str): 'last' (type-ahead, only the last word is a prefix), 'all' or 'none'.
+
+    Returns:
+        str: The MATCH expression, or None if q has no words.
+    """
+    terms = _TERM.findall(q or '')[:MAX_TERMS]
+    if not terms:
+        return None
+    quoted = []
+    for i, term in enumerate(terms):
+        star = prefix == 'all' or (prefix == 'last' and i == len(terms) - 1)
+        quoted.append(f'"{term}"' + ('*' if star else ''))
+    return ' '.join(quoted)
+
+
+def _marked(value):
+    return html.escape(value or '').replace('\x02', '<mark>').replace('\x03', '</mark>')
+
+
+def search_packages(q, filters=None, page=1, page_size=catalog.DEFAULT_PAGE_SIZE, prefix='last'):
+    """
+    Ranked full-text package search over name, description, city, country and category names.
+
+    Args:
+        q (str): The search text.
+        filters (dict): Any catalog filter except q (category, min_price / max_price,
+            min_duration / max_duration, location_id, city, country, package_id).
+        page (int): 1-based page number.
+        page_size (int): Results per page, capped at catalog.MAX_PAGE_SIZE.
+        prefix (str): See build_match.
+
+    Returns:
+        dict: {'packages': [catalog package + 'score', 'name_highlight', 'snippet'], 'total', 'page', 'page_size'}
+              best match first. Highlights are HTML escaped with the matches in <mark> tags.
+
+    Raises:
+        ValueError: For an empty query or bad filter / paging values.
+    """
+    match = build_match(q, prefix)
+    if match is None:
+        raise ValueError("Search text is required")
+    if prefix not in ('last', 'all', 'none'):
+        raise ValueError(f"Unknown prefix mode: {prefix}")
+    page = int(page)
+    page_size = min(int(page_size), catalog.MAX_PAGE_SIZE)
+    if page < 1 or page_size < 1:
+        raise ValueError("page and page_size must be positive")
+
+    where, params = catalog.build_filters({k: v for k, v in (filters or {}).items() if k != 'q'})
+    filters_sql = where.replace('WHERE', 'AND', 1) if where else ''
+    params.update({'match': match, 'limit': page_size, 'offset': (page - 1) * page_size})
+
+    rows = db.fetch_rows(SEARCH_QUERY.format(filters=filters_sql), params, cache=True, ttl=SEARCH_CACHE_TTL)
+    if rows is None:
+        raise RuntimeError("Package search failed")
+    if not rows:
+        return {'packages': [], 'total': 0, 'page': page, 'page_size': page_size}
+
+    # Full package shapes (images, variants, categories) come from the catalog, in rank order
+    ids = [row['package_id'] for row in rows]
+    id_params = {f"id{i}": package_id for i, package_id in enumerate(ids)}
+    highlights = db.fetch_rows(HIGHLIGHT_QUERY.format(placeholders=', '.join(f":{key}" for key in id_params)),
+                               {'match': match, **id_params}, cache=True, ttl=SEARCH_CACHE_TTL) or []
+    highlights = {row['package_id']: row for row in highlights}
+    packages = {pkg['package_id']: pkg for pkg in catalog.fetch_catalog({'package_id': ids}, page_size=len(ids))['packages']}
+    results = []
+    for row in rows:
+        package = packages.get(row['package_id'])
+        if package is None:
+            continue
+        marks = highlights.get(row['package_id'], {})
+        results.append({
+            **package,
+            'score': round(-row['rank'], 4),  # bm25 is lower-is-better, flip it so higher is better
+            'name_highlight': _marked(marks.get('name_highlight') or package['name']),
+            'snippet': _marked(marks.get('snippet')),
+        })
+    return {'packages': results, 'total': rows[0]['total_count'], 'page': page, 'page_size': page_size}
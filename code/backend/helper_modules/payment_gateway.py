@@ -0,0 +1,171 @@
+import os
+import copy
+import time
+import uuid
+import random
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import requests
+from requests.adapters import HTTPAdapter
+from paypalhttp.http_error import HttpError
+from paypalcheckoutsdk.core import PayPalHttpClient, PayPalEnvironment, SandboxEnvironment, AccessToken
+from paypalcheckoutsdk.core import AccessTokenRequest, RefreshTokenRequest
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Gateway tuning, all overridable from the environment / .env file
+GATEWAY_CONFIG = {
+    "api_url":          os.getenv("PAYPAL_API_URL"),                          # e.g. http://localhost:8099 for the fake server
+    "pool_size":        int(os.getenv("PAYPAL_POOL_SIZE", 10)),               # keep-alive connections to PayPal
+    "connect_timeout":  float(os.getenv("PAYPAL_CONNECT_TIMEOUT", 3)),        # seconds
+    "read_timeout":     float(os.getenv("PAYPAL_READ_TIMEOUT", 10)),          # seconds
+    "max_retries":      int(os.getenv("PAYPAL_MAX_RETRIES", 2)),
+    "backoff_base":     float(os.getenv("PAYPAL_BACKOFF_BASE", 0.2)),         # seconds, doubled per attempt
+    "backoff_max":      float(os.getenv("PAYPAL_BACKOFF_MAX", 2)),
+    "deadline":         float(os.getenv("PAYPAL_DEADLINE", 20)),              # total seconds a request thread blocks
+    "workers":          int(os.getenv("PAYPAL_WORKERS", 8)),
+    "token_margin":     int(os.getenv("PAYPAL_TOKEN_MARGIN", 60)),            # refresh tokens this many seconds early
+}
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class PaymentGatewayTimeout(Exception):
+    """Raised when a PayPal call doesn't finish within the gateway deadline."""
+
+
+def build_environment(client_id, client_secret):
+    """
+    Returns the PayPal environment, pointing at PAYPAL_API_URL (e.g. the local fake server) if it's set.
+    """
+    if GATEWAY_CONFIG["api_url"]:
+        return PayPalEnvironment(client_id, client_secret, GATEWAY_CONFIG["api_url"], GATEWAY_CONFIG["api_url"])
+    return SandboxEnvironment(client_id=client_id, client_secret=client_secret)
+
+
+class PooledPayPalHttpClient(PayPalHttpClient):
+    """
+    PayPalHttpClient that sends requests over a pooled keep-alive requests.Session with bounded
+    timeouts, retries transient failures with jittered backoff and shares one cached OAuth token
+    between threads.
+    """
+
+    def __init__(self, environment, refresh_token=None):
+        self._token_lock = threading.Lock()
+        PayPalHttpClient.__init__(self, environment, refresh_token)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=GATEWAY_CONFIG["pool_size"], pool_maxsize=GATEWAY_CONFIG["pool_size"])
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def __call__(self, request):
+        # Same injector as PayPalHttpClient, but the token is refreshed under a lock and a bit before it expires
+        request.headers["sdk_name"] = "Checkout SDK"
+        request.headers["sdk_version"] = "1.0.1"
+        request.headers["api_integration_type"] = "PAYPALSDK"
+        if "Accept-Encoding" not in request.headers:
+            request.headers["Accept-Encoding"] = "gzip"
+
+        if "Authorization" not in request.headers and not isinstance(request, (AccessTokenRequest, RefreshTokenRequest)):
+            request.headers["Authorization"] = self._get_access_token().authorization_string()
+
+    def _get_access_token(self):
+        token = self._access_token
+        if token and token.created_at + token.expires_in - GATEWAY_CONFIG["token_margin"] > time.time():
+            return token
+        with self._token_lock:
+            token = self._access_token
+            if not token or token.created_at + token.expires_in - GATEWAY_CONFIG["token_margin"] <= time.time():
+                result = self.execute(AccessTokenRequest(self.environment, self._refresh_token)).result
+                token = AccessToken(access_token=result.access_token,
+                                    expires_in=result.expires_in,
+                                    token_type=result.token_type)
+                self._access_token = token
+        return token
+
+    def execute(self, request):
+        request = copy.deepcopy(request)
+        if not hasattr(request, 'headers'):
+            request.headers = {}
+        # PayPal dedupes on this header, so retries of a create/capture can't double charge
+        if request.verb == "POST" and not isinstance(request, (AccessTokenRequest, RefreshTokenRequest)):
+            request.headers.setdefault("PayPal-Request-Id", str(uuid.uuid4()))
+
+        attempt = 0
+        while True:
+            try:
+                return self._send(request)
+            except (requests.ConnectionError, requests.Timeout, HttpError) as e:
+                retryable = not isinstance(e, HttpError) or e.status_code in RETRY_STATUS_CODES
+                if not retryable or attempt >= GATEWAY_CONFIG["max_retries"]:
+                    raise
+                delay = min(GATEWAY_CONFIG["backoff_max"], GATEWAY_CONFIG["backoff_base"] * (2 ** attempt))
+                time.sleep(delay * random.uniform(0.5, 1.5))
+                attempt += 1
+                print(f"Retrying PayPal request {request.path} (attempt {attempt}) after: {e}")
+
+    def _send(self, request):
+        # HttpClient.execute, but through the pooled session and with timeouts
+        request = copy.deepcopy(request)
+        for injector in self._injectors:
+            injector(request)
+
+        data = None
+        formatted_headers = self.format_headers(request.headers)
+        if "user-agent" not in formatted_headers:
+            request.headers["user-agent"] = self.get_user_agent()
+
+        if hasattr(request, 'body') and request.body is not None:
+            raw_headers = request.headers
+            request.headers = formatted_headers
+            data = self.encoder.serialize_request(request)
+            request.headers = self.map_headers(raw_headers, formatted_headers)
+
+        response = self._session.request(method=request.verb,
+                                         url=self.environment.base_url + request.path,
+                                         headers=request.headers,
+                                         data=data,
+                                         timeout=(GATEWAY_CONFIG["connect_timeout"], GATEWAY_CONFIG["read_timeout"]))
+        return self.parse_response(response)
+
+
+class PayPalGateway:
+    """
+    Bounded, pooled PayPal client. Calls run on a fixed size thread pool over the pooled keep-alive
+    client; execute() still blocks the Flask request thread, but for at most the gateway deadline, and
+    no more than `workers` PayPal calls are in flight at once however many requests are waiting.
+    """
+
+    def __init__(self, client, workers=None, deadline=None):
+        self.client = client
+        self.deadline = deadline or GATEWAY_CONFIG["deadline"]
+        self._executor = ThreadPoolExecutor(max_workers=workers or GATEWAY_CONFIG["workers"],
+                                            thread_name_prefix="paypal")
+
+    def submit(self, request):
+        """Starts the call in the background and returns a Future."""
+        return self._executor.submit(self.client.execute, request)
+
+    def execute(self, request, deadline=None):
+        """
+        Runs the call on the pool and blocks the calling thread until it's done, for at most the deadline.
+        A call still queued behind a busy pool when the deadline passes is cancelled, so it never reaches
+        PayPal after the caller has been told it failed; one already running is left to finish.
+
+        Raises:
+            PaymentGatewayTimeout: If PayPal (including retries) takes longer than the deadline.
+        """
+        future = self.submit(request)
+        try:
+            return future.result(timeout=deadline or self.deadline)
+        except FutureTimeoutError:
+            future.cancel()
+            raise PaymentGatewayTimeout(f"PayPal did not respond within {deadline or self.deadline}s")
+
+    async def execute_async(self, request):
+        """Awaitable version of execute for asyncio callers."""
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(loop.run_in_executor(self._executor, self.client.execute, request),
+                                      timeout=self.deadline)
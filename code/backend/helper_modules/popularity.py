@@ -0,0 +1,244 @@
+import sys, os
+import heapq
+import threading
+import traceback
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import text
+from helper_modules import db_helper as db
+from db.db_config import engine, Session
+
+# models import themselves as a top level package (from models import Base), so db/ has to be on the path
+db_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'db')
+if db_dir not in sys.path:
+    sys.path.append(db_dir)
+from models import PackagePopularity
+
+# In-memory snapshot of PackagePopularity plus the package -> location/category maps needed to filter it.
+# Loaded lazily on first use, kept in sync by record_bookings and dropped by invalidate().
+_lock = threading.Lock()
+_snapshot = None
+# Rolling windows (days) with running totals kept in the snapshot; any other window is summed per call.
+# Other sizes can be added with POPULARITY_WINDOWS=7,30,90
+WINDOWS = tuple(int(days) for days in os.getenv("POPULARITY_WINDOWS", "30,90").split(',') if days.strip())
+
+
+class _PopularitySnapshot:
+    def __init__(self):
+        self.totals = Counter()                  # package_id -> all time order count
+        self.daily = defaultdict(Counter)        # day (date) -> Counter(package_id -> order count)
+        self.package_location = {}               # package_id -> location_id
+        self.package_categories = defaultdict(set)
+        self.location_packages = defaultdict(set)
+        self.category_packages = defaultdict(set)
+        self.windows = {}                        # days -> _Window
+
+    def add(self, package_id, day, count):
+        self.totals[package_id] += count
+        self.daily[day][package_id] += count
+        for window in self.windows.values():
+            if day >= window.since:
+                window.counts[package_id] += count
+
+    def window_counts(self, days):
+        """Order counts for the last `days` days (today included), from the running totals where there are some."""
+        since = date.today() - timedelta(days=days - 1)
+        window = self.windows.get(days)
+        if window is None:
+            counts = Counter()
+            for day, day_counts in self.daily.items():
+                if day >= since:
+                    counts.update(day_counts)
+            if days not in WINDOWS:
+                return counts
+            window = self.windows[days] = _Window(since, counts)
+        elif window.since < since:
+            # The day changed: take off the buckets that fell out of the window, newer days are already in
+            for day in sorted(self.daily):
+                if day >= since:
+                    break
+                if day >= window.since:
+                    window.counts.subtract(self.daily[day])
+            window.counts = +window.counts
+            window.since = since
+        return window.counts
+
+
+class _Window:
+    def __init__(self, since, counts):
+        self.since = since                       # first day counted
+        self.counts = counts                     # package_id -> order count since then
+
+
+def _parse_day(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def _load_snapshot():
+    snapshot = _PopularitySnapshot()
+    for package_id, location_id in db.fetch_rows("SELECT package_id, location_id FROM Packages", as_tuples=True) or []:
+        snapshot.package_location[package_id] = location_id
+        snapshot.location_packages[location_id].add(package_id)
+    for package_id, category_id in db.fetch_rows("SELECT package_id, category_id FROM PackageCategory", as_tuples=True) or []:
+        snapshot.package_categories[package_id].add(category_id)
+        snapshot.category_packages[category_id].add(package_id)
+    for package_id, day, count in db.fetch_rows("SELECT package_id, day, order_count FROM PackagePopularity", as_tuples=True) or []:
+        snapshot.add(package_id, _parse_day(day), count)
+    return snapshot
+
+
+def _get_snapshot():
+    global _snapshot
+    if _snapshot is None:
+        with _lock:
+            if _snapshot is None:
+                _snapshot = _load_snapshot()
+    return _snapshot
+
+
+def invalidate():
+    """
+    Drops the in-memory snapshot so it's reloaded on the next read.
+    Call when packages or their categories/locations change.
+    """
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+
+def record_bookings(booking_ids, order_date=None, session=None):
+    """
+    Adds freshly ordered bookings to the popularity counters (table and in-memory snapshot).
+
+    Args:
+        booking_ids (list): The booking ids that were just linked to an order.
+        order_date (date): The day to count them on, defaults to today.
+        session (Session): Optional session to run inside the caller's transaction. If given, the
+            caller commits and then passes the returned counts to apply_to_snapshot(); otherwise a
+            session is opened, committed and the snapshot updated here.
+
+    Returns:
+        dict: package_id -> number of order items added.
+    """
+    if not booking_ids:
+        return {}
+    day = _parse_day(order_date or date.today())
+
+    own_session = session is None
+    if own_session:
+        session = Session()
+    try:
+        placeholders = ', '.join(f":b{i}" for i in range(len(booking_ids)))
+        rows = session.execute(
+            text(f"""SELECT package_id, COUNT(*) FROM Bookings
+                     WHERE booking_id IN ({placeholders}) GROUP BY package_id"""),
+            {f"b{i}": booking_id for i, booking_id in enumerate(booking_ids)},
+        ).fetchall()
+        counts = {package_id: count for package_id, count in rows}
+
+        if counts:
+            session.execute(
+                text("""
+                    INSERT INTO PackagePopularity (package_id, day, order_count)
+                    VALUES (:package_id, :day, :order_count)
+                    ON CONFLICT (package_id, day) DO UPDATE SET order_count = order_count + excluded.order_count
+                """),
+                [{'package_id': package_id, 'day': day.isoformat(), 'order_count': count}
+                 for package_id, count in counts.items()],
+            )
+        if own_session:
+            session.commit()
+    except Exception:
+        if own_session:
+            session.rollback()
+        raise
+    finally:
+        if own_session:
+            session.close()
+
+    if own_session:
+        apply_to_snapshot(counts, day)
+    return counts
+
+
+def apply_to_snapshot(counts, order_date=None):
+    """
+    Adds committed counts (from record_bookings) to the in-memory snapshot.
+    Only touches the snapshot if it's loaded, otherwise the next load picks the rows up from the table.
+    """
+    day = _parse_day(order_date or date.today())
+    with _lock:
+        if _snapshot is not None:
+            for package_id, count in counts.items():
+                _snapshot.add(package_id, day, count)
+
+
+def top_packages(k=5, location_id=None, category_id=None, days=None):
+    """
+    Returns the K most ordered packages, optionally limited to a location, a category or the last N days.
+
+    Packages without orders count as 0 so there are always K results when enough packages exist.
+    Ties are broken by package_id so the order is stable.
+
+    Args:
+        k (int): How many packages to return.
+        location_id (int): Only rank packages at this location.
+        category_id (int): Only rank packages tagged with this category.
+        days (int): Rolling window in days (e.g. 30 or 90), None for all time. Windows in WINDOWS keep
+            running totals, so asking for them doesn't re-add the day buckets.
+
+    Returns:
+        list: [(package_id, order_count), ...] best first.
+    """
+    snapshot = _get_snapshot()
+    with _lock:
+        candidates = set(snapshot.package_location)
+        if location_id is not None:
+            candidates &= snapshot.location_packages.get(location_id, set())
+        if category_id is not None:
+            candidates &= snapshot.category_packages.get(category_id, set())
+
+        counts = snapshot.window_counts(int(days)) if days else snapshot.totals
+
+        ranked = heapq.nlargest(k, candidates, key=lambda package_id: (counts.get(package_id, 0), -package_id))
+        return [(package_id, counts.get(package_id, 0)) for package_id in ranked]
+
+
+def rebuild_popularity():
+    """
+    Rebuilds PackagePopularity from the raw Orders/OrderItems/Bookings tables (for backfills),
+    creating the table first if it doesn't exist yet.
+    """
+    PackagePopularity.__table__.create(engine, checkfirst=True)
+    session = Session()
+    try:
+        session.execute(text("DELETE FROM PackagePopularity"))
+        session.execute(text("""
+            INSERT INTO PackagePopularity (package_id, day, order_count)
+            SELECT b.package_id, DATE(o.order_date), COUNT(*)
+            FROM Orders o
+            JOIN OrderItems oi ON oi.order_id = o.order_id
+            JOIN Bookings b ON b.booking_id = oi.booking_id
+            GROUP BY b.package_id, DATE(o.order_date)
+        """))
+        session.commit()
+        print("PackagePopularity rebuilt.")
+    except Exception:
+        session.rollback()
+        print(f"Error rebuilding popularity: {traceback.format_exc()}")
+        raise
+    finally:
+        session.close()
+    invalidate()
+
+
+if __name__ == "__main__":
+    # Run from backend/:  python -m helper_modules.popularity rebuild
+    if len(sys.argv) > 1 and sys.argv[1] == 'rebuild':
+        rebuild_popularity()
+    else:
+        print("Usage: python -m helper_modules.popularity rebuild")
@@ -0,0 +1,210 @@
+import os
+import uuid
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+import numpy as np
+from helper_modules import db_helper as db
+from helper_modules import idempotency
+
+# Server-side cart pricing. A quote prices the cart once (booking rows in one IN query, package prices from
+# the cached price map) and is stored under its quote_id, so create, capture and finalize all read the same
+# numbers instead of trusting the client or pricing again. Quotes live in the idempotency store (in-process
+# LRU, then IdempotencyKeys), which makes them visible to every worker.
+#
+# Amounts are Decimals rounded to cents; carts over VECTOR_THRESHOLD lines are summed as integer cents in numpy.
+CURRENCY = "AUD"
+QUOTE_TTL = int(os.getenv("QUOTE_TTL", os.getenv("BOOKING_HOLD_TTL", 900)))   # seconds a quote can be paid
+PRICE_CACHE_TTL = float(os.getenv("PRICE_CACHE_TTL", 300))                   # seconds a cached price is trusted
+VECTOR_THRESHOLD = 64
+CENT = Decimal('0.01')
+QUOTE_SCOPE = 'quote'
+
+class QuoteMismatch(ValueError):
+    """A PayPal order that doesn't match the quote it's meant to pay for."""
+
+
+# package_id -> (price, loaded at), filled lazily; ids not in it are looked up with one IN query
+_prices = {}
+_price_lock = threading.Lock()
+
+
+def to_money(value):
+    """Any price (float, str, Decimal) as a Decimal rounded to cents."""
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def package_prices(package_ids):
+    """
+    Current package prices from the cached map, fetching any missing or stale ones in a single query.
+
+    Args:
+        package_ids (iterable): Package ids.
+
+    Returns:
+        dict: package_id -> Decimal price for every package that exists (unknown ids are left out).
+    """
+    package_ids = list(dict.fromkeys(int(package_id) for package_id in package_ids))
+    now = time.monotonic()
+    with _price_lock:
+        missing = [package_id for package_id in package_ids
+                   if package_id not in _prices or now - _prices[package_id][1] > PRICE_CACHE_TTL]
+    if missing:
+        placeholders = ', '.join(f":p{i}" for i in range(len(missing)))
+        rows = db.fetch_rows(f"SELECT package_id, price FROM Packages WHERE package_id IN ({placeholders})",
+                             {f"p{i}": package_id for i, package_id in enumerate(missing)}, as_tuples=True)
+        if rows is None:
+            raise RuntimeError("Loading package prices failed")
+        with _price_lock:
+            for package_id in missing:
+                _prices.pop(package_id, None)
+            _prices.update({package_id: (to_money(price), now) for package_id, price in rows})
+    with _price_lock:
+        return {package_id: _prices[package_id][0] for package_id in package_ids if package_id in _prices}
+
+
+def invalidate_prices(package_ids=None):
+    """
+    Drops cached prices (all of them if package_ids is None). Call after packages are upserted or deleted.
+    """
+    with _price_lock:
+        if package_ids is None:
+            _prices.clear()
+        else:
+            for package_id in package_ids:
+                _prices.pop(int(package_id), None)
+
+
+def _line_totals(unit_prices, quantities):
+    """(line totals, cart total) as Decimals; big carts go through numpy as integer cents."""
+    if len(unit_prices) > VECTOR_THRESHOLD:
+        cents = np.array([int(price * 100) for price in unit_prices], dtype=np.int64) * np.array(quantities, dtype=np.int64)
+        lines = [Decimal(int(value)) / 100 for value in cents]
+        return [line.quantize(CENT) for line in lines], (Decimal(int(cents.sum())) / 100).quantize(CENT)
+    lines = [(price * quantity).quantize(CENT, rounding=ROUND_HALF_UP) for price, quantity in zip(unit_prices, quantities)]
+    return lines, sum(lines, Decimal('0.00'))
+
+
+def _cart_lines(cart, email=None):
+    """Turns cart items into (booking_id, package_id, quantity) using the stored bookings where there are some."""
+    booking_ids = list(dict.fromkeys(int(item['booking_id']) for item in cart if item.get('booking_id') is not None))
+    bookings = {}
+    if booking_ids:
+        placeholders = ', '.join(f":b{i}" for i in range(len(booking_ids)))
+        rows = db.fetch_rows(f"""
+            SELECT booking_id, email, package_id, number_of_travellers, status FROM Bookings
+            WHERE booking_id IN ({placeholders})
+        """, {f"b{i}": booking_id for i, booking_id in enumerate(booking_ids)})
+        if rows is None:
+            raise RuntimeError("Loading the cart bookings failed")
+        bookings = {row['booking_id']: row for row in rows}
+
+    lines = []
+    for booking_id in booking_ids:
+        booking = bookings.get(booking_id)
+        if booking is None:
+            raise ValueError(f"Unknown booking: {booking_id}")
+        if booking['status'] != 'in-cart':
+            raise ValueError(f"Booking {booking_id} is not in the cart (status {booking['status']})")
+        if email is not None and booking['email'] != email:
+            raise ValueError(f"Booking {booking_id} belongs to another user")
+        lines.append((booking_id, booking['package_id'], int(booking['number_of_travellers'])))
+
+    # Items without a booking (older clients) are priced from their package id and quantity
+    for item in cart:
+        if item.get('booking_id') is None:
+            quantity = int(item.get('quantity', 0))
+            if quantity < 1:
+                raise ValueError("Cart quantities must be positive")
+            lines.append((None, int(item['id']), quantity))
+    return lines
+
+
+def create_quote(cart, email):
+    """
+    Prices a cart from the database and stores the quote for the rest of the checkout.
+
+    Args:
+        cart (list): Cart items, {'booking_id'} (preferred, travellers and package come from the booking)
+            or {'id': package_id, 'quantity'}. Client prices are ignored.
+        email (str): The buyer, every booking must belong to them and later steps only accept the quote from them.
+
+    Returns:
+        dict: {'quote_id', 'email', 'currency', 'lines': [{'booking_id', 'package_id', 'quantity', 'unit_price',
+               'line_total'}], 'total', 'created_at', 'expires_at'}, amounts as '123.45' strings.
+
+    Raises:
+        ValueError: For a missing email, an empty cart, unknown packages or bookings that aren't in the cart.
+    """
+    if not email:
+        raise ValueError("user_email is required")
+    if not cart:
+        raise ValueError("The cart is empty")
+    lines = _cart_lines(cart, email)
+    prices = package_prices(package_id for _, package_id, _ in lines)
+    unknown = sorted({package_id for _, package_id, _ in lines if package_id not in prices})
+    if unknown:
+        raise ValueError(f"Unknown packages: {', '.join(map(str, unknown))}")
+
+    unit_prices = [prices[package_id] for _, package_id, _ in lines]
+    line_totals, total = _line_totals(unit_prices, [quantity for _, _, quantity in lines])
+    if total <= 0:
+        raise ValueError("The cart total must be positive")
+
+    now = datetime.now()
+    quote = {
+        'quote_id': uuid.uuid4().hex,
+        'email': email,
+        'currency': CURRENCY,
+        'lines': [{'booking_id': booking_id, 'package_id': package_id, 'quantity': quantity,
+                   'unit_price': str(unit_price), 'line_total': str(line_total)}
+                  for (booking_id, package_id, quantity), unit_price, line_total in zip(lines, unit_prices, line_totals)],
+        'total': str(total),
+        'created_at': now.isoformat(timespec='seconds'),
+        'expires_at': (now + timedelta(seconds=QUOTE_TTL)).isoformat(timespec='seconds'),
+    }
+    idempotency.remember(QUOTE_SCOPE, quote['quote_id'], quote, 200)
+    return quote
+
+
+def get_quote(quote_id, allow_expired=False):
+    """
+    A stored quote, from this process's cache when possible.
+
+    Args:
+        quote_id (str): The quote_id from create_quote.
+        allow_expired (bool): Return it even past expires_at. Only for work after the payment has been
+            taken (recording the order), before that an expired quote has to be priced again.
+
+    Raises:
+        KeyError: If there's no such quote, or it has expired and allow_expired is False.
+    """
+    stored = idempotency.lookup(QUOTE_SCOPE, quote_id) if quote_id else None
+    if stored is None:
+        raise KeyError(f"Unknown quote: {quote_id}")
+    quote = stored[0]
+    if not allow_expired and datetime.fromisoformat(quote['expires_at']) < datetime.now():
+        raise KeyError(f"Quote {quote_id} has expired, please check out again")
+    return quote
+
+
+def check_paypal_order(quote, purchase_units):
+    """
+    Checks a PayPal order (its purchase units, as returned by an order GET) is for this quote, before it's captured.
+
+    Raises:
+        QuoteMismatch: If the order isn't tagged with the quote_id or its amount / currency differ.
+    """
+    units = list(purchase_units or [])
+    if not units or any(getattr(unit, 'custom_id', None) != quote['quote_id'] for unit in units):
+        raise QuoteMismatch(f"The PayPal order wasn't created for quote {quote['quote_id']}")
+    if any(unit.amount.currency_code != quote['currency'] for unit in units):
+        raise QuoteMismatch(f"The PayPal order isn't in {quote['currency']}")
+    amount = sum((to_money(unit.amount.value) for unit in units), Decimal('0.00'))
+    if amount != Decimal(quote['total']):
+        raise QuoteMismatch(f"The PayPal order is for {amount}, the quote is for {quote['total']}")
+
+
+def quote_booking_ids(quote):
+    return [line['booking_id'] for line in quote['lines'] if line['booking_id'] is not None]
@@ -0,0 +1,275 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from sqlalchemy import event
+
+# Opt-in cache of read query results (fetch_data / fetch_rows / named queries with cache=True).
+#
+# Each entry remembers every table its statement reads. Writes are picked up at the engine level,
+# so anything that commits through the write engine (execute_query, upsert_data,
+# execute_query_with_returning, and the helpers that use Session directly) drops the entries that
+# read a table it wrote to. Entries also expire after their TTL as a backstop (e.g. for writes made
+# by another process).
+CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 512))
+DEFAULT_TTL = float(os.getenv("QUERY_CACHE_TTL", 300))      # seconds
+
+_IDENTIFIER = r'[A-Za-z_][A-Za-z0-9_]*'
+_FROM_PATTERN = re.compile(
+    rf'\b(?:FROM|JOIN)\s+({_IDENTIFIER}(?:\s+(?:AS\s+)?{_IDENTIFIER})?(?:\s*,\s*{_IDENTIFIER}(?:\s+(?:AS\s+)?{_IDENTIFIER})?)*)',
+    re.IGNORECASE)
+_CTE_PATTERN = re.compile(rf'({_IDENTIFIER})\s+AS\s*\(', re.IGNORECASE)
+_WRITE_PATTERN = re.compile(rf'\b(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+({_IDENTIFIER})', re.IGNORECASE)
+_DDL_PATTERN = re.compile(r'^\s*(CREATE|DROP|ALTER)\b', re.IGNORECASE)
+_KEYWORDS = {'where', 'join', 'left', 'right', 'inner', 'outer', 'cross', 'natural', 'on', 'using', 'group',
+             'order', 'limit', 'having', 'union', 'except', 'intersect', 'window', 'select'}
+
+# Brackets, quoted strings / identifiers and comments are matched as a whole so keywords inside them are skipped
+_VERB_TOKENS = re.compile(
+    r"--[^\n]*|/\*.*?\*/|'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|[()]|\b(SELECT|INSERT|UPDATE|DELETE|REPLACE|VALUES)\b",
+    re.IGNORECASE | re.DOTALL)
+
+
+def statement_verb(query):
+    """
+    The main verb of a statement: the first SELECT / INSERT / UPDATE / DELETE / REPLACE / VALUES outside brackets,
+    so WITH ... DELETE is a DELETE and INSERT ... SELECT an INSERT.
+
+    Returns:
+        str: The upper-cased verb, or None if there isn't one (DDL, PRAGMA, ...).
+    """
+    depth = 0
+    for match in _VERB_TOKENS.finditer(query):
+        token = match.group(0)
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif match.group(1) and depth == 0:
+            return match.group(1).upper()
+    return None
+
+
+def referenced_tables(query):
+    """
+    Returns every table a SELECT reads: FROM / JOIN targets (comma lists included) in the
+    statement and all its subqueries, minus CTE names and table-valued functions.
+
+    Args:
+        query (str): The SQL query.
+
+    Returns:
+        frozenset: Lower-cased table names.
+    """
+    ctes = {name.lower() for name in _CTE_PATTERN.findall(query)}
+    tables = set()
+    for match in _FROM_PATTERN.finditer(query):
+        # skip table-valued functions like json_each(...)
+        if query[match.end():].lstrip().startswith('(') and ',' not in match.group(1):
+            continue
+        for item in match.group(1).split(','):
+            name = item.split()[0].lower()
+            if name not in _KEYWORDS and name not in ctes:
+                tables.add(name)
+    return frozenset(tables)
+
+
+def written_tables(statement):
+    """
+    Returns the tables a write statement changes, or None for DDL (which invalidates everything).
+    """
+    if _DDL_PATTERN.match(statement):
+        return None
+    return frozenset(name.lower() for name in _WRITE_PATTERN.findall(statement))
+
+
+def make_key(query, params):
+    """
+    Cache key from whitespace-normalized SQL plus the bound params, or None if a param can't be hashed.
+    """
+    normalized = ' '.join(query.split())
+    try:
+        frozen = tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in (params or {}).items()))
+        hash(frozen)
+    except TypeError:
+        return None
+    return normalized, frozen
+
+
+class QueryCache:
+    """
+    Bounded LRU of query results with a TTL per entry and a reverse index table -> keys for invalidation.
+    """
+
+    def __init__(self, max_entries=CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()       # key -> (expires_at, tables, value)
+        self._by_table = {}                 # table -> set of keys
+        self._versions = {}                 # table -> write counter, guards against caching pre-commit reads
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'invalidations': 0, 'evictions': 0, 'expired': 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[2]
+
+    def versions(self, tables):
+        """Write counters of the given tables, taken before running a query and passed back to put()."""
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in sorted(tables))
+
+    def put(self, key, tables, value, versions, ttl=None):
+        """
+        Stores a result, unless one of its tables was written while the query ran.
+        """
+        with self._lock:
+            if tuple(self._versions.get(table, 0) for table in sorted(tables)) != versions:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + (ttl or DEFAULT_TTL), tables, value)
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            self._stats['stores'] += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def invalidate_tables(self, tables):
+        """Drops every entry that read one of the tables (None drops everything)."""
+        with self._lock:
+            if tables is None:
+                tables = set(self._by_table) | set(self._versions)
+                self._stats['invalidations'] += len(self._entries)
+                self._entries.clear()
+                self._by_table.clear()
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+                for key in self._by_table.pop(table, ()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self._stats['invalidations'] += 1
+
+    def clear(self):
+        self.invalidate_tables(None)
+
+    def _remove(self, key):
+        _, tables, _ = self._entries.pop(key)
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else None,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+            }
+
+
+cache = QueryCache()
+_pending = threading.local()
+
+# table -> tables its triggers write to, since trigger writes never show up in the statements we see
+_dependents = {}
+
+
+def add_dependents(source_tables, dependent_tables):
+    """
+    Records that writes to source_tables also change dependent_tables (e.g. through triggers),
+    so cached reads of the dependents are dropped too.
+    """
+    for table in source_tables:
+        _dependents.setdefault(table.lower(), set()).update(t.lower() for t in dependent_tables)
+
+
+# table -> callbacks run when a commit writes to it, for in-process caches kept outside the query cache
+_write_listeners = {}
+
+
+def on_write(tables, callback):
+    """
+    Calls callback() after every commit through the write engine that changes one of the tables
+    (and after DDL), so caches built from those tables can drop themselves.
+    """
+    for table in tables:
+        _write_listeners.setdefault(table.lower(), []).append(callback)
+
+
+def _invalidate(tables):
+    cache.invalidate_tables(tables)
+    names = _write_listeners if tables is None else [table for table in tables if table in _write_listeners]
+    callbacks = {callback for table in names for callback in _write_listeners[table]}
+    for callback in callbacks:
+        callback()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # By the main verb rather than the first keyword, so WITH ... UPDATE / DELETE / INSERT counts as a write
+    # (DDL first, CREATE TABLE ... AS SELECT has SELECT for a verb)
+    if not _DDL_PATTERN.match(statement) and statement_verb(statement) in ('SELECT', 'VALUES', None):
+        return
+    tables = written_tables(statement)
+    written = conn.info.setdefault('query_cache_written', set())
+    if tables is None:
+        conn.info['query_cache_ddl'] = True
+    else:
+        written.update(tables)
+        for table in tables:
+            written.update(_dependents.get(table, ()))
+
+
+def _on_commit(conn):
+    written = conn.info.pop('query_cache_written', None)
+    ddl = conn.info.pop('query_cache_ddl', False)
+    if ddl:
+        _invalidate(None)
+        _pending.tables = None
+    elif written:
+        _invalidate(written)
+        # invalidate again once the commit has really happened (Session after_commit), so a read that
+        # slipped in between this event and the actual COMMIT can't leave a stale entry behind
+        _pending.tables = written
+
+
+def _on_rollback(conn):
+    conn.info.pop('query_cache_written', None)
+    conn.info.pop('query_cache_ddl', None)
+
+
+def _after_session_commit(session):
+    if hasattr(_pending, 'tables'):
+        tables = _pending.tables
+        del _pending.tables
+        _invalidate(tables)
+
+
+def install(engine, session_factory):
+    """
+    Hooks the write engine (and its session factory) so commits invalidate the cache.
+    """
+    if engine.__dict__.get('_query_cache_installed'):
+        return
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'commit', _on_commit)
+    event.listen(engine, 'rollback', _on_rollback)
+    event.listen(session_factory, 'after_commit', _after_session_commit)
+    engine.__dict__['_query_cache_installed'] = True
@@ -0,0 +1,183 @@
+import re
+import traceback
+from sqlalchemy import text
+from db.db_config import ReadSession
+from helper_modules import db_helper as db
+from helper_modules import query_cache
+
+DEFAULT_ROW_LIMIT = 1000
+REFERENCE_TTL = 300     # seconds, for the rarely changing lookup tables
+# who may run a query: anyone, the user whose :email it's for (or an admin), admins only
+ACCESS_LEVELS = ('public', 'user', 'admin')
+
+
+class NamedQuery:
+    """
+    A server-defined, parameterized read query.
+
+    The text() construct is built once here and reused for every call, so SQLAlchemy's compiled
+    statement cache always sees the same statement (cache_key) instead of re-parsing browser SQL.
+
+    Attributes:
+        name (str): The name the frontend asks for.
+        table (str): Main table, used for the Boolean/Date/Numeric row converters.
+        params (tuple): Bind parameter names the query requires.
+        row_limit (int): Max rows returned, anything past it is cut off.
+        cache_ttl (float): If set, results are kept in the query cache for this many seconds
+            (invalidated early by writes to any table the query reads).
+        access (str): One of ACCESS_LEVELS, checked by the /query route. 'user' queries take an :email param.
+        tables (frozenset): Every table the query reads.
+        statement (TextClause): The compiled text() construct.
+        cache_key: SQLAlchemy cache key of the statement.
+    """
+
+    def __init__(self, name, sql, table=None, row_limit=DEFAULT_ROW_LIMIT, cache_ttl=None, access='public'):
+        if access not in ACCESS_LEVELS:
+            raise ValueError(f"Unknown access level: {access}")
+        self.name = name
+        self.sql = sql
+        self.table = table or db.extract_table_name(sql)
+        self.params = tuple(dict.fromkeys(re.findall(r'(?<!:):([a-zA-Z_][a-zA-Z0-9_]*)', sql)))
+        self.row_limit = row_limit
+        self.cache_ttl = cache_ttl
+        self.access = access
+        if access == 'user' and 'email' not in self.params:
+            raise ValueError(f"Query {name} is per user but has no :email param")
+        self.tables = query_cache.referenced_tables(sql)
+        self.statement = text(sql)
+        self.cache_key = self.statement._generate_cache_key()
+
+
+_registry = {}
+
+
+def register(name, sql, table=None, row_limit=DEFAULT_ROW_LIMIT, cache_ttl=None, access='public'):
+    _registry[name] = NamedQuery(name, sql, table=table, row_limit=row_limit, cache_ttl=cache_ttl, access=access)
+
+
+def get_query(name):
+    return _registry.get(name)
+
+
+def run_query(name, params=None):
+    """
+    Runs a registered query with bound parameters on the read-only engine.
+
+    Args:
+        name (str): The registered query name.
+        params (dict): Values for the query's bind parameters (extra keys are rejected).
+
+    Returns:
+        list: Rows as dicts, at most the query's row_limit of them.
+
+    Raises:
+        KeyError: If no query is registered under that name.
+        ValueError: If parameters are missing or unexpected.
+    """
+    query = _registry.get(name)
+    if query is None:
+        raise KeyError(f"Unknown query: {name}")
+
+    params = params or {}
+    missing = [p for p in query.params if p not in params]
+    unexpected = [p for p in params if p not in query.params]
+    if missing or unexpected:
+        raise ValueError(f"Query {name} expects params {list(query.params)}, missing {missing}, unexpected {unexpected}")
+
+    if query.cache_ttl:
+        key = query_cache.make_key(query.sql, params)
+        versions = query_cache.cache.versions(query.tables)
+        cached = query_cache.cache.get(key) if key else None
+        if cached is not None:
+            column_names, rows = cached
+            return [dict(zip(column_names, row)) for row in rows]
+
+    session = ReadSession()
+    try:
+        result = session.execute(query.statement, params)
+        column_names = tuple(result.keys())
+        rows = result.fetchmany(query.row_limit)
+
+        converters = db.get_row_converters(session.get_bind(), query.table, column_names)
+        rows = db.apply_row_converters(rows, converters)
+
+        if query.cache_ttl and key:
+            query_cache.cache.put(key, query.tables, (column_names, [tuple(row) for row in rows]), versions, query.cache_ttl)
+
+        return [dict(zip(column_names, row)) for row in rows]
+    except Exception:
+        print(traceback.format_exc())
+        raise
+    finally:
+        session.close()
+
+
+# ---- Registered queries ----
+
+register('cart_items', """
+    SELECT b.booking_id, b.package_id, b.start_date, b.end_date, b.number_of_travellers,
+           p.name, p.duration, p.price,
+           l.country, l.city
+    FROM Bookings b
+    JOIN Packages p ON b.package_id = p.package_id
+    JOIN Locations l ON p.location_id = l.location_id
+    WHERE b.email = :email AND b.status = 'in-cart'
+    ORDER BY b.start_date ASC
+""", table='Bookings', row_limit=500, access='user')
+
+register('user_orders', """
+    SELECT
+      o.order_id, o.email, o.total_price, o.order_date, o.payment_status,
+      b.start_date, b.end_date, b.number_of_travellers, b.price, b.status,
+      p.package_id, p.name, p.duration, p.description,
+      l.country, l.city
+    FROM Orders o
+    JOIN OrderItems oi ON o.order_id = oi.order_id
+    JOIN Bookings b ON oi.booking_id = b.booking_id
+    JOIN Packages p ON b.package_id = p.package_id
+    JOIN Locations l ON p.location_id = l.location_id
+    WHERE o.email = :email
+    ORDER BY o.order_date DESC,
+        CASE
+            WHEN b.status = 'pending'   THEN 1
+            WHEN b.status = 'confirmed' THEN 2
+            WHEN b.status = 'cancelled' THEN 3
+        END
+""", table='Orders', row_limit=2000, access='user')
+
+register('catalog', """
+    SELECT p.package_id, p.name, p.description, p.duration, p.price, p.location_id,
+           l.city AS location_city, l.country AS location_country
+    FROM Packages p
+    LEFT JOIN Locations l ON p.location_id = l.location_id
+    ORDER BY p.package_id
+""", table='Packages', row_limit=10000, cache_ttl=REFERENCE_TTL)
+
+register('package_images', """
+    SELECT image_id, package_id, image_path FROM PackageImages ORDER BY image_id
+""", row_limit=50000, cache_ttl=REFERENCE_TTL)
+
+register('booking_by_id', """
+    SELECT booking_id, email, package_id, start_date, end_date, number_of_travellers, price, status
+    FROM Bookings WHERE booking_id = :booking_id AND email = :email
+""", row_limit=1, access='user')
+
+register('users', """
+    SELECT email, phone_number, first_name, last_name, is_admin FROM Users ORDER BY email
+""", row_limit=10000, access='admin')
+
+register('user_by_email', """
+    SELECT email, phone_number, first_name, last_name, is_admin FROM Users WHERE email = :email
+""", row_limit=1, access='user')
+
+register('locations', """
+    SELECT location_id, city, country FROM Locations ORDER BY location_id
+""", row_limit=5000, cache_ttl=REFERENCE_TTL)
+
+register('distinct_locations', """
+    SELECT DISTINCT city, country FROM Locations
+""", row_limit=5000, cache_ttl=REFERENCE_TTL)
+
+register('categories', """
+    SELECT category_id, name FROM Categories ORDER BY category_id
+""", row_limit=5000, cache_ttl=REFERENCE_TTL)
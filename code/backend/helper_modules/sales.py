@@ -0,0 +1,261 @@
+import sys, os
+from datetime import date
+import numpy as np
+import pandas as pd
+from db.db_config import engine
+
+# models import themselves as a top level package (from models import Base), so db/ has to be on the path
+db_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'db')
+if db_dir not in sys.path:
+    sys.path.append(db_dir)
+from db.sales_schema import SALES_TABLE, SALES_SOURCES, rebuild_sales_rollup
+from helper_modules import db_helper as db
+from helper_modules import query_cache
+
+# Admin sales analytics answered from SalesRollup (order day x package x booking status, kept current by
+# triggers) instead of the order history. The rollup rows for the asked range are read once (query cache,
+# dropped on any write to the tables the triggers follow) and grouped in pandas / numpy.
+SALES_CACHE_TTL = 300
+REVENUE_STATUSES = ('pending', 'confirmed')   # default: bookings that are paid for and not cancelled
+FREQUENCIES = {'day': 'D', 'week': 'W', 'month': 'M', 'year': 'Y'}
+METRICS = ('revenue', 'bookings', 'travellers')
+# dimension -> (the column grouped on, label columns joined onto the grouped result)
+DIMENSIONS = {
+    'package': ('package_id', ['package_name']),
+    'location': ('location_id', ['city', 'country']),
+    'category': ('category', []),
+    'status': ('status', []),
+}
+
+query_cache.add_dependents(SALES_SOURCES, [SALES_TABLE])
+
+# Only the narrow numeric rows are read, names are joined onto the (much smaller) grouped result
+ROLLUP_QUERY = """
+    SELECT day, package_id, status, bookings, travellers, revenue_cents
+    FROM SalesRollup
+    WHERE bookings != 0 {where}
+"""
+
+PACKAGE_QUERY = """
+    SELECT p.package_id, p.name AS package_name, p.location_id, l.city, l.country
+    FROM Packages p LEFT JOIN Locations l ON l.location_id = p.location_id
+"""
+
+CATEGORY_QUERY = """
+    SELECT pc.package_id, c.name AS category
+    FROM PackageCategory pc JOIN Categories c ON c.category_id = pc.category_id
+"""
+
+def _parse_day(value, name):
+    if value in (None, ''):
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise ValueError(f"{name} must be a YYYY-MM-DD date")
+
+
+def parse_statuses(value):
+    """'all' -> None (every status), nothing -> REVENUE_STATUSES, otherwise a list or comma separated string."""
+    if value in (None, ''):
+        return REVENUE_STATUSES
+    if value == 'all':
+        return None
+    return tuple(value) if isinstance(value, (list, tuple)) else tuple(v.strip() for v in str(value).split(',') if v.strip())
+
+
+def _rollup_frame(start=None, end=None, statuses=REVENUE_STATUSES):
+    """The rollup rows in range as a DataFrame, with day as datetime64 and revenue in dollars."""
+    conditions, params = [], {}
+    start, end = _parse_day(start, 'start'), _parse_day(end, 'end')
+    if start:
+        conditions.append("day >= :start")
+        params['start'] = start.isoformat()
+    if end:
+        conditions.append("day <= :end")
+        params['end'] = end.isoformat()
+    if statuses:
+        conditions.append(f"status IN ({', '.join(f':s{i}' for i in range(len(statuses)))})")
+        params.update({f"s{i}": status for i, status in enumerate(statuses)})
+    where = ''.join(f" AND {condition}" for condition in conditions)
+
+    df = db.fetch_data(ROLLUP_QUERY.format(where=where), params, cache=True, ttl=SALES_CACHE_TTL)
+    if df is None:
+        raise RuntimeError("Reading SalesRollup failed")
+    df['day'] = pd.to_datetime(df['day'], format='%Y-%m-%d')
+    df['revenue'] = df['revenue_cents'].to_numpy(dtype=np.int64) / 100
+    return df
+
+
+def _reference(query, what):
+    df = db.fetch_data(query, cache=True, ttl=SALES_CACHE_TTL)
+    if df is None:
+        raise RuntimeError(f"Reading {what} failed")
+    return df
+
+
+def _with_dimension(df, by):
+    """Adds the column to group on for by (location_id, or one row per category)."""
+    if by not in DIMENSIONS:
+        raise ValueError(f"by must be one of: {', '.join(DIMENSIONS)}")
+    if by == 'location':
+        packages = _reference(PACKAGE_QUERY, "packages")
+        location_of = pd.Series(packages['location_id'].to_numpy(), index=packages['package_id'])
+        df['location_id'] = df['package_id'].map(location_of)
+    elif by == 'category':
+        # A package in two categories counts towards both
+        df = df.merge(_reference(CATEGORY_QUERY, "package categories"), on='package_id', how='left')
+        df['category'] = df['category'].fillna('Uncategorised')
+    return df
+
+
+def _with_labels(grouped, by):
+    """Joins the package / location names onto a result grouped by their ids."""
+    key, labels = DIMENSIONS[by]
+    if not labels:
+        return grouped
+    packages = _reference(PACKAGE_QUERY, "packages")
+    names = packages[[key] + labels].drop_duplicates(key)
+    return grouped.merge(names, on=key, how='left')
+
+
+def _records(df, columns):
+    out = df[columns].copy()
+    for column in ('period', 'cohort'):
+        if column in out:
+            out[column] = out[column].dt.strftime('%Y-%m-%d')
+    if 'revenue' in out:
+        out['revenue'] = out['revenue'].round(2)
+    return out.astype(object).where(out.notna(), None).to_dict('records')
+
+
+def timeseries(freq='month', by=None, start=None, end=None, statuses=REVENUE_STATUSES):
+    """
+    Bookings, travellers and revenue per period, optionally split by package, location, category or status.
+    Periods without sales are filled with zeros.
+
+    Args:
+        freq (str): 'day', 'week', 'month' or 'year'.
+        by (str): None or one of DIMENSIONS.
+        start (str): First order day 'YYYY-MM-DD' (inclusive), None for all history.
+        end (str): Last order day (inclusive).
+        statuses (tuple): Booking statuses to count, None for all of them.
+
+    Returns:
+        list: [{'period': 'YYYY-MM-DD' (period start), <dimension columns>, 'bookings', 'travellers', 'revenue'}]
+
+    Raises:
+        ValueError: For an unknown freq / by or a bad date.
+    """
+    if freq not in FREQUENCIES:
+        raise ValueError(f"freq must be one of: {', '.join(FREQUENCIES)}")
+    df = _rollup_frame(start, end, statuses)
+    keys = [DIMENSIONS[by][0]] if by else []
+    if by:
+        df = _with_dimension(df, by)
+    if df.empty:
+        return []
+
+    df['period'] = df['day'].dt.to_period(FREQUENCIES[freq])
+    grouped = df.groupby(['period'] + keys, dropna=False)[list(METRICS)].sum()
+
+    # Every period in range for every group, zeros where nothing sold
+    periods = pd.period_range(df['period'].min(), df['period'].max(), freq=FREQUENCIES[freq])
+    if keys:
+        groups = grouped.reset_index()[keys].drop_duplicates()
+        full = pd.MultiIndex.from_frame(
+            pd.merge(pd.DataFrame({'period': periods}), groups, how='cross')[['period'] + keys])
+    else:
+        full = pd.Index(periods, name='period')
+    grouped = grouped.reindex(full, fill_value=0).reset_index()
+    grouped['period'] = grouped['period'].dt.start_time
+    if by:
+        grouped = _with_labels(grouped, by)
+        keys = keys + DIMENSIONS[by][1]
+    return _records(grouped, ['period'] + keys + list(METRICS))
+
+
+def top(by='package', metric='revenue', n=10, start=None, end=None, statuses=REVENUE_STATUSES):
+    """
+    The N best packages / locations / categories / statuses by revenue, bookings or travellers.
+
+    Returns:
+        list: [{<dimension columns>, 'bookings', 'travellers', 'revenue', 'share'}] best first,
+              share = this group's part of the metric's total.
+
+    Raises:
+        ValueError: For an unknown by / metric or n < 1.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of: {', '.join(METRICS)}")
+    n = int(n)
+    if n < 1:
+        raise ValueError("n must be positive")
+    df = _with_dimension(_rollup_frame(start, end, statuses), by)
+    if df.empty:
+        return []
+    key = DIMENSIONS[by][0]
+    grouped = df.groupby(key, dropna=False)[list(METRICS)].sum().reset_index()
+
+    # argpartition picks the top n in linear time, only those n get sorted
+    values = grouped[metric].to_numpy()
+    if len(values) > n:
+        grouped = grouped.iloc[np.argpartition(-values, n - 1)[:n]]
+    grouped = grouped.sort_values([metric, key], ascending=[False, True])
+    total = values.sum()
+    grouped['share'] = (grouped[metric] / total).round(4) if total else 0.0
+    return _records(_with_labels(grouped, by), [key] + DIMENSIONS[by][1] + list(METRICS) + ['share'])
+
+
+def cohorts(metric='revenue', start=None, end=None, statuses=REVENUE_STATUSES):
+    """
+    Package cohorts by month: packages are grouped by the month of their first sale, and each cohort's
+    metric is summed per month since then (0 = the launch month).
+
+    Returns:
+        dict: {'months_since': [0, 1, ...], 'cohorts': [{'cohort': 'YYYY-MM-01', 'packages': int,
+               'values': [metric per month since, in months_since order]}]}
+
+    Raises:
+        ValueError: For an unknown metric or a bad date.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of: {', '.join(METRICS)}")
+    df = _rollup_frame(start, end, statuses)
+    if df.empty:
+        return {'months_since': [], 'cohorts': []}
+
+    month = df['day'].dt.year.to_numpy() * 12 + df['day'].dt.month.to_numpy() - 1
+    df['month'] = month
+    first = df.groupby('package_id')['month'].transform('min').to_numpy()
+    df['cohort_month'] = first
+    df['months_since'] = month - first
+
+    matrix = df.pivot_table(index='cohort_month', columns='months_since', values=metric, aggfunc='sum', fill_value=0)
+    matrix = matrix.reindex(columns=range(int(df['months_since'].max()) + 1), fill_value=0)
+    sizes = df.groupby('cohort_month')['package_id'].nunique()
+    rounding = 2 if metric == 'revenue' else 0
+    return {
+        'months_since': list(matrix.columns),
+        'cohorts': [{'cohort': date(cohort // 12, cohort % 12 + 1, 1).isoformat(),
+                     'packages': int(sizes[cohort]),
+                     'values': [round(float(v), rounding) if rounding else int(v) for v in row]}
+                    for cohort, row in zip(matrix.index, matrix.to_numpy())],
+    }
+
+
+def rebuild():
+    """Refills SalesRollup from the raw order tables (the backfill command)."""
+    with engine.begin() as conn:
+        rows = rebuild_sales_rollup(conn)
+    query_cache.cache.invalidate_tables([SALES_TABLE])
+    print(f"SalesRollup rebuilt ({rows} rows).")
+    return rows
+
+
+if __name__ == "__main__":
+    # Run from backend/:  python -m helper_modules.sales rebuild
+    if len(sys.argv) > 1 and sys.argv[1] == 'rebuild':
+        rebuild()
+    else:
+        print("Usage: python -m helper_modules.sales rebuild")
@@ -0,0 +1,369 @@
+import os
+import sys
+import gzip
+import time
+import shutil
+import sqlite3
+import threading
+import traceback
+from datetime import datetime, timezone, timedelta
+from db.db_config import DATABASE_PATH, BASE_DIR, DB_CONFIG, engine, read_engine
+from db.schema_registry import invalidate_schema_cache
+from helper_modules import query_cache
+
+# zstandard is optional: without it snapshots are gzipped
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# fcntl (posix only) stops several app processes taking the same scheduled snapshot
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Whole-database snapshots: one consistent copy of every table (VACUUM INTO, or the online backup API),
+# compressed, with old ones pruned. Under WAL the copy only holds a read transaction, so writers keep going.
+SNAPSHOT_CONFIG = {
+    "dir":          os.getenv("SNAPSHOT_DIR", os.path.join(BASE_DIR, "snapshots")),
+    "method":       os.getenv("SNAPSHOT_METHOD", "vacuum").lower(),         # "vacuum" (VACUUM INTO) or "backup" (backup API)
+    "compression":  os.getenv("SNAPSHOT_COMPRESSION", "zstd" if zstandard else "gzip").lower(),  # zstd / gzip / none
+    "level":        int(os.getenv("SNAPSHOT_LEVEL", 0)) or None,            # compression level, default per codec
+    "interval":     float(os.getenv("SNAPSHOT_INTERVAL", 0)),               # seconds between scheduled snapshots, 0 = off
+    "keep_last":    int(os.getenv("SNAPSHOT_KEEP_LAST", 24)),               # most recent snapshots always kept
+    "keep_daily":   int(os.getenv("SNAPSHOT_KEEP_DAILY", 14)),              # plus the newest one of each of the last N days
+    "backup_pages": int(os.getenv("SNAPSHOT_BACKUP_PAGES", 1024)),          # pages per backup API step
+}
+
+EXTENSIONS = {'zstd': '.db.zst', 'gzip': '.db.gz', 'none': '.db'}
+PREFIX = os.path.splitext(os.path.basename(DATABASE_PATH))[0] + '-'
+CHUNK_SIZE = 1024 * 1024
+
+_lock = threading.Lock()
+_scheduler = None
+_stop = threading.Event()
+_status = {'last_snapshot': None, 'last_error': None, 'taken': 0, 'failed': 0}
+
+
+def _compression_of(name):
+    for compression, extension in EXTENSIONS.items():
+        if compression != 'none' and name.endswith(extension):
+            return compression
+    return 'none'
+
+
+def _open_compressed(path, mode, compression):
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstandard is required for .zst snapshots: pip install zstandard")
+        if 'w' in mode:
+            level = SNAPSHOT_CONFIG['level'] or 3
+            return zstandard.ZstdCompressor(level=level, threads=-1).stream_writer(open(path, 'wb'), closefd=True)
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    if compression == 'gzip':
+        return gzip.open(path, mode, compresslevel=SNAPSHOT_CONFIG['level'] or 6) if 'w' in mode else gzip.open(path, mode)
+    return open(path, mode)
+
+
+def _copy_database(target):
+    """Consistent copy of the live db into target (a new, uncompressed sqlite file)."""
+    source = sqlite3.connect(f"file:{DATABASE_PATH}?mode=ro", uri=True, timeout=DB_CONFIG['busy_timeout'] / 1000)
+    try:
+        if SNAPSHOT_CONFIG['method'] == 'backup':
+            # copied a few pages per step; if another connection writes in between sqlite restarts the copy
+            dest = sqlite3.connect(target)
+            try:
+                source.backup(dest, pages=SNAPSHOT_CONFIG['backup_pages'])
+            finally:
+                dest.close()
+        else:
+            # one read transaction, and the copy comes out defragmented (usually smaller than the live file)
+            source.execute("VACUUM INTO ?", (target,))
+    finally:
+        source.close()
+
+
+def _check_database(path):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        result = conn.execute("PRAGMA quick_check").fetchone()[0]
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+    if result != 'ok':
+        raise RuntimeError(f"Snapshot failed its integrity check: {result}")
+    return version
+
+
+def take_snapshot(compression=None):
+    """
+    Takes a consistent snapshot of the whole database, compresses it into SNAPSHOT_DIR and prunes old ones.
+
+    Args:
+        compression (str): 'zstd', 'gzip' or 'none' (default SNAPSHOT_COMPRESSION).
+
+    Returns:
+        dict: {'name', 'path', 'db_bytes', 'bytes', 'schema_version', 'copy_ms', 'compress_ms', 'pruned'}
+
+    Raises:
+        ValueError: For an unknown (or not installed) compression.
+    """
+    compression = (compression or SNAPSHOT_CONFIG['compression']).lower()
+    if compression not in EXTENSIONS:
+        raise ValueError(f"Unknown snapshot compression: {compression}")
+    if compression == 'zstd' and zstandard is None:
+        raise ValueError("zstd snapshots need zstandard: pip install zstandard")
+    folder = SNAPSHOT_CONFIG['dir']
+    os.makedirs(folder, exist_ok=True)
+
+    name = PREFIX + datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ") + EXTENSIONS[compression]
+    path = os.path.join(folder, name)
+    raw_path = os.path.join(folder, f".{name}.raw")
+    tmp_path = os.path.join(folder, f".{name}.part")
+
+    with _lock:
+        try:
+            start = time.perf_counter()
+            _copy_database(raw_path)
+            version = _check_database(raw_path)
+            copied = time.perf_counter()
+
+            with open(raw_path, 'rb') as src, _open_compressed(tmp_path, 'wb', compression) as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            os.replace(tmp_path, path)
+            compressed = time.perf_counter()
+
+            info = {
+                'name': name,
+                'path': path,
+                'db_bytes': os.path.getsize(raw_path),
+                'bytes': os.path.getsize(path),
+                'schema_version': version,
+                'copy_ms': round((copied - start) * 1000, 2),
+                'compress_ms': round((compressed - copied) * 1000, 2),
+            }
+        finally:
+            for leftover in (raw_path, tmp_path):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+        info['pruned'] = prune()
+
+    _status['last_snapshot'] = info
+    _status['taken'] += 1
+    print(f"Snapshot {name} taken ({info['db_bytes']} -> {info['bytes']} bytes)")
+    return info
+
+
+def _snapshot_time(name):
+    stamp = name[len(PREFIX):].split('.', 1)[0]
+    return datetime.strptime(stamp, "%Y%m%dT%H%M%S%fZ").replace(tzinfo=timezone.utc)
+
+
+def list_snapshots():
+    """
+    Returns the snapshots in SNAPSHOT_DIR, newest first, as [{'name', 'taken_at', 'bytes'}].
+    """
+    folder = SNAPSHOT_CONFIG['dir']
+    if not os.path.isdir(folder):
+        return []
+    snapshots = []
+    for name in os.listdir(folder):
+        if not name.startswith(PREFIX) or not name.endswith(tuple(EXTENSIONS.values())):
+            continue
+        try:
+            taken_at = _snapshot_time(name)
+        except ValueError:
+            continue
+        snapshots.append({'name': name, 'taken_at': taken_at.isoformat(), 'bytes': os.path.getsize(os.path.join(folder, name))})
+    snapshots.sort(key=lambda s: s['taken_at'], reverse=True)
+    return snapshots
+
+
+def prune(now=None):
+    """
+    Applies the retention policy: keeps the SNAPSHOT_KEEP_LAST newest snapshots plus the newest one of each of
+    the last SNAPSHOT_KEEP_DAILY days, deletes the rest.
+
+    Returns:
+        list: Names of the deleted snapshots.
+    """
+    now = now or datetime.now(timezone.utc)
+    snapshots = list_snapshots()
+    keep = {s['name'] for s in snapshots[:SNAPSHOT_CONFIG['keep_last']]}
+    days_kept = set()
+    oldest_day = (now - timedelta(days=SNAPSHOT_CONFIG['keep_daily'])).date()
+    for snapshot in snapshots:  # newest first, so the first one seen per day is that day's newest
+        day = _snapshot_time(snapshot['name']).date()
+        if day > oldest_day and day not in days_kept:
+            days_kept.add(day)
+            keep.add(snapshot['name'])
+
+    deleted = []
+    for snapshot in snapshots:
+        if snapshot['name'] not in keep:
+            os.remove(os.path.join(SNAPSHOT_CONFIG['dir'], snapshot['name']))
+            deleted.append(snapshot['name'])
+    return deleted
+
+
+def _resolve(name):
+    path = os.path.join(SNAPSHOT_CONFIG['dir'], os.path.basename(name))
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"No snapshot named {name}")
+    return path
+
+
+def extract_snapshot(name, target):
+    """
+    Decompresses a snapshot to a plain sqlite file at target and checks it.
+
+    Returns:
+        int: The snapshot's schema version (PRAGMA user_version).
+    """
+    tmp_path = target + '.part'
+    try:
+        with _open_compressed(_resolve(name), 'rb', _compression_of(name)) as src, open(tmp_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        version = _check_database(tmp_path)
+        os.replace(tmp_path, target)
+        return version
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def restore_snapshot(name):
+    """
+    Replaces the whole live database with a snapshot, page by page through the backup API (so open
+    connections just see the restored data, no file swapping), then drops the schema and query caches.
+
+    Returns:
+        dict: {'name', 'schema_version', 'restore_ms'}
+    """
+    start = time.perf_counter()
+    restored_path = os.path.join(SNAPSHOT_CONFIG['dir'], f".restore-{os.getpid()}.db")
+    with _lock:
+        try:
+            version = extract_snapshot(name, restored_path)
+            source = sqlite3.connect(restored_path)
+            dest = sqlite3.connect(DATABASE_PATH, timeout=DB_CONFIG['busy_timeout'] / 1000)
+            try:
+                source.backup(dest)
+            finally:
+                dest.close()
+                source.close()
+        finally:
+            if os.path.exists(restored_path):
+                os.remove(restored_path)
+
+    # the restore bypassed the engine, so nothing cached about the old contents can be trusted
+    engine.dispose()
+    read_engine.dispose()
+    invalidate_schema_cache()
+    query_cache.cache.clear()
+    print(f"Restored snapshot {name} (schema version {version}), run db/migrations.py upgrade if it's behind")
+    return {'name': name, 'schema_version': version, 'restore_ms': round((time.perf_counter() - start) * 1000, 2)}
+
+
+def read_table(name, table):
+    """
+    Reads one table out of a snapshot into a DataFrame, without touching the live database.
+    """
+    import pandas as pd
+
+    extracted = os.path.join(SNAPSHOT_CONFIG['dir'], f".read-{os.getpid()}-{threading.get_ident()}.db")
+    try:
+        extract_snapshot(name, extracted)
+        conn = sqlite3.connect(f"file:{extracted}?mode=ro", uri=True)
+        try:
+            tables = {row[0].lower(): row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            if table.lower() not in tables:
+                raise ValueError(f"Table {table} is not in snapshot {name}")
+            return pd.read_sql_query(f'SELECT * FROM "{tables[table.lower()]}"', conn)
+        finally:
+            conn.close()
+    finally:
+        if os.path.exists(extracted):
+            os.remove(extracted)
+
+
+def _scheduled_snapshot():
+    # only one process takes it when several run the app (skipped if the lock is held)
+    lock_file = None
+    try:
+        if fcntl is not None:
+            os.makedirs(SNAPSHOT_CONFIG['dir'], exist_ok=True)
+            lock_file = open(os.path.join(SNAPSHOT_CONFIG['dir'], '.lock'), 'w')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            # another process may have just taken one
+            latest = list_snapshots()[:1]
+            if latest and (datetime.now(timezone.utc) - _snapshot_time(latest[0]['name'])).total_seconds() < SNAPSHOT_CONFIG['interval'] / 2:
+                return
+        take_snapshot()
+        _status['last_error'] = None
+    except Exception:
+        _status['failed'] += 1
+        _status['last_error'] = traceback.format_exc(limit=1)
+        print(f"Error taking snapshot: {traceback.format_exc()}")
+    finally:
+        if lock_file is not None:
+            lock_file.close()
+
+
+def _run_scheduler(interval):
+    while not _stop.wait(interval):
+        _scheduled_snapshot()
+
+
+def start_scheduler(interval=None):
+    """
+    Starts the background thread that takes a snapshot every SNAPSHOT_INTERVAL seconds (no-op if that's 0).
+
+    Returns:
+        bool: Whether the scheduler is running.
+    """
+    global _scheduler
+    interval = SNAPSHOT_CONFIG['interval'] if interval is None else interval
+    if interval <= 0:
+        return False
+    if _scheduler is None or not _scheduler.is_alive():
+        _stop.clear()
+        _scheduler = threading.Thread(target=_run_scheduler, args=(interval,), name="snapshot-scheduler", daemon=True)
+        _scheduler.start()
+    return True
+
+
+def stop_scheduler():
+    _stop.set()
+
+
+def get_status():
+    return {
+        'scheduler_running': _scheduler is not None and _scheduler.is_alive(),
+        'interval': SNAPSHOT_CONFIG['interval'],
+        'compression': SNAPSHOT_CONFIG['compression'],
+        'method': SNAPSHOT_CONFIG['method'],
+        'keep_last': SNAPSHOT_CONFIG['keep_last'],
+        'keep_daily': SNAPSHOT_CONFIG['keep_daily'],
+        **_status,
+    }
+
+
+if __name__ == "__main__":
+    # Run from backend/:  python -m helper_modules.snapshots take [zstd|gzip|none] | list | prune | restore <name>
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == 'take':
+        print(take_snapshot(sys.argv[2] if len(sys.argv) > 2 else None))
+    elif command == 'list':
+        for snapshot in list_snapshots():
+            print(f"{snapshot['name']}  {snapshot['bytes']:>12} bytes")
+    elif command == 'prune':
+        print(f"Deleted: {prune()}")
+    elif command == 'restore' and len(sys.argv) > 2:
+        print(restore_snapshot(sys.argv[2]))
+    else:
+        print("Usage: python -m helper_modules.snapshots take [zstd|gzip|none] | list | prune | restore <name>")
@@ -0,0 +1,156 @@
+import os
+import uuid
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text
+from werkzeug.formparser import parse_form_data
+from db.db_config import Session
+from helper_modules import image_variants
+
+ALLOWED_EXTENSIONS = {'jpg', 'jpeg'}
+WRITE_WORKERS = int(os.getenv("UPLOAD_WRITE_WORKERS", 4))
+
+_write_pool = ThreadPoolExecutor(max_workers=WRITE_WORKERS, thread_name_prefix="upload")
+
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+class _TempUpload:
+    """
+    File the multipart parser streams one upload into, chunk by chunk, straight into the upload
+    folder under a hidden temp name (so the final rename is atomic, same filesystem).
+    Records how long the upload took to receive.
+    """
+
+    def __init__(self, folder):
+        self.path = os.path.join(folder, f".upload-{uuid.uuid4().hex}.part")
+        self._file = open(self.path, 'w+b')
+        self.size = 0
+        self.started = None
+        self.finished = None
+
+    def write(self, data):
+        now = time.perf_counter()
+        if self.started is None:
+            self.started = now
+        self.finished = now
+        self.size += len(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _finish_file(temp, final_path):
+    # flush + fsync + rename, done per file on the write pool so independent files go in parallel
+    start = time.perf_counter()
+    temp.flush()
+    os.fsync(temp.fileno())
+    temp.close()
+    os.replace(temp.path, final_path)
+    return (time.perf_counter() - start) * 1000
+
+
+def upload_package_images(environ, upload_folder, max_content_length=None):
+    """
+    Parses a multipart upload (package_id + images) streaming each file to disk, then stores every
+    image row in one transaction and moves the files into place.
+
+    The rows are inserted with RETURNING image_id and renamed to <image_id>.<ext> before the commit;
+    if anything fails the transaction is rolled back and the files are removed, so the db and the
+    folder never disagree.
+
+    Args:
+        environ (dict): The WSGI environ of the request (its body must not have been read yet).
+        upload_folder (str): Where the images go (the UPLOAD_FOLDER config).
+        max_content_length (int): Optional request size limit.
+
+    Returns:
+        dict: {'package_id', 'files': [{'filename', 'image_id', 'image_path', 'bytes', 'receive_ms', 'write_ms'}],
+               'skipped': [filenames], 'total_ms'}
+
+    Raises:
+        ValueError: If package_id or the images are missing.
+    """
+    start = time.perf_counter()
+    upload_folder = os.path.abspath(upload_folder)
+    temps = []
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        temp = _TempUpload(upload_folder)
+        temps.append(temp)
+        return temp
+
+    try:
+        _, form, files = parse_form_data(environ, stream_factory=stream_factory, max_content_length=max_content_length)
+        package_id = form.get('package_id')
+        if not package_id:
+            raise ValueError('Package ID is required')
+        uploads = [f for f in files.getlist('images') if f and f.filename]
+        if not uploads:
+            raise ValueError('No image file provided')
+
+        accepted = [f for f in uploads if allowed_file(f.filename)]
+        skipped = [f.filename for f in uploads if not allowed_file(f.filename)]
+
+        results = []
+        session = Session()
+        renamed = []
+        try:
+            insert = text("INSERT INTO PackageImages (package_id, image_path) VALUES (:package_id, :image_path) RETURNING image_id")
+            for upload in accepted:
+                image_id = session.execute(insert, {'package_id': package_id, 'image_path': ''}).scalar_one()
+                extension = os.path.splitext(upload.filename)[1].lower()
+                results.append({'filename': upload.filename, 'image_id': image_id,
+                                'image_path': f"package_images/{image_id}{extension}", 'temp': upload.stream})
+
+            # All paths in one executemany now that the ids are known
+            if results:
+                session.execute(text("UPDATE PackageImages SET image_path = :image_path WHERE image_id = :image_id"),
+                                [{'image_path': r['image_path'], 'image_id': r['image_id']} for r in results])
+
+            futures = [_write_pool.submit(_finish_file, r['temp'], os.path.join(upload_folder, os.path.basename(r['image_path'])))
+                       for r in results]
+            error = None
+            for result, future in zip(results, futures):
+                try:
+                    result['write_ms'] = round(future.result(), 2)
+                    renamed.append(os.path.join(upload_folder, os.path.basename(result['image_path'])))
+                except Exception as e:
+                    error = error or e
+            if error:
+                raise error
+            session.commit()
+        except Exception:
+            session.rollback()
+            for path in renamed:
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+        finally:
+            session.close()
+
+        for result in results:
+            temp = result.pop('temp')
+            result['bytes'] = temp.size
+            result['receive_ms'] = round((temp.finished - temp.started) * 1000, 2) if temp.started else 0.0
+            # thumb / card / hero resizes happen on the process pool, not in this request
+            image_variants.schedule(result['image_id'], result['image_path'])
+
+        return {'package_id': package_id, 'files': results, 'skipped': skipped,
+                'total_ms': round((time.perf_counter() - start) * 1000, 2)}
+    except Exception:
+        print(f"Error during image upload: {traceback.format_exc()}")
+        raise
+    finally:
+        # whatever wasn't renamed into place (skipped files, failures) is removed
+        for temp in temps:
+            temp.discard()
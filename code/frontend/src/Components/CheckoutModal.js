@@ -1,4 +1,4 @@
-import React, { useState } from "react";
+import React, { useState, useRef } from "react";
 import { PayPalScriptProvider, PayPalButtons } from "@paypal/react-paypal-js";
 import { Box, IconButton, Typography, Button, Modal, Alert } from "@mui/material";
 import CloseRoundedIcon from '@mui/icons-material/CloseRounded';
@@ -21,6 +21,8 @@ function CheckoutModal({ open, onClose, cartItems, totalPrice, userData }) {
   const [successMessage, setSuccessMessage] = useState("");
   const [errorMessage, setErrorMessage] = useState("");
   const navigate = useNavigate();
+  // The server's price quote from /create, capture and update-orders are checked against it
+  const quoteId = useRef(null);
   // PayPal client ID and configuration
   const initialOptions = {
     "client-id": clientID,
@@ -32,17 +34,20 @@ function CheckoutModal({ open, onClose, cartItems, totalPrice, userData }) {
   };
 
   // Function to update orders in the backend after successful payment
-  const updateOrderInBackend = async () => {
+  // The PayPal order id doubles as the idempotency key, so a retried request can't create a second order
+  const updateOrderInBackend = async (paypalOrderId) => {
     try {
       const response = await fetch('http://localhost:5000/api/orders/update-orders', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'Idempotency-Key': paypalOrderId,
         },
         body: JSON.stringify({
           cart_items: cartItems,
           user_email: userData.email,
-          total_price: totalPrice,
+          quote_id: quoteId.current,
+          paypal_order_id: paypalOrderId,
         }),
       });
 
@@ -166,8 +171,11 @@ function CheckoutModal({ open, onClose, cartItems, totalPrice, userData }) {
                     "Content-Type": "application/json",
                   },
                   body: JSON.stringify({
+                    // booking_id lets the backend price the booking and hold the places until the payment goes through
+                    user_email: userData.email,
                     cart: cartItems.map(item => ({
                       id: item.packageId,
+                      booking_id: item.bookingId,
                       quantity: item.travellers,
                       price: item.price,
                     })),
@@ -176,6 +184,7 @@ function CheckoutModal({ open, onClose, cartItems, totalPrice, userData }) {
 
                 const orderData = await response.json();
                 if (orderData.id) {
+                  quoteId.current = orderData.quote_id;
                   return orderData.id;
                 } else {
                   const errorDetail = orderData?.details?.[0];
@@ -194,12 +203,13 @@ function CheckoutModal({ open, onClose, cartItems, totalPrice, userData }) {
                 const response = await fetch(`http://localhost:5000/api/orders/${data.orderID}/capture`, {
                   method: "POST",
                   headers: { "Content-Type": "application/json" },
+                  body: JSON.stringify({ quote_id: quoteId.current }),
                 });
 
                 const orderData = await response.json();
                 if (orderData.status === 'COMPLETED') {
                   // Call the backend to update orders
-                  await updateOrderInBackend();
+                  await updateOrderInBackend(data.orderID);
                 } else {
                   throw new Error("Failed to complete payment.");
                 }
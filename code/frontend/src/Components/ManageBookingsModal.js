@@ -127,7 +127,7 @@ function ManageBookingsModal({ open, onClose }) {
             setSuccessMessage(''); // Clear any previous success messages
             try {
               // Update the booking using the correct booking ID
-              const updatedBooking = await updateBooking(selectedBooking.booking_id, values.status);
+              const updatedBooking = await updateBooking(selectedBooking.booking_id, values.status, selectedBooking.email);
 
               // Refetch bookings after update to reload dropdown values
               await fetchBookings();
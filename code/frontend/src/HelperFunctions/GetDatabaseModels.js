@@ -1,14 +1,17 @@
 // GetDatabaseModels.js
 
-// Function to perform the database request
-async function fetchDatabaseData(query) {
+// Runs one of the server's named queries (see backend/helper_modules/query_registry.py).
+// The JWT goes along when there is one, per-user and admin queries need it
+export async function fetchNamedQuery(name, params = {}) {
     try {
-      const response = await fetch("http://localhost:5000/api/database/fetch_query", {
+      const token = localStorage.getItem('jwt_token');
+      const response = await fetch("http://localhost:5000/api/database/query", {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          ...(token ? { Authorization: `Bearer ${token}` } : {}),
         },
-        body: JSON.stringify({ query: query }),
+        body: JSON.stringify({ name: name, params: params }),
       });
   
       if (!response.ok) {
@@ -24,29 +27,19 @@ async function fetchDatabaseData(query) {
     }
   }
 
-// Generic function to get data from a specified table with optional conditions
-export async function getData(tableName, whereClause = "") {
-    // Build the base SQL query
-    let query = `SELECT * FROM ${tableName}`;
-  
-    // Append the WHERE clause if provided
-    if (whereClause) {
-      query += ` WHERE ${whereClause}`;
-    }
-  
-    // Fetch the data using the dynamic query
-    const data = await fetchDatabaseData(query);
-  
-    if (!data) {
-      return null; // Handle no data case
-    }
-  
-    return data; // Return raw data for further processing
+// Single user (without password) by email
+export async function getUserByEmail(email) {
+    return await fetchNamedQuery("user_by_email", { email: email });
+}
+
+// Single booking by id, only found if it belongs to email (admins can look up anyone's)
+export async function getBookingById(bookingId, email) {
+    return await fetchNamedQuery("booking_by_id", { booking_id: Number(bookingId), email: email });
 }
   
 // Function to get all Users data and transform it into a JSON object
-export async function getUsers(whereClause = "") {
-    const data = await getData("Users", whereClause);
+export async function getUsers() {
+    const data = await fetchNamedQuery("users");
   
     if (!data) {
       return null; // If no data, return null or handle appropriately
@@ -55,96 +48,74 @@ export async function getUsers(whereClause = "") {
     // Transform data into a dictionary-like object (JSON format)
     const users = data.map((user) => ({
       email: user.email,
-      password: user.password,
       isAdmin: user.is_admin
     }));
   
     return users; // Return the array of user objects
 }
 
-  // Function to get the top 5 Packages data for the homepage
+// Fetches fully assembled packages (location, images, categories) from the catalog endpoint
+async function fetchCatalog(params = {}) {
+  const searchParams = new URLSearchParams();
+  Object.entries(params).forEach(([key, value]) => {
+    if (value !== undefined && value !== null && value !== "") {
+      searchParams.append(key, value);
+    }
+  });
+
+  try {
+    const response = await fetch(`http://localhost:5000/api/database/packages?${searchParams.toString()}`);
+    if (!response.ok) {
+      console.log(`\n\n\nERROR: ${response.status}, ${response.text}\n\n\n`)
+      throw new Error("Network response was not ok:");
+    }
+    return await response.json();
+  } catch (error) {
+    console.error("Error fetching catalog:", error);
+    return null;
+  }
+}
+
+  // Function to get the top 5 Packages data for the homepage (ranked server-side from the popularity counters)
 export async function getPackages() {
-  // Query to get the top 5 packages based on the number of orders
-  const query = `
-    SELECT p.package_id, p.name, p.description, p.duration, p.price, l.city AS location, COUNT(o.order_id) AS order_count
-    FROM Packages p
-    LEFT JOIN Bookings b ON p.package_id = b.package_id
-    LEFT JOIN OrderItems oi ON b.booking_id = oi.booking_id
-    LEFT JOIN Orders o ON oi.order_id = o.order_id
-    LEFT JOIN Locations l ON p.location_id = l.location_id  -- Corrected the join with Locations
-    GROUP BY p.package_id, p.name, p.description, p.duration, p.price, l.city
-    ORDER BY order_count DESC
-    LIMIT 5;
-  `;
-  
-  const data = await fetchDatabaseData(query);
+  let data = null;
+  try {
+    const response = await fetch("http://localhost:5000/api/database/packages/top?k=5");
+    if (!response.ok) {
+      throw new Error("Network response was not ok:");
+    }
+    data = await response.json();
+  } catch (error) {
+    console.error("Error fetching top packages:", error);
+  }
 
   if (!data) {
     console.log("\n\n\n DB RETURNED NOTHING!!!!!1 \n\n\n");
     throw new Error("Database returned nothing");
   }
 
-  // Fetch the related data for images and categories
-  const imagesData = (await getData("PackageImages")) || [];
-  const categoriesData = (await getData("PackageCategory")) || [];
-
-  // Transform the data into a dictionary-like object (JSON format)
-  const packages = data.map((pkg) => {
-    const relatedImages = imagesData
-      .filter((img) => img.package_id === pkg.package_id)
-      .sort((a, b) => a.image_id - b.image_id);
-
-    const hasImages = relatedImages.length > 0;
-    const imagePaths = hasImages 
-      ? relatedImages.map((img) => `/backend/images/${img.image_path}`)  // Corrected the image path
-      : null;
-
-    const relatedCategories = categoriesData.filter((cat) => cat.package_id === pkg.package_id);
-
-    return {
-      package_id: pkg.package_id,
-      name: pkg.name, // Package name
-      description: pkg.description ,
-      duration: pkg.duration ,
-      price: pkg.price ,
-      location: pkg.location , // Ensure the location is included
-      images: imagePaths,
-      hasImages: hasImages,
-      categories: relatedCategories.length > 0 ? relatedCategories.map((cat) => cat.category_id) : []
-    };
-  });
-
-  return packages;
+  return data.map((pkg) => ({
+    package_id: pkg.package_id,
+    name: pkg.name, // Package name
+    description: pkg.description ,
+    duration: pkg.duration ,
+    price: pkg.price ,
+    location: pkg.location_city , // Ensure the location is included
+    images: pkg.images,
+    image_variants: pkg.image_variants, // resized copies per image, the carousel uses the hero size
+    hasImages: pkg.hasImages,
+    categories: pkg.category_ids
+  }));
 }
 
 export async function getUserOrders(email) {
-  const query = `
-    SELECT 
-      o.order_id, o.email, o.total_price, o.order_date, o.payment_status, 
-      b.start_date, b.end_date, b.number_of_travellers, b.price, b.status, 
-      p.package_id, p.name, p.duration, 
-      l.country, l.city
-    FROM Orders o 
-    JOIN OrderItems oi ON o.order_id = oi.order_id
-    JOIN Bookings b ON oi.booking_id = b.booking_id
-    JOIN Packages p ON b.package_id = p.package_id
-    JOIN Locations l ON p.location_id = l.location_id
-    WHERE o.email = '${email}'
-    ORDER BY o.order_date DESC,
-        CASE 
-            WHEN b.status = 'pending'   THEN 1
-            WHEN b.status = 'confirmed' THEN 2
-            WHEN b.status = 'cancelled' THEN 3
-        END;
-  `;
-
-  const data = await fetchDatabaseData(query);
+  const data = await fetchNamedQuery("user_orders", { email: email });
   
   if (!data || data.length === 0) {
     return [];
   }
 
-  const imagesData = (await getData("PackageImages")) || [];
+  const imagesData = (await fetchNamedQuery("package_images")) || [];
 
   // Group orders by `order_id`
   const ordersMap = {};
@@ -185,25 +156,14 @@ export async function getUserOrders(email) {
 }
 
 export async function getCartItems(email) {
-  const query = `
-    SELECT b.booking_id, b.package_id, b.start_date, b.end_date, b.number_of_travellers,
-           p.name, p.duration, p.price,
-           l.country, l.city
-    FROM Bookings b
-    JOIN Packages p ON b.package_id = p.package_id
-    JOIN Locations l ON p.location_id = l.location_id
-    WHERE b.email = '${email}' AND b.status = 'in-cart'
-    ORDER BY b.start_date ASC
-  `;
-
   // Fetch the main cart data
-  const data = await fetchDatabaseData(query);
+  const data = await fetchNamedQuery("cart_items", { email: email });
   if (!data || data.length === 0) {
     return [];
   }
 
   // Fetch the related images for packages
-  const imagesData = (await getData("PackageImages")) || [];
+  const imagesData = (await fetchNamedQuery("package_images")) || [];
 
   // Prepare cart items
   const cartItems = data.map(row => {
@@ -229,110 +189,116 @@ export async function getCartItems(email) {
   return cartItems;
 }
 
-export async function getPackagesGeneral(whereClause = "") {
-  // Build the base query with a dynamic WHERE clause
-  const query = `
-    SELECT p.package_id, p.name, p.description, p.duration, p.price, p.location_id, l.city AS location_city, l.country AS location_country
-    FROM Packages p
-    LEFT JOIN Locations l ON p.location_id = l.location_id
-    ${whereClause ? `WHERE ${whereClause}` : ''}
-  `;
-
-  const data = await fetchDatabaseData(query);
+// filters are passed straight to the catalog endpoint, e.g. { package_id: 3 } or { category: "Adventure", max_price: 2000 }
+export async function getPackagesGeneral(filters = {}) {
+  const data = await fetchCatalog({ page_size: 1000, ...filters });
 
   if (!data) {
     console.log("\n\n\n DB RETURNED NOTHING!!!!!1 \n\n\n");
     throw new Error("Database returned nothing");
   }
 
-  // Fetch the related data for images, categories, and category names
-  const imagesData = (await getData("PackageImages")) || [];
-  const packageCategoriesData = (await getData("PackageCategory")) || [];
-  const categoriesData = (await getData("Categories")) || [];
-
-  // Transform the data into a dictionary-like object (JSON format)
-  const packages = data.map((pkg) => {
-    // Filter related images for each package
-    const relatedImages = imagesData
-      .filter((img) => img.package_id === pkg.package_id)
-      .sort((a, b) => a.image_id - b.image_id);
-
-    const hasImages = relatedImages.length > 0;
-    const imagePaths = hasImages 
-      ? relatedImages.map((img) => `/backend/images/${img.image_path}`)  // Corrected the image path
-      : null;
-
-    // Get the categories (themes) for each package by matching the package ID with PackageCategory table
-    const relatedCategoryIds = packageCategoriesData
-      .filter((cat) => cat.package_id === pkg.package_id)
-      .map((cat) => cat.category_id);
-
-    // Map category IDs to actual category names
-    const themeNames = relatedCategoryIds
-      .map((catId) => categoriesData.find((category) => category.category_id === catId)?.name)
-      .filter(Boolean); // Removes any undefined/null values
+  // The server already joins images, categories (theme names) and location onto each package
+  return data.packages;
+}
+
 
-    return {
-      package_id: pkg.package_id,
-      name: pkg.name, // Package name
-      description: pkg.description,
-      duration: pkg.duration,
-      price: pkg.price,
-      location_id: pkg.location_id, // Now include location_id
-      location_city: pkg.location_city,
-      location_country: pkg.location_country,
-      images: imagePaths,
-      hasImages: hasImages,
-      categories: themeNames.length > 0 ? themeNames : [] // Now returns theme names instead of IDs
-    };
+// Ranked full-text search over name, description, location and themes; filters are the same as the catalog's.
+// Each package also has name_highlight / snippet (HTML escaped server-side, matches wrapped in <mark>) and a score.
+export async function searchPackages(q, filters = {}) {
+  const searchParams = new URLSearchParams({ q, page_size: 1000 });
+  Object.entries(filters).forEach(([key, value]) => {
+    if (value !== undefined && value !== null && value !== "") {
+      searchParams.append(key, value);
+    }
   });
 
-  return packages;
+  try {
+    const response = await fetch(`http://localhost:5000/api/database/packages/search?${searchParams.toString()}`);
+    if (!response.ok) {
+      throw new Error("Network response was not ok:");
+    }
+    const data = await response.json();
+    return data.packages;
+  } catch (error) {
+    console.error("Error searching packages:", error);
+    return null;
+  }
 }
 
+// Matching package ids plus per-facet counts ({ category, location, price, duration: [{ value, label, count }] })
+// from the server's facet index. filters: { category, city, location_id, min_price, max_price, min_duration, max_duration, ... }
+export async function getPackageFacets(filters = {}) {
+  const searchParams = new URLSearchParams();
+  Object.entries(filters).forEach(([key, value]) => {
+    if (value !== undefined && value !== null && value !== "") {
+      searchParams.append(key, value);
+    }
+  });
 
-export async function getBookings() {
-  // Fetch the bookings data from the Bookings table
-  const bookingsData = await getData("Bookings");
+  try {
+    const response = await fetch(`http://localhost:5000/api/database/packages/facets?${searchParams.toString()}`);
+    if (!response.ok) {
+      throw new Error("Network response was not ok:");
+    }
+    return await response.json();
+  } catch (error) {
+    console.error("Error fetching facets:", error);
+    return null;
+  }
+}
 
-  if (!bookingsData) {
-      console.log("\n\n\n DB RETURNED NOTHING FOR BOOKINGS!!! \n\n\n");
-      throw new Error("Database returned nothing for bookings.");
+// One keyset page of the admin bookings list (needs an admin JWT).
+// filters: { status, package_id, email, start_from, start_to, order, limit }, cursor: next_cursor of the previous page
+export async function getBookingsPage(filters = {}, cursor = null) {
+  const searchParams = new URLSearchParams();
+  Object.entries(filters).forEach(([key, value]) => {
+    if (value !== undefined && value !== null && value !== '') {
+      searchParams.append(key, value);
+    }
+  });
+  if (cursor) {
+    searchParams.append('cursor', cursor);
   }
 
-  // Fetch related data: Users and Packages tables
-  const usersData = await getData("Users") || [];
-  const packagesData = await getData("Packages") || [];
-
-  // Transform the data into a detailed bookings object
-  const bookings = bookingsData.map((booking) => {
-      // Get related user data (find user by email)
-      const user = usersData.find((usr) => usr.email === booking.email) || {};
-
-      // Get related package data (find package by package_id)
-      const packageInfo = packagesData.find((pkg) => pkg.package_id === booking.package_id) || {};
-
-      return {
-          booking_id: booking.booking_id,
-          email: booking.email,
-          user_name: `${user.first_name || "Unknown"} ${user.last_name || ""}`.trim(),
-          package_id: booking.package_id,
-          package_name: packageInfo.name || "Unknown Package",  // Use package name instead of package_id
-          start_date: booking.start_date,
-          end_date: booking.end_date,
-          number_of_travellers: booking.number_of_travellers || 0,
-          price: booking.price || "N/A",
-          status: booking.status || "pending", // Default to 'pending' if status is missing
-      };
+  const response = await fetch(`http://localhost:5000/api/database/admin/bookings?${searchParams.toString()}`, {
+    headers: { Authorization: `Bearer ${localStorage.getItem('jwt_token')}` },
   });
+  if (!response.ok) {
+    throw new Error(`Failed to fetch bookings: ${response.status}`);
+  }
+  return await response.json();
+}
+
+export async function getBookings(filters = {}) {
+  // Bookings come back already joined with the user's name and the package name, a page at a time
+  const bookingsData = [];
+  let cursor = null;
+  do {
+    const page = await getBookingsPage({ ...filters, limit: 1000 }, cursor);
+    bookingsData.push(...page.bookings);
+    cursor = page.next_cursor;
+  } while (cursor);
+
+  const bookings = bookingsData.map((booking) => ({
+      booking_id: booking.booking_id,
+      email: booking.email,
+      user_name: `${booking.first_name || "Unknown"} ${booking.last_name || ""}`.trim(),
+      package_id: booking.package_id,
+      package_name: booking.package_name || "Unknown Package",  // Use package name instead of package_id
+      start_date: booking.start_date,
+      end_date: booking.end_date,
+      number_of_travellers: booking.number_of_travellers || 0,
+      price: booking.price || "N/A",
+      status: booking.status || "pending", // Default to 'pending' if status is missing
+  }));
   return bookings;
 }
 
 
 // Function to fetch locations (city and country)
 export async function getLocations() {
-  const query = `SELECT location_id, city, country FROM Locations`;
-  const data = await fetchDatabaseData(query);
+  const data = await fetchNamedQuery("locations");
 
   if (!data) {
     throw new Error("Failed to fetch location data");
@@ -349,8 +315,7 @@ export async function getLocations() {
 
 // Function to fetch all categories (themes)
 export async function getCategories() {
-  const query = `SELECT category_id, name FROM Categories`;
-  const data = await fetchDatabaseData(query);
+  const data = await fetchNamedQuery("categories");
   console.log("CATEGORY DATA", data);
   if (!data) {
     throw new Error("Failed to fetch category data");
@@ -364,8 +329,7 @@ export async function getCategories() {
 
 // Function to fetch distinct locations (city and country)
 export async function getDistinctLocations() {
-  const query = `SELECT DISTINCT city, country FROM Locations`;
-  const data = await fetchDatabaseData(query);
+  const data = await fetchNamedQuery("distinct_locations");
   console.log("LCOATION DATA", data);
   if (!data) {
     throw new Error("Failed to fetch distinct location data");
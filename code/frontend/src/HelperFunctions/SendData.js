@@ -1,4 +1,4 @@
-import { getData } from './GetDatabaseModels';  // Import the getData function
+import { getUserByEmail, getBookingById } from './GetDatabaseModels';  // Named query lookups
 
 export const registerUser = async (values) => {
   try {
@@ -54,7 +54,7 @@ export async function handleLogin(values) {
 
 export async function updateAdmin(email, isAdmin) {
   try {
-    const users = await getData("Users",`email = '${email}'`);
+    const users = await getUserByEmail(email);
     if (!users || users.length === 0) {
       throw new Error('User not found');
     }
@@ -84,8 +84,8 @@ export async function updateAdmin(email, isAdmin) {
   }
 }
 
-export async function updateBooking(bookingId, status) {
-  const bookings = await getData("Bookings",`booking_id = '${bookingId}'`);
+export async function updateBooking(bookingId, status, email) {
+  const bookings = await getBookingById(bookingId, email);
   if (!bookings || bookings.length === 0) {
     throw new Error('Booking not found');
   }
@@ -112,9 +112,9 @@ export async function updateBooking(bookingId, status) {
   return await response.json();
 }
 
-export async function updateCartItem(item, newStartDate, newEndDate, newTravellers) {
+export async function updateCartItem(item, newStartDate, newEndDate, newTravellers, email) {
   try {
-    const bookings = await getData("Bookings", `booking_id = ${item.bookingId}`);
+    const bookings = await getBookingById(item.bookingId, email);
     if (!bookings || bookings.length === 0) {
       throw new Error('Booking not found');
     }
@@ -150,9 +150,9 @@ export async function updateCartItem(item, newStartDate, newEndDate, newTravelle
   }
 }
 
-export async function removeCartItem(item) {
+export async function removeCartItem(item, email) {
   try {
-    const bookings = await getData("Bookings", `booking_id = ${item.bookingId}`);
+    const bookings = await getBookingById(item.bookingId, email);
     if (!bookings || bookings.length === 0) {
       throw new Error('Booking not found');
     }
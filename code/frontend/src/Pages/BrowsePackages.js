@@ -1,12 +1,14 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Box, Typography, Slider, Grid, TextField, FormControl, Checkbox, ListItemText, OutlinedInput, Select, MenuItem, Button, InputLabel } from '@mui/material';
 import { Formik } from 'formik';
 import { useNavigate } from 'react-router-dom';
-import { getPackagesGeneral, getDistinctLocations, getCategories } from '../HelperFunctions/GetDatabaseModels';
+import { getPackagesGeneral, getDistinctLocations, getCategories, searchPackages, getPackageFacets } from '../HelperFunctions/GetDatabaseModels';
 
 function BrowsePackages() {
   const [allPackages, setAllPackages] = useState([]);
   const [filteredPackages, setFilteredPackages] = useState([]);
+  const [searchResults, setSearchResults] = useState(null); // null when there's no search text
+  const [facetCounts, setFacetCounts] = useState(null);
   const [locations, setLocations] = useState([]);
   const [themes, setThemes] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -17,12 +19,15 @@ function BrowsePackages() {
   const [maxPrice, setMaxPrice] = useState(2000);
 
   const navigate = useNavigate();
+  const searchTimer = useRef(null);
+  const facetRequest = useRef(0);
 
   useEffect(() => {
     async function fetchData() {
       try {
-        const [packageData, locationData, categoryData] = await Promise.all([getPackagesGeneral(), getDistinctLocations(), getCategories()]);
+        const [packageData, locationData, categoryData, facetData] = await Promise.all([getPackagesGeneral(), getDistinctLocations(), getCategories(), getPackageFacets({ ids: 0 })]);
         setAllPackages(packageData);
+        setFacetCounts(facetData?.facets ?? null);
         setFilteredPackages(packageData);
         setLocations(locationData);
         setThemes(categoryData);
@@ -48,8 +53,48 @@ function BrowsePackages() {
     fetchData();
   }, []);
 
-  const applyFilters = (values) => {
-    let filteredData = [...allPackages];
+  // Search results (best match first) replace the full list as the base the other filters narrow down.
+  // The server's facet index does the matching (and the "Adventure (12)" counts), only sorting happens here.
+  const applyFilters = async (values, base = searchResults ?? allPackages) => {
+    const request = ++facetRequest.current;
+    const facetData = await getPackageFacets({
+      category: values.theme.join(','),
+      city: values.location.join(','),
+      min_duration: values.duration[0],
+      max_duration: values.duration[1],
+      min_price: values.price[0],
+      max_price: values.price[1],
+    });
+    if (request !== facetRequest.current) {
+      return; // a newer change is already on its way
+    }
+
+    let filteredData;
+    if (facetData) {
+      const matching = new Set(facetData.package_ids);
+      filteredData = base.filter(pkg => matching.has(pkg.package_id));
+      setFacetCounts(facetData.facets);
+    } else {
+      filteredData = filterLocally(values, base);
+    }
+
+    // Apply sort by duration and price in one box
+    if (values.sort === 'ascDuration') {
+      filteredData = filteredData.sort((a, b) => a.duration - b.duration);
+    } else if (values.sort === 'descDuration') {
+      filteredData = filteredData.sort((a, b) => b.duration - a.duration);
+    } else if (values.sort === 'ascPrice') {
+      filteredData = filteredData.sort((a, b) => a.price - b.price);
+    } else if (values.sort === 'descPrice') {
+      filteredData = filteredData.sort((a, b) => b.price - a.price);
+    }
+
+    setFilteredPackages(filteredData);
+  };
+
+  // Fallback when the facet endpoint can't be reached
+  const filterLocally = (values, base) => {
+    let filteredData = [...base];
 
     // Apply theme filter
     if (values.theme.length > 0) {
@@ -70,19 +115,32 @@ function BrowsePackages() {
 
     // Apply price filter
     filteredData = filteredData.filter(pkg => pkg.price >= values.price[0] && pkg.price <= values.price[1]);
+    return filteredData;
+  };
 
-    // Apply sort by duration and price in one box
-    if (values.sort === 'ascDuration') {
-      filteredData = filteredData.sort((a, b) => a.duration - b.duration);
-    } else if (values.sort === 'descDuration') {
-      filteredData = filteredData.sort((a, b) => b.duration - a.duration);
-    } else if (values.sort === 'ascPrice') {
-      filteredData = filteredData.sort((a, b) => a.price - b.price);
-    } else if (values.sort === 'descPrice') {
-      filteredData = filteredData.sort((a, b) => b.price - a.price);
+  const facetCount = (facet, matches) => {
+    if (!facetCounts) {
+      return '';
     }
+    const count = facetCounts[facet].filter(matches).reduce((total, entry) => total + entry.count, 0);
+    return ` (${count})`;
+  };
 
-    setFilteredPackages(filteredData);
+  const runSearch = (values) => {
+    clearTimeout(searchTimer.current);
+    if (!values.search.trim()) {
+      setSearchResults(null);
+      applyFilters(values, allPackages);
+      return;
+    }
+    // Wait for a pause in typing, the server does the prefix matching
+    searchTimer.current = setTimeout(async () => {
+      const results = await searchPackages(values.search);
+      if (results) {
+        setSearchResults(results);
+        applyFilters(values, results);
+      }
+    }, 250);
   };
 
   const resetFilters = (setFieldValue) => {
@@ -91,6 +149,11 @@ function BrowsePackages() {
     setFieldValue('duration', [minDuration, maxDuration]);
     setFieldValue('price', [minPrice, maxPrice]);
     setFieldValue('sort', '');
+    setFieldValue('search', '');
+    clearTimeout(searchTimer.current);
+    setSearchResults(null);
+    facetRequest.current++; // drop any facet response still in flight
+    getPackageFacets({ ids: 0 }).then(facetData => setFacetCounts(facetData?.facets ?? null));
     setFilteredPackages(allPackages); // Reset to all packages
   };
 
@@ -103,6 +166,7 @@ function BrowsePackages() {
       {/* Filter Section */}
       <Formik
         initialValues={{
+          search: '',
           theme: [],
           location: [],
           duration: [minDuration, maxDuration], // Initialize dynamically based on package data
@@ -117,6 +181,20 @@ function BrowsePackages() {
               Filter Packages
             </Typography>
 
+            <TextField
+              label="Search"
+              name="search"
+              value={values.search}
+              onChange={(e) => {
+                setFieldValue("search", e.target.value);
+                runSearch({ ...values, search: e.target.value });
+              }}
+              placeholder="Beach, Paris, adventure..."
+              fullWidth
+              variant="outlined"
+              sx={{ marginBottom: '20px' }}
+            />
+
             {/* Multi-select for Themes */}
             <TextField
               label="Theme"
@@ -136,7 +214,7 @@ function BrowsePackages() {
               {themes.map((theme, index) => (
                 <MenuItem key={index} value={theme.name}>
                   <Checkbox checked={values.theme.indexOf(theme.name) > -1} />
-                  <ListItemText primary={theme.name} />
+                  <ListItemText primary={`${theme.name}${facetCount('category', entry => entry.value === theme.name)}`} />
                 </MenuItem>
               ))}
             </TextField>
@@ -160,7 +238,7 @@ function BrowsePackages() {
               {locations.map((location, index) => (
                 <MenuItem key={index} value={location.city}>
                   <Checkbox checked={values.location.indexOf(location.city) > -1} />
-                  <ListItemText primary={`${location.city}, ${location.country}`} />
+                  <ListItemText primary={`${location.city}, ${location.country}${facetCount('location', entry => entry.city === location.city)}`} />
                 </MenuItem>
               ))}
             </TextField>
@@ -245,7 +323,7 @@ function BrowsePackages() {
                   <Box sx={{ width: '120px', height: '120px', overflow: 'hidden', borderRadius: '8px' }}>
                     {pkg.images && pkg.images.length > 0 ? (
                       <img
-                        src={`http://localhost:5000${pkg.images[0]}`}
+                        src={`http://localhost:5000${pkg.image_variants?.[0]?.thumb?.webp || pkg.images[0]}`}
                         alt={pkg.name}
                         style={{ width: '100%', height: '100%', objectFit: 'cover' }}
                       />
@@ -255,7 +333,14 @@ function BrowsePackages() {
                   </Box>
 
                   <Box sx={{ flexGrow: 1 }}>
-                    <Typography variant="h6" sx={{ marginBottom: '5px' }}>{pkg.name}</Typography>
+                    {pkg.name_highlight ? (
+                      <Typography variant="h6" sx={{ marginBottom: '5px' }} dangerouslySetInnerHTML={{ __html: pkg.name_highlight }} />
+                    ) : (
+                      <Typography variant="h6" sx={{ marginBottom: '5px' }}>{pkg.name}</Typography>
+                    )}
+                    {pkg.snippet && (
+                      <Typography variant="body2" sx={{ marginBottom: '5px', color: 'text.secondary' }} dangerouslySetInnerHTML={{ __html: pkg.snippet }} />
+                    )}
                     <Typography variant="body1" sx={{ marginBottom: '5px' }}>{pkg.location_city}, {pkg.location_country}</Typography>
                     <Typography variant="body1" sx={{ marginBottom: '5px' }}>{pkg.duration} days</Typography>
                     <Typography variant="body1" sx={{ marginBottom: '5px' }}>Price: ${pkg.price}</Typography>
@@ -30,7 +30,7 @@ function Cart({ user }) {
 
   const handleUpdateItem = async (item, newStartDate, newEndDate, newTravellers, ) => {
     // Update the cart item with the new details
-    await updateCartItem(item, newStartDate, newEndDate, newTravellers);
+    await updateCartItem(item, newStartDate, newEndDate, newTravellers, user.email);
     setEditModalOpen(false);
     showSnackbar('Package updated.')
     fetchCartItems();
@@ -47,7 +47,7 @@ function Cart({ user }) {
 
   const handleRemoveItem = async (item) => {
     // Remove the cart item
-    await removeCartItem(item);
+    await removeCartItem(item, user.email);
     setEditModalOpen(false);
     showSnackbar('Package removed from cart.')
     // Refresh cart items after removal
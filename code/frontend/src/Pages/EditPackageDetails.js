@@ -60,7 +60,7 @@ function EditPackageDetails() {
 
   // Fetch specific package details when editing an existing package
   async function fetchPackageDetails(packageId) {
-    const packageData = await getPackagesGeneral(`p.package_id = ${packageId}`);
+    const packageData = await getPackagesGeneral({ package_id: packageId });
     if (packageData && packageData.length > 0) {
       const selectedPackage = packageData[0];
       setPackageDetails({
@@ -71,7 +71,8 @@ function HomePage() {
   }, [isTransitioning]);
 
   const getSlideContent = (slide) => {
-    const image = slide.images && slide.images.length > 0 ? `http://localhost:5000${slide.images[0]}` : null;
+    // hero sized variant when it's been generated, the original otherwise
+    const image = slide.images && slide.images.length > 0 ? `http://localhost:5000${slide.image_variants?.[0]?.hero?.webp || slide.images[0]}` : null;
     const backgroundImage = image ? `url(${image})` : defaultColor;
     console.log(slide.package_id);
     return (
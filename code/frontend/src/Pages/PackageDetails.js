@@ -28,7 +28,7 @@ function PackageDetails({ user }) {
 
   useEffect(() => {
     async function fetchPackage() {
-      const data = await getPackagesGeneral(`p.package_id = ${packageId}`);
+      const data = await getPackagesGeneral({ package_id: packageId });
       if (data && data.length > 0) {
         setPackageData(data[0]);
       }